@@ -0,0 +1,385 @@
+"""
+Offline load test for the backend API.
+
+Runs the app in-process against deterministic local stand-ins for
+``yf.Ticker`` and the OpenAI chat completions API, drives each endpoint at
+increasing concurrency and writes p50/p95/p99 latency, throughput, event-loop
+lag and resident memory growth per (scenario, concurrency) as JSON:
+
+    python benchmark.py --concurrency 1,8,32 --requests 200 --output bench.json
+    python benchmark.py --baseline bench.json   # exit 1 on a p95/throughput regression
+
+Caches are reset before every run so each level starts cold.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+UNIVERSE = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "AMD", "NFLX", "INTC",
+            "JPM", "BAC", "XOM", "CVX", "KO", "PEP", "WMT", "COST", "DIS", "NKE"]
+SCENARIOS = ["stock_data", "stock_metrics", "stock_news", "process_query", "query"]
+
+
+class FakeYahoo:
+    """
+    Deterministic stand-in for ``yfinance``: ``Ticker(symbol)`` answers
+    ``history``/``info``/``news`` after ``latency`` (+/- ``jitter``) seconds
+    of blocking sleep and raises ``ConnectionError`` with probability
+    ``failure_rate``. Prices are seeded by symbol, so every run sees the same
+    data.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, symbol, kind):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"Injected {kind} failure for {symbol}")
+
+    def Ticker(self, symbol):
+        return FakeTicker(self, symbol)
+
+
+class FakeTicker:
+    def __init__(self, yahoo, symbol):
+        self.yahoo = yahoo
+        self.symbol = symbol
+
+    def history(self, start, end):
+        import numpy as np
+        import pandas as pd
+
+        self.yahoo._call(self.symbol, "history")
+        index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), tz="America/New_York")
+        rng = np.random.default_rng(zlib.crc32(self.symbol.encode()))
+        # Walk from a fixed origin so overlapping ranges agree on prices.
+        offset = (index[0].date() - date(2000, 1, 3)).days if len(index) else 0
+        walk = np.cumsum(rng.normal(0, 1, offset + len(index)))[offset:] if len(index) else np.array([])
+        close = 100 + np.abs(walk)
+        return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                             "Volume": np.full(len(index), 1e6), "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+
+    @property
+    def info(self):
+        from fast_planner import AVAILABLE_METRICS
+
+        self.yahoo._call(self.symbol, "info")
+        seed = zlib.crc32(self.symbol.encode())
+        info = {metric: float(seed % (i + 97)) for i, metric in enumerate(AVAILABLE_METRICS)}
+        info.update({"longBusinessSummary": "x" * 2000, "shortName": self.symbol})
+        return info
+
+    @property
+    def news(self):
+        self.yahoo._call(self.symbol, "news")
+        return [{"title": f"{self.symbol} headline {i}", "publisher": "Bench Wire", "link": f"https://example.com/{i}"}
+                for i in range(10)]
+
+
+class FakeChat:
+    """
+    Stand-in for ``AsyncOpenAI``: ``chat.completions.create(stream=True)``
+    streams a fixed-shape plan for the symbols named in the user message,
+    ``chunk_size`` characters every ``chunk_latency`` seconds, and raises
+    with probability ``failure_rate``.
+    """
+
+    def __init__(self, chunk_latency=0.005, chunk_size=12, failure_rate=0.0, seed=0):
+        self.chunk_latency = chunk_latency
+        self.chunk_size = chunk_size
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def plan(self, query):
+        symbols = [symbol for symbol in UNIVERSE if symbol in query.split()] or ["AAPL"]
+        end = date.today()
+        return {
+            "actions": [
+                {"type": "getHistory", "symbols": symbols, "startDate": (end - timedelta(days=365)).isoformat(), "endDate": "current"},
+                {"type": "getMetrics", "symbols": symbols, "metrics": ["marketCap", "trailingPE", "beta"]},
+            ],
+            "description": "Benchmark plan",
+            "keyDates": [{"date": (end - timedelta(days=90)).isoformat(), "description": "Earnings", "symbol": symbols[0]}],
+        }
+
+    async def create(self, model, messages, stream=False):
+        self.calls += 1
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Injected completion failure")
+        text = json.dumps(self.plan(messages[-1]["content"]))
+
+        async def chunks():
+            for i in range(0, len(text), self.chunk_size):
+                await asyncio.sleep(self.chunk_latency)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + self.chunk_size]))])
+        return chunks()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb():
+    """Current resident set size of this process, or None where ``/proc`` is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class LoopLagMonitor:
+    """Measures how late ``asyncio.sleep(interval)`` wakes up, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def request_for(scenario, i):
+    """(method, url, json body) of the ``i``-th request of a scenario."""
+    first, second = UNIVERSE[i % len(UNIVERSE)], UNIVERSE[(i * 7 + 3) % len(UNIVERSE)]
+    end = date.today()
+    start = end - timedelta(days=365)
+    if scenario == "stock_data":
+        return "GET", f"/api/stock_data?symbols={first},{second}&start_date={start}&end_date={end}&max_points=200", None
+    if scenario == "stock_metrics":
+        return "GET", f"/api/stock_metrics?symbols={first},{second}&metrics=marketCap,trailingPE,beta", None
+    if scenario == "stock_news":
+        return "GET", f"/api/stock_news?symbol={first}", None
+    # Unique wording per request so plans come from the (fake) LLM, not the plan cache.
+    query = {"query": f"how did {first} and {second} react to their latest earnings call {i}"}
+    if scenario == "process_query":
+        return "POST", "/api/process_query", query
+    return "POST", "/api/query?max_points=200", query
+
+
+def install_fakes(main, upstream, yahoo, chat, upstream_rate, store_dir):
+    """Point the app at the fakes and fresh, empty caches."""
+    from governor import Governor
+    from info_cache import InfoCache
+    from news_cache import NewsCache
+    from plan_cache import PlanCache
+    from price_store import PriceStore
+
+    upstream.yf.Ticker = yahoo.Ticker
+    upstream.governor = Governor(rate=upstream_rate, max_limit=upstream.UPSTREAM_MAX_WORKERS, sleep=time.sleep)
+    main.get_client = lambda: chat
+    main.price_store = PriceStore(store_dir)
+    main.info_cache = InfoCache()
+    main.news_cache = NewsCache()
+    main.plan_cache = PlanCache()
+
+
+async def run_level(app, scenario, concurrency, total):
+    import httpx
+
+    latencies, statuses = [], {}
+    counter = itertools.count()
+    monitor = LoopLagMonitor()
+
+    async def worker(client):
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            method, url, body = request_for(scenario, i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                status = response.status_code
+            except Exception:
+                status = "exception"
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        rss_before = rss_mb()
+        monitor.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        rss_after = rss_mb()
+
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    errors = sum(count for status, count in statuses.items() if status == "exception" or status >= 400)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(max(latencies, default=None)),
+        },
+        "loop_lag_ms": {"p99": ms(percentile(monitor.samples, 99)), "max": ms(max(monitor.samples, default=None))},
+        # Current RSS, not the process peak, so each level shows its own growth.
+        "rss_mb": None if rss_after is None else round(rss_after, 1),
+        "rss_delta_mb": None if rss_before is None or rss_after is None else round(rss_after - rss_before, 1),
+    }
+
+
+def run_benchmark(scenarios=SCENARIOS, concurrency=(1, 4, 16), requests=100, upstream_latency=0.05, upstream_jitter=0.02,
+                  upstream_failure_rate=0.0, llm_chunk_latency=0.005, llm_failure_rate=0.0, upstream_rate=0.0, seed=0):
+    """Run every scenario at every concurrency level; returns the JSON-serializable report."""
+    os.environ.setdefault("PREFETCH_ENABLED", "0")
+    os.environ.setdefault("SNAPSHOT_ENABLED", "0")
+    import main
+    import upstream
+
+    logging.getLogger().setLevel(logging.WARNING)
+    saved = {name: getattr(main, name) for name in ("get_client", "price_store", "info_cache", "news_cache", "plan_cache")}
+    saved_governor, saved_ticker = upstream.governor, upstream.yf.Ticker
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            for scenario in scenarios:
+                for level in concurrency:
+                    yahoo = FakeYahoo(upstream_latency, upstream_jitter, upstream_failure_rate, seed)
+                    chat = FakeChat(llm_chunk_latency, failure_rate=llm_failure_rate, seed=seed)
+                    install_fakes(main, upstream, yahoo, chat, upstream_rate, tempfile.mkdtemp(dir=root))
+                    result = asyncio.run(run_level(main.app, scenario, level, requests))
+                    result["upstream_calls"] = yahoo.calls
+                    result["llm_calls"] = chat.calls
+                    results.append(result)
+                    print(f"{scenario} x{level}: p50={result['latency_ms']['p50']}ms "
+                          f"p99={result['latency_ms']['p99']}ms {result['throughput_rps']} req/s", file=sys.stderr)
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+        upstream.governor, upstream.yf.Ticker = saved_governor, saved_ticker
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "requests": requests, "concurrency": list(concurrency), "upstream_latency": upstream_latency,
+                "upstream_jitter": upstream_jitter, "upstream_failure_rate": upstream_failure_rate,
+                "llm_chunk_latency": llm_chunk_latency, "llm_failure_rate": llm_failure_rate,
+                "upstream_rate": upstream_rate, "seed": seed,
+            },
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, report, tolerance=0.2):
+    """
+    Regressions of ``report`` against ``baseline``: (scenario, concurrency)
+    pairs whose p95 latency grew, or whose throughput fell, by more than
+    ``tolerance``.
+    """
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        if old["latency_ms"]["p95"] and result["latency_ms"]["p95"] > old["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append({"scenario": result["scenario"], "concurrency": result["concurrency"], "metric": "p95_ms",
+                                "baseline": old["latency_ms"]["p95"], "current": result["latency_ms"]["p95"]})
+        if old["throughput_rps"] and result["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append({"scenario": result["scenario"], "concurrency": result["concurrency"], "metric": "throughput_rps",
+                                "baseline": old["throughput_rps"], "current": result["throughput_rps"]})
+    return regressions
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--upstream-jitter", type=float, default=0.02)
+    parser.add_argument("--upstream-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-chunk-latency", type=float, default=0.005)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-rate", type=float, default=0.0, help="governor token rate; 0 disables rate limiting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        scenarios=[s for s in args.scenarios.split(",") if s],
+        concurrency=[int(c) for c in args.concurrency.split(",")],
+        requests=args.requests,
+        upstream_latency=args.upstream_latency,
+        upstream_jitter=args.upstream_jitter,
+        upstream_failure_rate=args.upstream_failure_rate,
+        llm_chunk_latency=args.llm_chunk_latency,
+        llm_failure_rate=args.llm_failure_rate,
+        upstream_rate=args.upstream_rate,
+        seed=args.seed,
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(json.load(f), report, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,53 @@
+import asyncio
+
+
+def _covers(outer, inner):
+    if outer is None or inner is None:
+        return outer == inner
+    return outer[0] <= inner[0] and inner[1] <= outer[1]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical upstream calls.
+
+    ``do(key, call, span)`` starts ``call()`` unless a call with the same key
+    whose ``span`` (a ``(start, end)`` pair, e.g. a date range) contains the
+    requested one is already in flight, in which case it waits for that call's
+    result instead. Callers sharing a wider call are responsible for trimming
+    its result to their own span. A caller that is cancelled does not cancel
+    the shared call.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+
+    async def do(self, key, call, span=None):
+        for entry_span, task in self._inflight.get(key, ()):
+            if _covers(entry_span, span):
+                self.shared += 1
+                return await asyncio.shield(task)
+
+        self.calls += 1
+        task = asyncio.ensure_future(call())
+        entry = (span, task)
+        entries = self._inflight.setdefault(key, [])
+        entries.append(entry)
+
+        def finished(done):
+            entries.remove(entry)
+            if not entries and self._inflight.get(key) is entries:
+                del self._inflight[key]
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(finished)
+        return await asyncio.shield(task)
+
+    def in_flight(self):
+        return sum(len(entries) for entries in self._inflight.values())
+
+    def stats(self):
+        return {"calls": self.calls, "shared": self.shared, "in_flight": self.in_flight()}
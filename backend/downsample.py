@@ -0,0 +1,90 @@
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+METHODS = {"lttb", "minmax"}
+
+
+def lttb_indices(x, y, n):
+    """
+    Largest-Triangle-Three-Buckets: pick ``n`` indices of the series ``(x, y)``
+    that preserve its visual shape. The first and last points are always kept;
+    every bucket in between contributes the point forming the largest triangle
+    with the previously kept point and the mean of the next bucket.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1])[:max(n, 1)]
+
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    selected = np.empty(n, dtype=int)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n):
+    """Keep the minimum and maximum of each of ``n // 2`` equal-width buckets, plus both endpoints."""
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    buckets = np.arange(size) * max(n // 2, 1) // size
+    series = pd.Series(y)
+    grouped = series.groupby(buckets)
+    picked = np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, size - 1]])
+    return np.unique(picked)
+
+
+def nearest_indices(days, targets):
+    """Index of the entry in sorted ``days`` closest to each of ``targets``."""
+    if not len(days) or not len(targets):
+        return np.array([], dtype=int)
+    right = np.clip(np.searchsorted(days, targets), 1, len(days) - 1)
+    left = right - 1
+    return np.where(np.abs(days[left] - targets) <= np.abs(days[right] - targets), left, right)
+
+
+def downsample_matrix(matrix, max_points, key_dates=(), method="lttb"):
+    """
+    Reduce a ``price_matrix`` to roughly ``max_points`` rows on a shared date axis.
+
+    Each symbol's Close series (or its first column) gets an equal share of
+    the point budget and the union of the rows picked for every symbol is
+    kept, so all symbols still line up on the same dates. The rows nearest to
+    each of ``key_dates`` are always kept on top of the budget.
+    """
+    if max_points is None or len(matrix) <= max_points:
+        return matrix
+    days = matrix.index.values.astype("datetime64[D]").astype("int64").astype("float64")
+    symbols = list(dict.fromkeys(matrix.columns.get_level_values(0)))
+    share = max(max_points // len(symbols), 3)
+
+    keep = []
+    for symbol in symbols:
+        frame = matrix[symbol]
+        values = (frame["Close"] if "Close" in frame else frame.iloc[:, 0]).to_numpy(dtype="float64")
+        valid = np.flatnonzero(~np.isnan(values))
+        if not len(valid):
+            continue
+        if method == "minmax":
+            picked = minmax_indices(values[valid], share)
+        else:
+            picked = lttb_indices(days[valid], values[valid], share)
+        keep.append(valid[picked])
+
+    if len(key_dates):
+        targets = pd.to_datetime(list(key_dates)).values.astype("datetime64[D]").astype("int64").astype("float64")
+        keep.append(nearest_indices(days, targets))
+
+    rows = np.unique(np.concatenate(keep)) if keep else np.arange(0)
+    return matrix.iloc[rows]
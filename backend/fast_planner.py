@@ -0,0 +1,226 @@
+import calendar
+import re
+from datetime import date, timedelta
+
+from plan_cache import clean_query
+from tickers import COMPANY_TICKERS, find_company_names
+
+# Metrics the planner may request, in the order they are listed to the LLM.
+AVAILABLE_METRICS = [
+    "marketCap", "trailingPE", "forwardPE", "dividendYield", "beta", "fiftyTwoWeekHigh", "fiftyDayAverage",
+    "twoHundredDayAverage", "averageVolume", "regularMarketPrice", "regularMarketDayHigh", "regularMarketDayLow",
+    "totalCash", "totalCashPerShare", "debtToEquity", "returnOnEquity", "freeCashflow", "operatingCashflow",
+    "earningsGrowth", "revenueGrowth", "grossMargins", "operatingMargins", "profitMargins", "bookValue",
+    "priceToBook", "earningsQuarterlyGrowth", "netIncomeToCommon", "trailingEps", "forwardEps", "pegRatio",
+    "enterpriseToRevenue", "enterpriseToEbitda", "52WeekChange", "SandP52WeekChange", "lastDividendValue",
+    "lastDividendDate",
+]
+
+METRIC_PHRASES = {
+    "forward p/e": "forwardPE", "forward pe": "forwardPE", "forward price to earnings": "forwardPE",
+    "p/e": "trailingPE", "pe": "trailingPE", "pe ratio": "trailingPE", "trailing pe": "trailingPE",
+    "trailing p/e": "trailingPE", "price to earnings": "trailingPE", "price/earnings": "trailingPE",
+    "market cap": "marketCap", "market caps": "marketCap", "market capitalization": "marketCap",
+    "dividend yield": "dividendYield", "dividend": "dividendYield", "dividends": "dividendYield",
+    "beta": "beta",
+    "52 week high": "fiftyTwoWeekHigh", "52-week high": "fiftyTwoWeekHigh",
+    "52 week change": "52WeekChange", "52-week change": "52WeekChange",
+    "50 day average": "fiftyDayAverage", "50-day average": "fiftyDayAverage",
+    "50 day moving average": "fiftyDayAverage", "50-day moving average": "fiftyDayAverage",
+    "200 day average": "twoHundredDayAverage", "200-day average": "twoHundredDayAverage",
+    "200 day moving average": "twoHundredDayAverage", "200-day moving average": "twoHundredDayAverage",
+    "average volume": "averageVolume", "avg volume": "averageVolume",
+    "current price": "regularMarketPrice", "quote": "regularMarketPrice",
+    "day high": "regularMarketDayHigh", "day low": "regularMarketDayLow",
+    "total cash": "totalCash", "cash per share": "totalCashPerShare",
+    "debt to equity": "debtToEquity", "debt/equity": "debtToEquity",
+    "return on equity": "returnOnEquity", "roe": "returnOnEquity",
+    "free cash flow": "freeCashflow", "fcf": "freeCashflow", "operating cash flow": "operatingCashflow",
+    "earnings growth": "earningsGrowth", "revenue growth": "revenueGrowth",
+    "gross margin": "grossMargins", "gross margins": "grossMargins",
+    "operating margin": "operatingMargins", "operating margins": "operatingMargins",
+    "profit margin": "profitMargins", "profit margins": "profitMargins", "net margin": "profitMargins",
+    "book value": "bookValue", "price to book": "priceToBook", "p/b": "priceToBook",
+    "net income": "netIncomeToCommon",
+    "eps": "trailingEps", "trailing eps": "trailingEps", "forward eps": "forwardEps",
+    "peg": "pegRatio", "peg ratio": "pegRatio",
+    "ev/revenue": "enterpriseToRevenue", "ev to revenue": "enterpriseToRevenue",
+    "ev/ebitda": "enterpriseToEbitda", "ev to ebitda": "enterpriseToEbitda",
+    "last dividend": "lastDividendValue",
+}
+METRIC_PHRASES.update({metric.lower(): metric for metric in AVAILABLE_METRICS})
+
+NEWS_WORDS = {"news", "headlines", "headline", "articles", "article"}
+HISTORY_WORDS = {
+    "chart", "graph", "plot", "history", "historical", "performance", "compare", "comparison", "vs", "versus",
+    "trend", "trends", "movement", "price", "prices",
+}
+FILLER_WORDS = {
+    "show", "me", "the", "a", "an", "of", "for", "and", "&", "with", "to", "what", "whats", "is", "are", "was",
+    "how", "has", "have", "did", "does", "do", "stock", "stocks", "share", "shares", "over", "in", "on", "get",
+    "give", "display", "view", "see", "current", "latest", "recent", "ratio", "ratios", "its", "their",
+    "please", "data", "between", "about", "value", "values", "info", "metrics", "tell", "i", "can", "you",
+    "my", "this", "last", "past", "ticker", "company", "companies", "s",
+} | NEWS_WORDS | HISTORY_WORDS
+
+# Uppercase words that look like tickers in a query but are not.
+NOT_TICKERS = {"I", "A", "PE", "EPS", "ROE", "FCF", "PEG", "USD", "CEO", "AI", "ETF", "IPO", "YTD", "US", "EV", "VS"}
+COMPANY_SYMBOLS = set(COMPANY_TICKERS.values())
+MAX_SYMBOLS = 8
+DEFAULT_HISTORY_MONTHS = 12
+
+_UNIT_MONTHS = {"m": 1, "mo": 1, "mos": 1, "month": 1, "months": 1, "q": 3, "quarter": 3, "quarters": 3,
+                "y": 12, "yr": 12, "yrs": 12, "year": 12, "years": 12}
+_UNIT_DAYS = {"d": 1, "day": 1, "days": 1, "w": 7, "wk": 7, "wks": 7, "week": 7, "weeks": 7}
+
+
+def _phrase_pattern(phrases):
+    alternatives = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(r"(?<![\w/])(" + alternatives + r")(?![\w/])")
+
+
+_METRIC_PATTERN = _phrase_pattern(METRIC_PHRASES)
+_COUNT_RANGE = re.compile(
+    r"(?:(?:over the |in the )?(?:last|past|previous) )?(\d+) ?(" + "|".join(list(_UNIT_MONTHS) + list(_UNIT_DAYS)) + r")(?!\w)"
+)
+_NAMED_RANGE = re.compile(r"(?:over the |in the )?(last|past|previous|this) (day|week|month|quarter|year)(?!\w)")
+_YTD = re.compile(r"(?<!\w)(ytd|year to date)(?!\w)")
+_SINCE_YEAR = re.compile(r"(?<!\w)since (\d{4})(?!\w)")
+_IN_YEAR = re.compile(r"(?<!\w)(?:in|during) (\d{4})(?!\w)")
+
+
+def _minus_months(day, months):
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _take(pattern, text):
+    matches = list(pattern.finditer(text))
+    return matches, pattern.sub(" ", text)
+
+
+def _parse_range(text, today):
+    """Return ``((startDate, endDate), remaining_text)``, ``(None, text)``, or ``(False, text)`` if ambiguous."""
+    found = []
+
+    matches, text = _take(_COUNT_RANGE, text)
+    for m in matches:
+        count, unit = int(m.group(1)), m.group(2)
+        if unit in _UNIT_MONTHS:
+            found.append((_minus_months(today, count * _UNIT_MONTHS[unit]), "current"))
+        else:
+            found.append((today - timedelta(days=count * _UNIT_DAYS[unit]), "current"))
+
+    matches, text = _take(_NAMED_RANGE, text)
+    for m in matches:
+        which, unit = m.group(1), m.group(2)
+        if which != "this":
+            months = _UNIT_MONTHS.get(unit)
+            start = _minus_months(today, months) if months else today - timedelta(days=_UNIT_DAYS[unit])
+        elif unit == "year":
+            start = date(today.year, 1, 1)
+        elif unit == "quarter":
+            start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+        elif unit == "month":
+            start = date(today.year, today.month, 1)
+        elif unit == "week":
+            start = today - timedelta(days=today.weekday())
+        else:
+            start = today
+        found.append((start, "current"))
+
+    matches, text = _take(_YTD, text)
+    found.extend((date(today.year, 1, 1), "current") for _ in matches)
+
+    matches, text = _take(_SINCE_YEAR, text)
+    found.extend((date(int(m.group(1)), 1, 1), "current") for m in matches)
+
+    matches, text = _take(_IN_YEAR, text)
+    for m in matches:
+        year = int(m.group(1))
+        found.append((date(year, 1, 1), "current" if year >= today.year else date(year + 1, 1, 1)))
+
+    if not found:
+        return None, text
+    if len(found) > 1 or found[0][0] > today or found[0][0].year < 1970:
+        return False, text
+    start, end = found[0]
+    return (start.isoformat(), end if end == "current" else end.isoformat()), text
+
+
+def _mark_company_names(text):
+    """
+    Replace company names in lowercase ``text`` by their tickers in
+    uppercase, so they stand apart from words that merely spell a ticker.
+    """
+    parts, last = [], 0
+    for ticker, start, end in find_company_names(text):
+        parts.extend((text[last:start], ticker))
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def _is_typed_ticker(word, query):
+    candidate = word.upper()
+    if candidate in NOT_TICKERS or not re.fullmatch(r"\^?[A-Z][A-Z.\-]{0,5}", candidate):
+        return False
+    return re.search(r"(?<![\w$^])[$^]?" + re.escape(candidate) + r"(?![\w])", query) is not None
+
+
+def plan_query(query, today=None):
+    """
+    Plan simple queries locally without calling the LLM.
+
+    Recognizes company names, tickers typed in uppercase, relative date ranges
+    ("1y", "last month", "ytd", "since 2020") and the metric names in
+    ``AVAILABLE_METRICS``.
+    Returns a plan in the same ``actions``/``description``/``keyDates`` shape as
+    the LLM, or None if any part of the query is not understood, in which case
+    the caller should fall back to the LLM.
+    """
+    today = today or date.today()
+    text = _mark_company_names(clean_query(query))
+
+    metrics = [METRIC_PHRASES[m.group(1)] for m in _METRIC_PATTERN.finditer(text)]
+    text = _METRIC_PATTERN.sub(" ", text)
+
+    date_range, text = _parse_range(text, today)
+    if date_range is False:
+        return None
+
+    symbols, words = [], set()
+    for word in text.split():
+        if word in FILLER_WORDS:
+            words.add(word)
+        elif word in COMPANY_SYMBOLS or _is_typed_ticker(word, query):
+            symbols.append(word.upper())
+        else:
+            return None
+    symbols = list(dict.fromkeys(symbols))
+    metrics = list(dict.fromkeys(metrics))
+    if not symbols or len(symbols) > MAX_SYMBOLS:
+        return None
+
+    wants_news = bool(words & NEWS_WORDS)
+    wants_history = date_range is not None or bool(words & HISTORY_WORDS) or not (metrics or wants_news)
+
+    actions, parts = [], []
+    joined = ", ".join(symbols)
+    if wants_history:
+        start, end = date_range or (_minus_months(today, DEFAULT_HISTORY_MONTHS).isoformat(), "current")
+        actions.append({"type": "getHistory", "symbols": symbols, "startDate": start, "endDate": end})
+        parts.append(f"price history for {joined} from {start} to {'today' if end == 'current' else end}")
+    if metrics:
+        actions.append({"type": "getMetrics", "symbols": symbols, "metrics": metrics})
+        parts.append(f"{', '.join(metrics)} for {joined}")
+    if wants_news:
+        actions.append({"type": "getNews", "symbols": symbols})
+        parts.append(f"the latest news for {joined}")
+
+    return {
+        "actions": actions,
+        "description": "Showing " + " and ".join(parts) + ".",
+        "keyDates": [],
+    }
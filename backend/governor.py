@@ -0,0 +1,242 @@
+import logging
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a host's circuit breaker is open."""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"Circuit open for {host}, retry in {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+# Exceptions that mean "upstream answered, there is just nothing there".
+# They are passed straight through and count as healthy responses.
+NON_RETRYABLE = (ValueError, KeyError, LookupError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available."""
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Tokens in the bucket right now, without taking any."""
+        if self.rate <= 0:
+            return float("inf")
+        with self._lock:
+            return min(self.burst, self.tokens + (self.clock() - self._updated) * self.rate)
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit. Every healthy response under ``target_latency``
+    grows the limit by ``1 / limit`` (about +1 per round of calls); a slow
+    response shrinks it by 10% and an upstream error halves it.
+    """
+
+    def __init__(self, initial, min_limit, max_limit, target_latency):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= max(int(self.limit), self.min_limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, ok):
+        with self._cond:
+            self.in_flight -= 1
+            if not ok:
+                self.limit = max(self.min_limit, self.limit * 0.5)
+            elif latency > self.target_latency:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive upstream failures. While open
+    every call fails fast with ``CircuitOpenError``; after ``reset_timeout``
+    seconds a single probe call is let through and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                elapsed = self.clock() - self._opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self.host, self.reset_timeout - elapsed)
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpenError(self.host, self.reset_timeout)
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logging.info("Circuit for %s closed", self.host)
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning("Circuit for %s opened after %s failures", self.host, self.failures)
+                self.state = "open"
+                self._opened_at = self.clock()
+
+    @property
+    def is_open(self):
+        return self.state == "open"
+
+
+class Governor:
+    """
+    Central gate for every blocking upstream call: a token bucket caps the
+    request rate, an AIMD limiter caps concurrency, failed calls are retried
+    with full-jitter exponential backoff, and a per-host circuit breaker stops
+    calls altogether when a host keeps failing.
+
+    ``observer(host, seconds, outcome)``, if given, is called after every
+    attempt with outcome "ok", "no_data" or "error", and with "rejected" when
+    the circuit turned a call away.
+    """
+
+    def __init__(self, rate=10.0, burst=20, min_limit=1, max_limit=8, target_latency=2.0, retries=2,
+                 backoff_base=0.25, backoff_cap=4.0, failure_threshold=5, reset_timeout=30,
+                 clock=time.monotonic, sleep=time.sleep, observer=None):
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.limiter = AdaptiveLimiter(max_limit, min_limit, max_limit, target_latency)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.rejected = 0
+        self.observer = observer
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout, self.clock)
+            return self._breakers[host]
+
+    def _observe(self, host, seconds, outcome):
+        if self.observer is not None:
+            self.observer(host, seconds, outcome)
+
+    def call(self, host, fn, *args):
+        breaker = self.breaker(host)
+        attempt = 0
+        while True:
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                self.rejected += 1
+                self._observe(host, 0.0, "rejected")
+                raise
+            self.bucket.acquire()
+            self.limiter.acquire()
+            self.calls += 1
+            started = self.clock()
+            try:
+                result = fn(*args)
+            except NON_RETRYABLE:
+                self.limiter.release(self.clock() - started, ok=True)
+                breaker.record_success()
+                self._observe(host, self.clock() - started, "no_data")
+                raise
+            except Exception as e:
+                self.limiter.release(self.clock() - started, ok=False)
+                breaker.record_failure()
+                self.errors += 1
+                self._observe(host, self.clock() - started, "error")
+                if attempt >= self.retries or breaker.is_open:
+                    raise
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retried += 1
+                logging.warning("Upstream call to %s failed (%s), retry %s in %.2fs", host, e, attempt, delay)
+                self.sleep(delay)
+            else:
+                self.limiter.release(self.clock() - started, ok=True)
+                breaker.record_success()
+                self._observe(host, self.clock() - started, "ok")
+                return result
+
+    def has_headroom(self, reserve=0.5):
+        """
+        Whether background work may call upstream now without crowding out
+        foreground requests: less than ``reserve`` of the concurrency limit is
+        in use and at least ``reserve`` of the token burst is left.
+        """
+        return (self.limiter.in_flight < self.limiter.limit * reserve
+                and self.bucket.available() >= self.bucket.burst * reserve)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retried,
+            "rejected": self.rejected,
+            "concurrency_limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "tokens": self.bucket.tokens,
+            "circuits": {host: breaker.state for host, breaker in self._breakers.items()},
+        }
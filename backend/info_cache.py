@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import upstream
+from governor import CircuitOpenError
+from shared_cache import shared_cache
+
+# Freshness classes for Ticker.info fields, in seconds. Quote fields move
+# tick by tick, valuation fields drift with the price, and everything else
+# only changes with filings.
+FRESHNESS = {
+    "price": float(os.getenv("INFO_TTL_PRICE", 15)),
+    "market": float(os.getenv("INFO_TTL_MARKET", 900)),
+    "fundamental": float(os.getenv("INFO_TTL_FUNDAMENTAL", 6 * 3600)),
+}
+
+PRICE_FIELDS = {
+    "currentPrice", "regularMarketPrice", "regularMarketDayHigh", "regularMarketDayLow",
+    "regularMarketOpen", "regularMarketPreviousClose", "regularMarketVolume", "regularMarketChange",
+    "regularMarketChangePercent", "dayHigh", "dayLow", "open", "previousClose", "volume", "bid", "ask",
+}
+
+MARKET_FIELDS = {
+    "marketCap", "enterpriseValue", "trailingPE", "forwardPE", "pegRatio", "priceToBook",
+    "priceToSalesTrailing12Months", "dividendYield", "beta", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+    "fiftyDayAverage", "twoHundredDayAverage", "averageVolume", "averageVolume10days",
+    "enterpriseToRevenue", "enterpriseToEbitda", "52WeekChange", "SandP52WeekChange",
+}
+
+# Fields kept on every record, so the usual metric lookups (the ones the
+# query planner is told about) hit regardless of which one came first.
+DEFAULT_FIELDS = PRICE_FIELDS | MARKET_FIELDS | {
+    "totalCash", "totalCashPerShare", "debtToEquity", "returnOnEquity", "freeCashflow",
+    "operatingCashflow", "earningsGrowth", "revenueGrowth", "grossMargins", "operatingMargins",
+    "profitMargins", "bookValue", "earningsQuarterlyGrowth", "netIncomeToCommon", "trailingEps",
+    "forwardEps", "lastDividendValue", "lastDividendDate", "shortName", "longName", "sector",
+    "industry", "currency",
+}
+
+
+def freshness_class(field):
+    if field in PRICE_FIELDS:
+        return "price"
+    if field in MARKET_FIELDS:
+        return "market"
+    return "fundamental"
+
+
+def _estimate_size(values):
+    return sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in values.items())
+
+
+class InfoRecord:
+    __slots__ = ("values", "projection", "fetched_at", "size")
+
+    def __init__(self, values, projection, fetched_at):
+        self.values = values
+        self.projection = projection
+        self.fetched_at = fetched_at
+        self.size = _estimate_size(values) + 64 * len(projection)
+
+    def project(self, fields):
+        return {field: self.values[field] for field in fields if field in self.values}
+
+
+class StaleInfo(dict):
+    """Cached values served past their freshness because upstream is unavailable."""
+    stale = True
+
+
+class InfoCache:
+    """
+    In-process cache of projected ``Ticker.info`` records keyed by symbol.
+
+    Only ``DEFAULT_FIELDS`` plus any explicitly requested fields are kept from
+    each upstream record. A lookup is fresh while the record is younger than
+    the shortest TTL among the requested fields; past that but within
+    ``max_stale`` seconds the cached values are returned immediately and the
+    record is refreshed in the background. While the upstream circuit is open,
+    any cached record covering the fields is served as ``StaleInfo`` whatever
+    its age. Records are evicted in LRU order once their estimated size
+    exceeds ``max_bytes``. A lookup with ``max_age`` uses that as its TTL
+    instead and never serves stale values: an older record is reloaded before
+    the lookup returns.
+
+    With a ``shared`` cache tier, records fetched from upstream are published
+    to it, and a lookup the local record cannot serve fresh first adopts a
+    newer record another worker published.
+    """
+
+    def __init__(self, fetch=None, max_bytes=8 * 1024 * 1024, max_stale=3600, clock=time.monotonic, shared=None):
+        self.fetch = fetch
+        self.shared = shared
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._records = OrderedDict()
+        self._bytes = 0
+        self._refreshing = {}
+
+    def _ttl(self, fields, max_age=None):
+        if max_age is not None:
+            return max_age
+        return min((FRESHNESS[freshness_class(field)] for field in fields), default=FRESHNESS["price"])
+
+    def _is_fresh(self, record, fields, max_age=None):
+        return record is not None and set(fields) <= record.projection and self.clock() - record.fetched_at <= self._ttl(fields, max_age)
+
+    def _store(self, symbol, record):
+        old = self._records.pop(symbol, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._records[symbol] = record
+        self._bytes += record.size
+        while self._bytes > self.max_bytes and len(self._records) > 1:
+            evicted, dropped = self._records.popitem(last=False)
+            self._bytes -= dropped.size
+            logging.debug("Info cache evicted %s", evicted)
+
+    async def _load(self, symbol, projection):
+        info = await upstream.run_shared("info", symbol, self.fetch or upstream.fetch_info)
+        if not info:
+            raise ValueError(f"No data available for symbol: {symbol}")
+        values = {field: info[field] for field in projection if field in info}
+        record = InfoRecord(values, frozenset(projection), self.clock())
+        self._store(symbol, record)
+        if self.shared is not None:
+            await self.shared.set_async("info", symbol, {"values": values, "projection": sorted(projection)}, self.max_stale)
+        return record
+
+    async def _adopt_shared(self, symbol, record, fields):
+        """Replace ``record`` by a newer shared one covering ``fields``, if any; returns the record to use."""
+        if self.shared is None:
+            return record
+        entry = await self.shared.get_async("info", symbol)
+        if entry is None:
+            return record
+        value, age = entry
+        fetched_at = self.clock() - age
+        projection = frozenset(value["projection"])
+        if not set(fields) <= projection or (record is not None and record.fetched_at >= fetched_at):
+            return record
+        adopted = InfoRecord(value["values"], projection, fetched_at)
+        self._store(symbol, adopted)
+        return adopted
+
+    def _refresh(self, symbol, projection):
+        if symbol in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._load(symbol, projection)
+            except Exception as e:
+                logging.warning("Background info refresh failed for %s: %s", symbol, e)
+            finally:
+                self._refreshing.pop(symbol, None)
+
+        self._refreshing[symbol] = asyncio.create_task(refresh())
+
+    async def get(self, symbol, fields, max_age=None):
+        """Return ``{field: value}`` for the requested fields present in ``symbol``'s info."""
+        record = self._records.get(symbol)
+        if not self._is_fresh(record, fields, max_age):
+            record = await self._adopt_shared(symbol, record, fields)
+        if record is not None and set(fields) <= record.projection:
+            age = self.clock() - record.fetched_at
+            if age <= self._ttl(fields, max_age):
+                self.hits += 1
+                self._records.move_to_end(symbol)
+                return record.project(fields)
+            if max_age is None and age <= self.max_stale:
+                self.stale_hits += 1
+                self._records.move_to_end(symbol)
+                self._refresh(symbol, record.projection)
+                return record.project(fields)
+
+        self.misses += 1
+        projection = DEFAULT_FIELDS | set(fields)
+        if record is not None:
+            projection |= record.projection
+        try:
+            fresh = await self._load(symbol, projection)
+        except CircuitOpenError:
+            if record is None or not set(fields) <= record.projection:
+                raise
+            self.stale_hits += 1
+            logging.info("Upstream unavailable, serving stale info for %s", symbol)
+            return StaleInfo(record.project(fields))
+        return fresh.project(fields)
+
+    async def warm(self, symbol, fields):
+        """Load ``symbol`` ahead of demand unless a fresh record already covers ``fields``."""
+        record = self._records.get(symbol)
+        if not self._is_fresh(record, fields):
+            record = await self._adopt_shared(symbol, record, fields)
+        projection = DEFAULT_FIELDS | set(fields)
+        if record is not None:
+            if self._is_fresh(record, fields):
+                return
+            projection |= record.projection
+        await self._load(symbol, projection)
+
+    async def iter_many(self, symbols, fields, max_age=None):
+        """Look up several symbols concurrently, yielding ``(symbol, values)`` as each finishes.
+
+        A lookup that fails yields its exception in place of the values.
+        """
+        async def lookup(symbol):
+            try:
+                return symbol, await self.get(symbol, fields, max_age)
+            except Exception as e:
+                return symbol, e
+
+        for next_done in asyncio.as_completed([lookup(symbol) for symbol in dict.fromkeys(symbols)]):
+            yield await next_done
+
+    async def get_many(self, symbols, fields):
+        """Like ``iter_many``, but wait for every symbol and return a ``{symbol: values}`` dict."""
+        return {symbol: outcome async for symbol, outcome in self.iter_many(symbols, fields)}
+
+    def snapshot(self):
+        """``[symbol, values, projection, age]`` for every record, least recently used first."""
+        now = self.clock()
+        return [[symbol, record.values, sorted(record.projection), now - record.fetched_at]
+                for symbol, record in self._records.items()]
+
+    def restore(self, entries, elapsed):
+        """Re-insert snapshot entries still within ``max_stale`` after ``elapsed`` seconds; returns how many."""
+        now = self.clock()
+        restored = 0
+        for symbol, values, projection, age in entries:
+            age += elapsed
+            if age > self.max_stale or symbol in self._records:
+                continue
+            self._store(symbol, InfoRecord(values, frozenset(projection), now - age))
+            restored += 1
+        return restored
+
+    def stats(self):
+        return {
+            "entries": len(self._records),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+
+info_cache = InfoCache(
+    max_bytes=int(os.getenv("INFO_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+    max_stale=float(os.getenv("INFO_CACHE_MAX_STALE", 3600)),
+    shared=shared_cache,
+)
@@ -0,0 +1,38 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    Reads and writes of attributes are forwarded to the real module, so
+    ``np = lazy_import("numpy")`` can be used exactly like ``import numpy as
+    np`` (including ``monkeypatch.setattr(np, ...)`` in tests). The import
+    itself goes through ``importlib``, which makes concurrent first uses from
+    several threads safe.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
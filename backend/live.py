@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from governor import CircuitOpenError
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+def intraday_points(frame):
+    """
+    Reduce a yfinance 1-minute history frame to ``(points, bar)``: points are
+    ``[epoch_ms, close, volume]`` per minute and bar is the day's running
+    OHLCV so far. Runs on the upstream pool, off the event loop.
+    """
+    if frame is None or frame.empty:
+        return [], None
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+        return [], None
+    times = pd.DatetimeIndex(frame.index).as_unit("ms").asi8
+    points = [[int(t), float(close), float(volume)] for t, close, volume in zip(times, frame["Close"], frame["Volume"].fillna(0))]
+    bar = {
+        "date": frame.index[-1].strftime("%Y-%m-%d"),
+        "Open": float(frame["Open"].iloc[0]),
+        "High": float(frame["High"].max()),
+        "Low": float(frame["Low"].min()),
+        "Close": float(frame["Close"].iloc[-1]),
+        "Volume": float(frame["Volume"].sum()),
+    }
+    return points, bar
+
+
+class LiveSymbol:
+    __slots__ = ("symbol", "subscribers", "points", "bar", "idle_since", "task")
+
+    def __init__(self, symbol, max_points):
+        self.symbol = symbol
+        self.subscribers = set()
+        self.points = deque(maxlen=max_points)
+        self.bar = None
+        self.idle_since = None
+        self.task = None
+
+
+class LiveHub:
+    """
+    Shared live-price pollers with fan-out to any number of subscribers.
+
+    Each subscribed symbol has exactly one poller, however many clients
+    watch it, calling ``fetch(symbol)`` (which returns ``(points, bar)`` as
+    from ``intraday_points``) every ``interval`` seconds. Only minutes newer
+    than the last poll are appended to the symbol's intraday series and
+    pushed, as ``{"event": "tick", "symbol", "bar", "points"}``, onto every
+    subscriber's queue; a new subscriber first gets the series so far as a
+    ``"snapshot"``. Subscriber queues are bounded: one that falls behind
+    loses its oldest messages rather than slowing the others down.
+
+    While the upstream circuit is open subscribers get a ``"status"`` event
+    and polling pauses until it may close. A poller whose last subscriber
+    left more than ``idle_timeout`` seconds ago stops, so upstream cost
+    follows the number of watched symbols, not of clients.
+    """
+
+    def __init__(self, fetch, interval=15, idle_timeout=60, max_points=1440, clock=time.monotonic):
+        self.fetch = fetch
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.max_points = max_points
+        self.clock = clock
+        self.polls = 0
+        self.errors = 0
+        self._symbols = {}
+
+    def subscribe(self, symbol, queue):
+        """Start pushing ``symbol`` updates onto ``queue``, starting its poller if needed."""
+        live = self._symbols.get(symbol)
+        if live is None:
+            live = self._symbols[symbol] = LiveSymbol(symbol, self.max_points)
+        live.subscribers.add(queue)
+        live.idle_since = None
+        if live.points:
+            deliver(queue, {"event": "snapshot", "symbol": symbol, "bar": live.bar, "points": list(live.points)})
+        if live.task is None or live.task.done():
+            live.task = asyncio.create_task(self._poll(live))
+
+    def unsubscribe(self, symbol, queue):
+        live = self._symbols.get(symbol)
+        if live is None:
+            return
+        live.subscribers.discard(queue)
+        if not live.subscribers:
+            live.idle_since = self.clock()
+
+    def _publish(self, live, message):
+        for queue in list(live.subscribers):
+            deliver(queue, message)
+
+    def _merge(self, live, points, bar):
+        """
+        Append the minutes newer than what ``live`` already has and return
+        them. The still-forming last minute is returned again whenever it
+        changed; clients replace a point whose timestamp they already have.
+        """
+        if live.bar is not None and bar is not None and bar["date"] != live.bar["date"]:
+            live.points.clear()
+        last = live.points[-1][0] if live.points else None
+        fresh = [point for point in points if last is None or point[0] >= last]
+        if fresh and fresh[0][0] == last:
+            if fresh[0] == live.points[-1]:
+                fresh = fresh[1:]
+            else:
+                live.points.pop()
+        live.points.extend(fresh)
+        if bar is not None:
+            live.bar = bar
+        return fresh
+
+    async def poll_once(self, live):
+        """Fetch ``live``'s symbol once and push any new minutes; returns how many."""
+        self.polls += 1
+        points, bar = await self.fetch(live.symbol)
+        changed = bar is not None and bar != live.bar
+        fresh = self._merge(live, points, bar)
+        if fresh or changed:
+            self._publish(live, {"event": "tick", "symbol": live.symbol, "bar": live.bar, "points": fresh})
+        return len(fresh)
+
+    async def _poll(self, live):
+        try:
+            while live.subscribers or self.clock() - live.idle_since < self.idle_timeout:
+                delay = self.interval
+                try:
+                    await self.poll_once(live)
+                except CircuitOpenError as e:
+                    self._publish(live, {"event": "status", "symbol": live.symbol, "stale": True, "retryAfter": e.retry_after})
+                    delay = max(delay, e.retry_after)
+                except Exception as e:
+                    self.errors += 1
+                    logging.warning("Live price poll failed for %s: %s", live.symbol, e)
+                await asyncio.sleep(delay)
+        finally:
+            if self._symbols.get(live.symbol) is live and not live.subscribers:
+                del self._symbols[live.symbol]
+                logging.info("Stopped live prices for idle symbol %s", live.symbol)
+
+    async def stop(self):
+        tasks = [live.task for live in self._symbols.values() if live.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._symbols.clear()
+
+    def stats(self):
+        return {
+            "symbols": len(self._symbols),
+            "subscribers": sum(len(live.subscribers) for live in self._symbols.values()),
+            "polls": self.polls,
+            "errors": self.errors,
+        }
+
+
+def parse_live_symbols(symbols, limit):
+    """Uppercased, de-duplicated symbols from a comma-separated string or a list; at most ``limit``."""
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    if not isinstance(symbols, list):
+        raise ValueError("Symbols must be a list or a comma-separated string")
+    symbol_list = list(dict.fromkeys(str(symbol).strip().upper() for symbol in symbols if str(symbol).strip()))
+    if len(symbol_list) > limit:
+        raise ValueError(f"At most {limit} symbols can be watched at once")
+    return symbol_list
+
+
+def deliver(queue, message):
+    """Put ``message`` on a bounded queue, dropping its oldest message when full."""
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(message)
+
+
+LIVE_INTERVAL = float(os.getenv("LIVE_INTERVAL", 15))
+LIVE_IDLE_TIMEOUT = float(os.getenv("LIVE_IDLE_TIMEOUT", 60))
+LIVE_MAX_SYMBOLS = int(os.getenv("LIVE_MAX_SYMBOLS", 20))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", 100))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", 15))
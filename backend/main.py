@@ -1,19 +1,73 @@
-from fastapi import FastAPI, HTTPException, Query
+from startup import startup_report
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-import yfinance as yf
 import logging
-from datetime import datetime
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 import os
-from openai import OpenAI
+import importlib
 import json
 from dotenv import load_dotenv
-import traceback
+startup_report.mark("import framework")
 
-# Load environment variables from .env file
+# Load environment variables from .env file before importing the app
+# modules, which read their configuration at import time.
 load_dotenv()
 
-app = FastAPI()
+from price_store import price_store, price_matrix, parse_date, slice_history
+import upstream
+import telemetry
+from governor import CircuitOpenError
+from info_cache import info_cache
+from news_cache import news_cache
+from plan_cache import plan_cache
+from shared_cache import shared_cache
+from fast_planner import plan_query, AVAILABLE_METRICS
+from plan_stream import ActionStreamParser
+from streaming import stream_response, wants_stream
+import wire
+from downsample import downsample_matrix, METHODS as DOWNSAMPLE_METHODS
+from transforms import align, transform_matrix, TRANSFORMS, REFERENCE_TRANSFORMS, FILL_RULES
+from snapshot import SnapshotStore, Snapshotter, SNAPSHOT_ENABLED, SNAPSHOT_DIR, SNAPSHOT_INTERVAL
+from prefetch import (
+    Prefetcher, PREFETCH_ENABLED, PREFETCH_SEEDS, PREFETCH_TOP_N, PREFETCH_INTERVAL, PREFETCH_MAX_CALLS,
+    PREFETCH_HISTORY_DAYS,
+)
+from screener import (
+    Screener, parse_filters, SCREENER_ENABLED, SCREENER_UNIVERSE, SCREENER_INTERVAL, SCREENER_BATCH, SCREENER_MAX_LIMIT,
+)
+from live import (
+    LiveHub, intraday_points, parse_live_symbols, deliver, LIVE_INTERVAL, LIVE_IDLE_TIMEOUT, LIVE_MAX_SYMBOLS,
+    LIVE_QUEUE_SIZE, LIVE_HEARTBEAT,
+)
+startup_report.mark("import app modules")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Heavy dependencies are imported in the background once the server is
+    # accepting connections, so health checks answer right away.
+    warm_up = asyncio.get_running_loop().run_in_executor(None, startup_report.warm_up, WARMUP_STEPS)
+    if SNAPSHOT_ENABLED:
+        snapshotter.start()
+    if PREFETCH_ENABLED:
+        # The first cycle waits for the snapshot restore, or it would fetch
+        # the seeds from upstream just before the restore could have.
+        prefetcher.start(after=snapshotter.wait_restored() if SNAPSHOT_ENABLED else None)
+    if SCREENER_ENABLED:
+        screener.start()
+    yield
+    await warm_up
+    await prefetcher.stop()
+    await screener.stop()
+    await live_hub.stop()
+    if SNAPSHOT_ENABLED:
+        await snapshotter.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,183 +81,729 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Plan-Source", "ETag", "X-Stale-Symbols"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(telemetry.TelemetryMiddleware)
 
-logging.basicConfig(level=logging.DEBUG)
+telemetry.configure_logging(os.getenv("LOG_LEVEL", "INFO"), float(os.getenv("LOG_SAMPLE_RATE", 1)))
 
-# Initialize the OpenAI client with the API key from .env
-client = OpenAI(api_key=os.getenv("REACT_APP_OPENAI_API_KEY"))
+_client = None
 
-@app.get("/api/stock_data")
-async def get_stock_data(symbols: str = Query(...), start_date: str = Query(...), end_date: str = Query(...)):
-    logging.info(f"Received request for stock data: symbols={symbols}, start_date={start_date}, end_date={end_date}")
-    symbol_list = symbols.split(',')
+def get_client():
+    """The async OpenAI client, built (and the openai package imported) on first use."""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+        # Initialize the OpenAI client with the API key from .env
+        _client = AsyncOpenAI(api_key=os.getenv("REACT_APP_OPENAI_API_KEY"))
+    return _client
+
+WARMUP_STEPS = [
+    ("pandas", lambda: importlib.import_module("pandas")),
+    ("yfinance", lambda: importlib.import_module("yfinance")),
+    ("openai", get_client),
+]
+
+def load_history(symbol, start_date, end_date):
+    return price_store.get_history(symbol, start_date, end_date, upstream.fetch_history)
+
+async def shared_history(symbol, start_date, end_date):
+    """load_history, sharing any in-flight load of the same symbol whose range covers this one."""
+    span = (parse_date(start_date), parse_date(end_date))
+    try:
+        hist = await upstream.run_shared("history", symbol, load_history, start_date, end_date, span=span)
+    except CircuitOpenError:
+        hist = await upstream.run_blocking(price_store.read_cached, symbol, start_date, end_date)
+        if hist.empty:
+            raise
+        logging.info("Upstream unavailable, serving stale history for %s", symbol)
+        hist.attrs["stale"] = True
+        return hist
+    return slice_history(hist, start_date, end_date)
+
+def is_stale(data):
+    """Whether data was served from cache because upstream is unavailable."""
+    return getattr(data, "stale", False) is True or bool(getattr(data, "attrs", {}).get("stale"))
+
+def stale_header(response, data_by_symbol):
+    stale = [symbol for symbol, data in data_by_symbol.items() if is_stale(data)]
+    if stale:
+        response.headers["X-Stale-Symbols"] = ",".join(stale)
+    return response
+
+def upstream_unavailable(error):
+    return HTTPException(
+        status_code=503,
+        detail="Upstream data source is temporarily unavailable",
+        headers={"Retry-After": str(max(1, int(error.retry_after)))},
+    )
+
+async def warm_history(symbol):
+    end = date.today()
+    await shared_history(symbol, (end - timedelta(days=PREFETCH_HISTORY_DAYS)).isoformat(), end.isoformat())
+
+async def warm_info(symbol):
+    await info_cache.warm(symbol, AVAILABLE_METRICS)
+
+async def warm_news(symbol):
+    await news_cache.get(symbol)
+
+# Keeps the caches warm for the seed list and the most requested symbols, so
+# the first users after a cold start don't pay for every upstream fetch.
+prefetcher = Prefetcher(
+    {"history": warm_history, "info": warm_info, "news": warm_news},
+    upstream.governor,
+    seeds=PREFETCH_SEEDS,
+    top_n=PREFETCH_TOP_N,
+    interval=PREFETCH_INTERVAL,
+    max_calls=PREFETCH_MAX_CALLS,
+)
+
+def record_requested(symbols):
+    """Count symbols a request returned data for towards the prefetcher's popularity ranking."""
+    prefetcher.record([symbol.strip().upper() for symbol in symbols if symbol.strip()])
+
+def screen_rows(symbols, fields):
+    # Bypass stale serving: a rebuild waits for values at most one refresh
+    # interval old rather than kicking off background refreshes it never sees.
+    return info_cache.iter_many(symbols, fields, max_age=SCREENER_INTERVAL)
+
+# Columnar table of the planner's metrics over the screener universe, rebuilt
+# in the background so screens never wait on upstream.
+screener = Screener(
+    screen_rows,
+    SCREENER_UNIVERSE,
+    AVAILABLE_METRICS,
+    interval=SCREENER_INTERVAL,
+    batch=SCREENER_BATCH,
+    governor=upstream.governor,
+)
+
+def fetch_live_points(symbol):
+    return intraday_points(upstream.fetch_intraday(symbol))
+
+async def live_points(symbol):
+    return await upstream.run_shared("intraday", symbol, fetch_live_points)
+
+# One poller per watched symbol, fanned out to every client watching it.
+live_hub = LiveHub(live_points, interval=LIVE_INTERVAL, idle_timeout=LIVE_IDLE_TIMEOUT)
+
+# Info, news and plan caches are snapshotted to disk so a restarted machine
+# does not start cold; price series already live on disk in the price store.
+snapshotter = Snapshotter(
+    SnapshotStore(SNAPSHOT_DIR),
+    {"info": info_cache, "news": news_cache, "plans": plan_cache},
+    interval=SNAPSHOT_INTERVAL,
+)
 
+plan_sources = telemetry.registry.counter("query_plans_total", "Query plans by source (fast_path, cache or llm).")
+
+@telemetry.registry.collector
+def component_metrics():
+    """Cache, upstream governor, coalescing and prefetch figures, read at scrape time."""
+    caches = {"info": info_cache.stats(), "news": news_cache.stats(), "plan": plan_cache.stats(), "price": price_store.stats()}
+    if shared_cache is not None:
+        caches["shared"] = shared_cache.stats()
+    hits = {name: stats["hits"] + stats.get("stale_hits", 0) for name, stats in caches.items()}
+    governor = upstream.governor.stats()
+    flights = upstream.flights.stats()
+    return [
+        ("cache_hits_total", "counter", "Cache lookups served from the cache (stale included).",
+         [({"cache": name}, value) for name, value in hits.items()]),
+        ("cache_misses_total", "counter", "Cache lookups that had to load the value.",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("cache_hit_ratio", "gauge", "Share of cache lookups served from the cache.",
+         [({"cache": name}, hits[name] / (hits[name] + stats["misses"])) for name, stats in caches.items() if hits[name] + stats["misses"]]),
+        ("upstream_retries_total", "counter", "Upstream call attempts that were retried.", [({}, governor["retries"])]),
+        ("upstream_rejected_total", "counter", "Upstream calls refused by an open circuit.", [({}, governor["rejected"])]),
+        ("upstream_concurrency_limit", "gauge", "Current adaptive upstream concurrency limit.", [({}, governor["concurrency_limit"])]),
+        ("upstream_in_flight", "gauge", "Upstream calls currently running.", [({}, governor["in_flight"])]),
+        ("upstream_circuit_open", "gauge", "1 while the host's circuit breaker is open.",
+         [({"host": host}, int(state == "open")) for host, state in governor["circuits"].items()]),
+        ("upstream_shared_calls_total", "counter", "Upstream loads shared with an identical in-flight load.", [({}, flights["shared"])]),
+        ("prefetch_warmed_total", "counter", "Cache entries warmed by the prefetcher.", [({}, prefetcher.warmed)]),
+        ("screener_rows", "gauge", "Symbols in the current screener table.", [({}, screener.stats()["rows"])]),
+        ("live_symbols", "gauge", "Symbols with a live price poller.", [({}, live_hub.stats()["symbols"])]),
+        ("live_subscribers", "gauge", "Live price subscriptions across all clients.", [({}, live_hub.stats()["subscribers"])]),
+    ]
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(telemetry.registry.render(), media_type="text/plain; version=0.0.4")
+
+startup_report.mark("init app")
+
+@app.get("/api/health")
+async def health():
+    """Liveness: answers as soon as the app is up, without touching upstream."""
+    return {"status": "ok", "ready": startup_report.ready}
+
+@app.get("/api/ready")
+async def ready():
+    """Readiness plus the startup-time report; 503 until the background warm-up has run."""
+    report = startup_report.report()
+    return JSONResponse(report, status_code=200 if startup_report.ready else 503)
+
+def checked_history(symbol, hist):
+    """Return one symbol's history, mapping an empty frame or the exception fetching it raised to an HTTPException."""
+    try:
+        if isinstance(hist, BaseException):
+            raise hist
+        if hist.empty:
+            raise HTTPException(status_code=404, detail=f"No data available for symbol: {symbol}")
+        logging.info("Successfully fetched data for %s: %s data points", symbol, len(hist))
+        return hist
+    except HTTPException as he:
+        raise he
+    except asyncio.TimeoutError:
+        logging.error("Timed out fetching data for %s", symbol)
+        raise HTTPException(status_code=504, detail=f"Timed out fetching data for {symbol}")
+    except CircuitOpenError as e:
+        logging.error("Upstream unavailable fetching data for %s: %s", symbol, e)
+        raise upstream_unavailable(e)
+    except Exception as e:
+        logging.error("Error fetching data for %s: %s", symbol, e)
+        logging.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error fetching data for {symbol}: {str(e)}")
+
+def close_series(hist):
+    return dict(zip(hist.index.strftime('%Y-%m-%d'), hist['Close'].tolist()))
+
+def symbol_close_series(symbol, hist, max_points=None, key_dates=(), method="lttb"):
+    hist = checked_history(symbol, hist)
+    if max_points:
+        return close_series_dict(shaped_matrix({symbol: hist}, max_points=max_points, key_dates=key_dates, method=method))[symbol]
+    return close_series(hist)
+
+def shaped_matrix(histories, columns=("Close",), fill="none", transform="none", reference=None, max_points=None, key_dates=(), method="lttb"):
+    """Align histories on one date axis, then apply the requested transform and downsampling."""
+    with telemetry.stage("transform"):
+        matrix = align(price_matrix(histories, columns), fill)
+        matrix = transform_matrix(matrix, transform, reference)
+        return downsample_matrix(matrix, max_points, key_dates, method)
+
+def close_series_dict(matrix):
+    """Build the default {symbol: {date: close}} payload from a price matrix."""
+    with telemetry.stage("serialize"):
+        return {symbol: close_series(matrix[symbol].dropna()) for symbol in matrix.columns.unique(level=0)}
+
+def parse_key_dates(key_dates):
+    if not key_dates:
+        return []
+    try:
+        return [datetime.strptime(value.strip(), '%Y-%m-%d').strftime('%Y-%m-%d') for value in key_dates.split(',')]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid key_dates: {key_dates}")
+
+def plan_key_dates(plan):
+    """The well-formed 'YYYY-MM-DD' dates in a plan's keyDates."""
+    dates = []
+    for event in plan.get("keyDates") or []:
+        try:
+            dates.append(datetime.strptime(event["date"], '%Y-%m-%d').strftime('%Y-%m-%d'))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return dates
+
+def resolve_end_date(end_date):
     if end_date == 'current':
         end_date = datetime.now().strftime('%Y-%m-%d')
-        logging.info(f"End date 'current' interpreted as: {end_date}")
+        logging.info("End date 'current' interpreted as: %s", end_date)
+    return end_date
 
-    logging.info(f"Fetching data for symbols: {symbol_list}, start: {start_date}, end: {end_date}")
+async def load_histories(symbol_list, start_date, end_date):
+    """Fetch every symbol's history concurrently, raising the first failure in request order."""
+    results = await upstream.gather_symbols(shared_history, symbol_list, start_date, end_date)
+    return {symbol: checked_history(symbol, results[symbol]) for symbol in symbol_list}
 
-    data = {}
-    for symbol in symbol_list:
-        try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(start=start_date, end=end_date)
-            if hist.empty:
-                raise HTTPException(status_code=404, detail=f"No data available for symbol: {symbol}")
-            data[symbol] = hist['Close'].to_dict()
-            data[symbol] = {date.strftime('%Y-%m-%d'): price for date, price in data[symbol].items()}
-            logging.info(f"Successfully fetched data for {symbol}: {len(data[symbol])} data points")
-        except HTTPException as he:
-            raise he
-        except Exception as e:
-            logging.error(f"Error fetching data for {symbol}: {str(e)}")
-            logging.debug(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"Error fetching data for {symbol}: {str(e)}")
-
-    if not data:
+def symbol_metrics(symbol, info, metric_list):
+    """Pick the requested metrics out of one symbol's info (or the exception fetching it raised)."""
+    try:
+        if isinstance(info, BaseException):
+            raise info
+
+        values = {}
+        for metric in metric_list:
+            if metric in info:
+                value = info[metric]
+                if isinstance(value, (int, float)):
+                    values[metric] = value
+                else:
+                    values[metric] = str(value)
+            else:
+                values[metric] = 'N/A'
+                logging.debug("%s - Metric not found: %s", symbol, metric)
+
+        if all(value == 'N/A' for value in values.values()):
+            raise ValueError(f"No valid metrics found for symbol: {symbol}")
+
+        logging.info("Successfully fetched metrics for %s", symbol)
+        return values
+    except ValueError as ve:
+        logging.error("Error fetching metrics for %s: %s", symbol, ve)
+        raise HTTPException(status_code=404, detail=str(ve))
+    except asyncio.TimeoutError:
+        logging.error("Timed out fetching metrics for %s", symbol)
+        raise HTTPException(status_code=504, detail=f"Timed out fetching metrics for {symbol}")
+    except CircuitOpenError as e:
+        logging.error("Upstream unavailable fetching metrics for %s: %s", symbol, e)
+        raise upstream_unavailable(e)
+    except Exception as e:
+        logging.error("Error fetching metrics for %s: %s", symbol, e)
+        logging.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error fetching metrics for {symbol}: {str(e)}")
+
+def symbol_record(symbol, convert, *args):
+    """Build a per-symbol stream record, reporting failures instead of raising them."""
+    try:
+        record = {"event": "symbol", "symbol": symbol, "data": convert(symbol, *args)}
+        if is_stale(args[0]):
+            record["stale"] = True
+        return record
+    except HTTPException as he:
+        return {"event": "symbol", "symbol": symbol, "error": {"status": he.status_code, "detail": he.detail}}
+
+@app.get("/api/stock_data")
+async def get_stock_data(
+    request: Request,
+    symbols: str = Query(...),
+    start_date: str = Query(...),
+    end_date: str = Query(...),
+    stream: str = Query(None),
+    response_format: str = Query("dict", alias="format"),
+    columns: str = Query("Close"),
+    max_points: int = Query(None, ge=3),
+    downsample: str = Query("lttb"),
+    key_dates: str = Query(None),
+    transform: str = Query("none"),
+    reference: str = Query(None),
+    fill: str = Query(None),
+):
+    logging.info("Received request for stock data: symbols=%s, start_date=%s, end_date=%s", symbols, start_date, end_date)
+    symbol_list = symbols.split(',')
+    end_date = resolve_end_date(end_date)
+
+    logging.info("Fetching data for symbols: %s, start: %s, end: %s", symbol_list, start_date, end_date)
+
+    if transform not in TRANSFORMS:
+        raise HTTPException(status_code=400, detail=f"Unsupported transform: {transform}")
+    if transform in REFERENCE_TRANSFORMS:
+        reference = reference or symbol_list[0]
+        if reference not in symbol_list:
+            raise HTTPException(status_code=400, detail=f"Reference symbol {reference} is not among the requested symbols")
+        if not set(symbol_list) - {reference}:
+            raise HTTPException(status_code=400, detail=f"The {transform} transform needs at least one symbol besides the reference {reference}")
+    fill = fill or ("ffill" if transform != "none" else "none")
+    if fill not in FILL_RULES:
+        raise HTTPException(status_code=400, detail=f"Unsupported fill rule: {fill}")
+
+    if response_format not in wire.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {response_format}")
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported downsample method: {downsample}")
+    column_list = wire.parse_columns(columns) if transform == "none" else ["Close"]
+    key_date_list = parse_key_dates(key_dates)
+
+    if wants_stream(stream):
+        if transform != "none":
+            raise HTTPException(status_code=400, detail="Transforms are not supported on streamed responses")
+        if response_format != "dict" or column_list != ["Close"]:
+            raise HTTPException(status_code=400, detail="Streamed responses only carry Close prices in the dict format")
+        async def records():
+            async for symbol, hist in upstream.iter_symbols(shared_history, symbol_list, start_date, end_date):
+                record = symbol_record(symbol, symbol_close_series, hist, max_points, key_date_list, downsample)
+                if "data" in record:
+                    record_requested([symbol])
+                yield record
+        return stream_response(records(), stream)
+
+    if response_format == "dict" and column_list != ["Close"]:
+        raise HTTPException(status_code=400, detail="The dict format only carries Close prices; use format=columnar or msgpack for other columns")
+
+    histories = await load_histories(symbol_list, start_date, end_date)
+
+    if not histories:
         raise HTTPException(status_code=404, detail="No valid data found for any of the provided symbols")
 
-    logging.info(f"Returning data for {len(data)} symbols")
-    return data
+    record_requested(histories)
+    logging.info("Returning data for %s symbols", len(histories))
+    matrix = shaped_matrix(histories, column_list, fill, transform, reference, max_points, key_date_list, downsample)
+    if response_format == "dict":
+        response = JSONResponse(close_series_dict(matrix))
+    else:
+        with telemetry.stage("serialize"):
+            response = wire.columnar_response(matrix, response_format)
+    return wire.conditional_response(request, stale_header(response, histories))
 
 @app.get("/api/stock_metrics")
-async def get_stock_metrics(symbols: str = Query(...), metrics: str = Query(...)):
-    logging.info(f"Received request for stock metrics: symbols={symbols}, metrics={metrics}")
+async def get_stock_metrics(symbols: str = Query(...), metrics: str = Query(...), stream: str = Query(None), response: Response = None):
+    logging.info("Received request for stock metrics: symbols=%s, metrics=%s", symbols, metrics)
     symbol_list = symbols.split(',')
     metric_list = metrics.split(',')
 
-    result = {}
-    for symbol in symbol_list:
-        logging.info(f"Fetching metrics for {symbol}")
-        try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-
-            if not info or len(info) == 0:
-                raise ValueError(f"No data available for symbol: {symbol}")
-
-            symbol_metrics = {}
-            for metric in metric_list:
-                if metric in info:
-                    value = info[metric]
-                    if isinstance(value, (int, float)):
-                        symbol_metrics[metric] = value
-                    else:
-                        symbol_metrics[metric] = str(value)
-                    logging.debug(f"{symbol} - {metric}: {symbol_metrics[metric]}")
-                else:
-                    symbol_metrics[metric] = 'N/A'
-                    logging.warning(f"{symbol} - Metric not found: {metric}")
-            
-            if all(value == 'N/A' for value in symbol_metrics.values()):
-                raise ValueError(f"No valid metrics found for symbol: {symbol}")
-            
-            result[symbol] = symbol_metrics
-            logging.info(f"Successfully fetched metrics for {symbol}")
-        except ValueError as ve:
-            logging.error(f"Error fetching metrics for {symbol}: {str(ve)}")
-            raise HTTPException(status_code=404, detail=str(ve))
-        except Exception as e:
-            logging.error(f"Error fetching metrics for {symbol}: {str(e)}")
-            logging.debug(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"Error fetching metrics for {symbol}: {str(e)}")
+    logging.info("Fetching metrics for %s", symbol_list)
+
+    if wants_stream(stream):
+        async def records():
+            async for symbol, info in info_cache.iter_many(symbol_list, metric_list):
+                record = symbol_record(symbol, symbol_metrics, info, metric_list)
+                if "data" in record:
+                    record_requested([symbol])
+                yield record
+        return stream_response(records(), stream)
+
+    with telemetry.stage("cache", "info"):
+        infos = await info_cache.get_many(symbol_list, metric_list)
+    result = {symbol: symbol_metrics(symbol, infos[symbol], metric_list) for symbol in symbol_list}
 
     if not result:
         raise HTTPException(status_code=404, detail="No valid data found for any of the provided symbols")
 
-    logging.info(f"Returning metrics for {len(result)} symbols")
+    record_requested(result)
+    logging.info("Returning metrics for %s symbols", len(result))
+    if response is not None:
+        stale_header(response, infos)
     return result
 
+async def run_screen(filters=None, sort=None, order="asc", limit=20, metrics=None):
+    """Screen the universe table; ``filters`` is a filter string or a list of filters."""
+    table = await screener.current()
+    try:
+        if isinstance(filters, str):
+            filters = parse_filters(filters)
+        with telemetry.stage("screen"):
+            matched, rows = table.screen(
+                filters or [], sort, descending=str(order).lower() == "desc",
+                limit=max(1, min(int(limit or 20), SCREENER_MAX_LIMIT)), columns=metrics or None,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"asOf": screener.as_of(), "universe": len(table), "matched": matched, "results": rows}
+
+@app.get("/api/screen")
+async def screen_stocks(
+    filters: str = Query(None),
+    sort: str = Query(None),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(20, ge=1),
+    metrics: str = Query(None),
+):
+    logging.info("Received screen request: filters=%s, sort=%s %s, limit=%s", filters, sort, order, limit)
+    return await run_screen(filters, sort, order, limit, metrics.split(",") if metrics else None)
+
 class QueryRequest(BaseModel):
     query: str
 
-@app.post("/api/process_query")
-async def process_query(request: QueryRequest):
-    query = request.query
-    logging.info(f"Received query: {query}")
+def plan_messages(query):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an intelligent assistant specializing in stock market analysis. Your task is to interpret user queries about stocks and provide comprehensive insights. When faced with ambiguous or open-ended requests, you have the autonomy to decide which actions and data would be most valuable to the user. Here are your guidelines:\n\n"
+                "1. Interpret the user's intent and provide a holistic response that may include multiple types of data and analyses.\n"
+                "2. For comparison queries, consider including both historical price data and relevant financial metrics.\n"
+                "3. When specific metrics aren't requested, choose metrics that you believe are most relevant to the stocks and context of the query.\n"
+                "4. Only include news data when it is specifically requested in the query.\n"
+                "5. For general queries about a stock's performance, provide a mix of historical data and key metrics.\n"
+                "6. Always aim to provide the most insightful and comprehensive response possible, utilizing all available data sources at your disposal.\n"
+                "7. When retrieving historical stock price data, identify and include key dates that might be significant for the stock's performance. These could include earnings release dates, major company announcements, or notable market events.\n"
+                "8. If the query implies a need for the most recent data, use 'current' as the end date. The backend will interpret this and fetch the most up-to-date information available.\n"
+                "9. When asked to present a graph or chart, interpret this as a request for historical data (use 'getHistory' action type). The frontend will handle the actual graph rendering.\n"
+                "10. When a user asks to show events or significant dates related to a stock, include this information in the 'keyDates' array. Each entry should have a date, description, and associated symbol.\n"
+                "11. When a user asks to find, rank or filter stocks across the market rather than named ones (e.g. 'cheapest tech stocks by forward P/E'), use a 'screen' action instead of guessing symbols.\n\n"
+                "Return a JSON object with the following fields:\n"
+                "- 'actions' (array of action objects, each containing:)\n"
+                "  - 'type' (one or more of: 'getHistory', 'getNews', 'getMetrics', 'screen')\n"
+                "  - 'symbols' (array of stock tickers; empty for 'screen')\n"
+                "  - 'startDate' (YYYY-MM-DD format)\n"
+                "  - 'endDate' (YYYY-MM-DD format or 'current' for the most recent data)\n"
+                "  - 'metrics' (array of requested financial metrics, if applicable)\n"
+                "  - for 'screen' only: 'filters' (array of objects with 'metric', 'op' (one of <, <=, >, >=, =, !=) and 'value'; "
+                "'sector' and 'industry' can be filtered with = or !=, e.g. {\"metric\": \"sector\", \"op\": \"=\", \"value\": \"Technology\"}), "
+                "'sort' (a metric to rank by), 'order' ('asc' or 'desc') and 'limit' (number of stocks, at most " + str(SCREENER_MAX_LIMIT) + ")\n"
+                "- 'description' (a brief explanation of your analysis approach)\n"
+                "- 'keyDates' (array of objects with 'date', 'description', and 'symbol' fields for significant events)\n\n"
+                "Note: The 'keyDates' array is very important. It should contain dates that are significant for the stock's performance. This could include earnings release dates, major company announcements, or notable market events. If the user asks to see the stock in reference to something, mark those dates and related dates as key dates.\n"
+                "For example, if the user asks for insight about tesla car releases, you should include the key dates for tesla car releases in the keyDates array."
+                "Available metrics include: " + ", ".join(AVAILABLE_METRICS) + ".\n"
+                "Ensure your response is a valid JSON object without any additional formatting."
+            ),
+        },
+        {"role": "user", "content": query},
+    ]
+
+def plan_actions(plan):
+    if not isinstance(plan, dict):
+        return []
+    return [action for action in plan.get("actions", []) if isinstance(action, dict)]
+
+async def stream_plan(query):
+    """
+    Plan a query via the fast path, the plan cache or the LLM.
+
+    Yields ``("action", action)`` for each of the plan's actions as soon as it
+    is known, then ``("plan", (plan, source))``. With the LLM, the completion is
+    streamed and each action is yielded as soon as the model has finished
+    writing it, before the rest of the plan arrives.
+    """
+    logging.info("Received query: %s", query)
 
     if not query:
         logging.warning("No query provided")
         raise HTTPException(status_code=400, detail="No query provided")
 
+    with telemetry.stage("fast_path"):
+        fast_plan = plan_query(query)
+    if fast_plan is not None:
+        logging.info("Serving query plan from fast path")
+        plan_sources.inc(source="fast_path")
+        for action in plan_actions(fast_plan):
+            yield "action", action
+        yield "plan", (fast_plan, "fast_path")
+        return
+
+    with telemetry.stage("cache", "plan"):
+        cached = await plan_cache.get(query)
+    if cached is not None:
+        logging.info("Serving query plan from cache")
+        plan_sources.inc(source="cache")
+        for action in plan_actions(cached):
+            yield "action", action
+        yield "plan", (cached, "cache")
+        return
+
+    parser = ActionStreamParser()
     try:
         logging.info("Sending request to OpenAI API")
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an intelligent assistant specializing in stock market analysis. Your task is to interpret user queries about stocks and provide comprehensive insights. When faced with ambiguous or open-ended requests, you have the autonomy to decide which actions and data would be most valuable to the user. Here are your guidelines:\n\n"
-                        "1. Interpret the user's intent and provide a holistic response that may include multiple types of data and analyses.\n"
-                        "2. For comparison queries, consider including both historical price data and relevant financial metrics.\n"
-                        "3. When specific metrics aren't requested, choose metrics that you believe are most relevant to the stocks and context of the query.\n"
-                        "4. Only include news data when it is specifically requested in the query.\n"
-                        "5. For general queries about a stock's performance, provide a mix of historical data and key metrics.\n"
-                        "6. Always aim to provide the most insightful and comprehensive response possible, utilizing all available data sources at your disposal.\n"
-                        "7. When retrieving historical stock price data, identify and include key dates that might be significant for the stock's performance. These could include earnings release dates, major company announcements, or notable market events.\n"
-                        "8. If the query implies a need for the most recent data, use 'current' as the end date. The backend will interpret this and fetch the most up-to-date information available.\n"
-                        "9. When asked to present a graph or chart, interpret this as a request for historical data (use 'getHistory' action type). The frontend will handle the actual graph rendering.\n"
-                        "10. When a user asks to show events or significant dates related to a stock, include this information in the 'keyDates' array. Each entry should have a date, description, and associated symbol.\n\n"
-                        "Return a JSON object with the following fields:\n"
-                        "- 'actions' (array of action objects, each containing:)\n"
-                        "  - 'type' (one or more of: 'getHistory', 'getNews', 'getMetrics',)\n"
-                        "  - 'symbols' (array of stock tickers)\n"
-                        "  - 'startDate' (YYYY-MM-DD format)\n"
-                        "  - 'endDate' (YYYY-MM-DD format or 'current' for the most recent data)\n"
-                        "  - 'metrics' (array of requested financial metrics, if applicable)\n"
-                        "- 'description' (a brief explanation of your analysis approach)\n"
-                        "- 'keyDates' (array of objects with 'date', 'description', and 'symbol' fields for significant events)\n\n"
-                        "Note: The 'keyDates' array is very important. It should contain dates that are significant for the stock's performance. This could include earnings release dates, major company announcements, or notable market events. If the user asks to see the stock in reference to something, mark those dates and related dates as key dates.\n"
-                        "For example, if the user asks for insight about tesla car releases, you should include the key dates for tesla car releases in the keyDates array."
-                        "Available metrics include: marketCap, trailingPE, forwardPE, dividendYield, beta, fiftyTwoWeekHigh, fiftyDayAverage, twoHundredDayAverage, averageVolume, regularMarketPrice, regularMarketDayHigh, regularMarketDayLow, totalCash, totalCashPerShare, debtToEquity, returnOnEquity, freeCashflow, operatingCashflow, earningsGrowth, revenueGrowth, grossMargins, operatingMargins, profitMargins, bookValue, priceToBook, earningsQuarterlyGrowth, netIncomeToCommon, trailingEps, forwardEps, pegRatio, enterpriseToRevenue, enterpriseToEbitda, 52WeekChange, SandP52WeekChange, lastDividendValue, lastDividendDate.\n"
-                        "Ensure your response is a valid JSON object without any additional formatting."
-                    ),
-                },
-                {"role": "user", "content": query},
-            ],
-        )
-        
-
-        raw_response = completion.choices[0].message.content
-        logging.debug(f"Raw response from OpenAI: {raw_response}")
+        with telemetry.stage("llm"):
+            completion = await get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=plan_messages(query),
+                stream=True,
+            )
+            async for chunk in completion:
+                if not chunk.choices:
+                    continue
+                for action in parser.feed(chunk.choices[0].delta.content or ""):
+                    logging.debug("Streamed action from OpenAI: %s", action)
+                    yield "action", action
+
+        raw_response = parser.text
+        logging.debug("Raw response from OpenAI: %s", raw_response)
 
         cleaned_content = raw_response.replace("```json\n", "").replace("\n```", "").strip()
-        result = json.loads(cleaned_content)
+        with telemetry.stage("parse"):
+            result = json.loads(cleaned_content)
         logging.info("Successfully processed query and parsed JSON response")
-        return result
+        await plan_cache.put(query, result)
     except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON response: {str(e)}")
-        logging.debug(f"Problematic content: {cleaned_content}")
+        logging.error("Error decoding JSON response: %s", e)
+        logging.debug("Problematic content: %s", cleaned_content)
         raise HTTPException(status_code=500, detail="Failed to parse API response")
     except Exception as e:
-        logging.error(f"Error processing query: {str(e)}")
-        logging.debug(traceback.format_exc())
+        logging.error("Error processing query: %s", e)
+        logging.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process query")
 
+    plan_sources.inc(source="llm")
+    for action in plan_actions(result)[parser.emitted:]:
+        yield "action", action
+    yield "plan", (result, "llm")
+
+async def build_plan(query):
+    """Plan a query via the fast path, the plan cache or the LLM; returns (plan, source)."""
+    async for kind, value in stream_plan(query):
+        if kind == "plan":
+            return value
+
+@app.post("/api/process_query")
+async def process_query(request: QueryRequest, response: Response):
+    result, source = await build_plan(request.query)
+    response.headers["X-Plan-Source"] = source
+    return result
+
 @app.get("/api/stock_news")
-async def get_stock_news(symbol: str = Query(...)):
-    logging.info(f"Received news request for symbol: {symbol}")
+async def get_stock_news(symbol: str = Query(...), response: Response = None):
+    logging.info("Received news request for symbol: %s", symbol)
     if not symbol:
         raise HTTPException(status_code=400, detail="No symbol provided")
 
     try:
-        stock = yf.Ticker(symbol)
-        news = stock.news
+        with telemetry.stage("cache", "news"):
+            news = await news_cache.get(symbol)
         if not news:
             raise ValueError(f"No news data available for symbol: {symbol}")
-        logging.info(f"Fetched {len(news)} news items for {symbol}")
+        logging.info("Fetched %s news items for %s", len(news), symbol)
+        record_requested([symbol])
+        if response is not None:
+            stale_header(response, {symbol: news})
         return news[:8]  # Return the first 8 news items
     except ValueError as ve:
-        logging.error(f"Error fetching news for {symbol}: {str(ve)}")
+        logging.error("Error fetching news for %s: %s", symbol, ve)
         raise HTTPException(status_code=404, detail=str(ve))
+    except asyncio.TimeoutError:
+        logging.error("Timed out fetching news for %s", symbol)
+        raise HTTPException(status_code=504, detail=f"Timed out fetching news for {symbol}")
+    except CircuitOpenError as e:
+        logging.error("Upstream unavailable fetching news for %s: %s", symbol, e)
+        raise upstream_unavailable(e)
     except Exception as e:
-        logging.error(f"Error fetching news for {symbol}: {str(e)}")
-        logging.debug(traceback.format_exc())
+        logging.error("Error fetching news for %s: %s", symbol, e)
+        logging.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch news data: {str(e)}")
 
+async def no_key_dates():
+    return []
+
+async def run_action(action, max_points=None, key_dates=None):
+    """
+    Run one plan action. ``key_dates`` is an awaitable of the plan's key dates;
+    it is awaited only once the history is loaded, so data can be fetched
+    while the rest of the plan is still being streamed.
+    """
+    action_type = action.get("type")
+    symbols = action.get("symbols") or []
+    if action_type == "getHistory":
+        histories = await load_histories(symbols, action.get("startDate"), resolve_end_date(action.get("endDate") or "current"))
+        record_requested(histories)
+        key_date_list = await (key_dates if key_dates is not None else no_key_dates())
+        return close_series_dict(shaped_matrix(histories, max_points=max_points, key_dates=key_date_list))
+    if action_type == "getMetrics":
+        return await get_stock_metrics(symbols=",".join(symbols), metrics=",".join(action.get("metrics") or []), stream=None)
+    if action_type == "getNews":
+        news = await asyncio.gather(*(get_stock_news(symbol=symbol) for symbol in symbols))
+        return dict(zip(symbols, news))
+    if action_type == "screen":
+        return await run_screen(action.get("filters"), action.get("sort"), action.get("order") or "asc",
+                                action.get("limit") or 20, action.get("metrics"))
+    raise HTTPException(status_code=400, detail=f"Unsupported action type: {action_type}")
+
+async def run_action_record(index, action, max_points=None, key_dates=None):
+    record = {"index": index, "type": action.get("type"), "symbols": action.get("symbols") or []}
+    try:
+        record["data"] = await run_action(action, max_points, key_dates)
+    except HTTPException as he:
+        record["error"] = {"status": he.status_code, "detail": he.detail}
+    except Exception as e:
+        logging.error("Error running action %s (%s): %s", index, action.get('type'), e)
+        logging.debug("Traceback:", exc_info=True)
+        record["error"] = {"status": 500, "detail": f"Failed to run action: {str(e)}"}
+    return record
+
+@app.post("/api/query")
+async def run_query(request: QueryRequest, stream: str = Query(None), max_points: int = Query(None, ge=3)):
+    # Each action starts running as soon as the planner yields it; history
+    # actions wait for the plan's keyDates only after their data is loaded.
+    key_dates = asyncio.get_running_loop().create_future()
+    tasks = []
+    try:
+        async for kind, value in stream_plan(request.query):
+            if kind == "action":
+                tasks.append(asyncio.create_task(run_action_record(len(tasks), value, max_points, key_dates)))
+            else:
+                plan, source = value
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    key_dates.set_result(plan_key_dates(plan))
+    logging.info("Running %s actions for query (plan source: %s)", len(tasks), source)
+
+    if not wants_stream(stream):
+        results = await asyncio.gather(*tasks)
+        return {"plan": plan, "source": source, "results": results}
+
+    async def events():
+        yield {"event": "plan", "source": source, "plan": plan}
+        for next_done in asyncio.as_completed(tasks):
+            yield {"event": "result", **(await next_done)}
+
+    return stream_response(events(), stream)
+
+async def next_live_message(queue):
+    try:
+        return await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT)
+    except asyncio.TimeoutError:
+        return {"event": "heartbeat"}
+
+@app.get("/api/live")
+async def stream_live_prices(symbols: str = Query(...), stream: str = Query("sse")):
+    """Latest prices for ``symbols`` as server-sent events (or NDJSON) until the client disconnects."""
+    try:
+        symbol_list = parse_live_symbols(symbols, LIVE_MAX_SYMBOLS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    if not wants_stream(stream):
+        raise HTTPException(status_code=400, detail="Live prices are only available as a stream")
+    hub = live_hub
+
+    async def records():
+        queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+        for symbol in symbol_list:
+            hub.subscribe(symbol, queue)
+        try:
+            while True:
+                yield await next_live_message(queue)
+        finally:
+            for symbol in symbol_list:
+                hub.unsubscribe(symbol, queue)
+
+    return stream_response(records(), stream)
+
+@app.websocket("/api/live/ws")
+async def live_prices_socket(websocket: WebSocket, symbols: str = Query("")):
+    """
+    Live prices over a WebSocket. Starts with the ``symbols`` query parameter;
+    the client can send ``{"subscribe": [...]}`` or ``{"unsubscribe": [...]}``
+    to change what it watches.
+    """
+    await websocket.accept()
+    hub, queue, watched = live_hub, asyncio.Queue(LIVE_QUEUE_SIZE), set()
+
+    def watch(symbol_list):
+        for symbol in symbol_list:
+            if symbol in watched:
+                continue
+            if len(watched) >= LIVE_MAX_SYMBOLS:
+                raise ValueError(f"At most {LIVE_MAX_SYMBOLS} symbols can be watched at once")
+            watched.add(symbol)
+            hub.subscribe(symbol, queue)
+
+    def unwatch(symbol_list):
+        for symbol in symbol_list:
+            if symbol in watched:
+                watched.discard(symbol)
+                hub.unsubscribe(symbol, queue)
+
+    async def send():
+        while True:
+            await websocket.send_json(await next_live_message(queue))
+
+    sender = asyncio.create_task(send())
+    try:
+        try:
+            watch(parse_live_symbols(symbols, LIVE_MAX_SYMBOLS))
+        except ValueError as e:
+            deliver(queue, {"event": "error", "detail": str(e)})
+        while True:
+            try:
+                request = await websocket.receive_json()
+                if not isinstance(request, dict):
+                    raise ValueError("Expected a JSON object")
+                unwatch(parse_live_symbols(request.get("unsubscribe") or [], LIVE_MAX_SYMBOLS))
+                watch(parse_live_symbols(request.get("subscribe") or [], LIVE_MAX_SYMBOLS))
+                deliver(queue, {"event": "subscribed", "symbols": sorted(watched)})
+            except ValueError as e:
+                deliver(queue, {"event": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        unwatch(list(watched))
+
 if __name__ == '__main__':
     import uvicorn
     port = int(os.getenv("PORT", 8000))
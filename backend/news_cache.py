@@ -0,0 +1,108 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import upstream
+from governor import CircuitOpenError
+from shared_cache import shared_cache
+
+
+class StaleNews(list):
+    """Cached headlines served past their TTL because upstream is unavailable."""
+    stale = True
+
+
+class NewsCache:
+    """
+    In-process cache of ``Ticker.news`` lists keyed by symbol.
+
+    Headlines are served from memory for ``ttl`` seconds and refetched after
+    that; while the upstream circuit is open a cached list younger than
+    ``max_stale`` is served as ``StaleNews`` instead. Empty results are not
+    cached. At most ``max_entries`` symbols are kept, evicted in LRU order.
+    With a ``shared`` cache tier, fetched lists are published to it and a
+    local miss first looks for a newer list another worker fetched.
+    """
+
+    def __init__(self, ttl=300, max_stale=86400, max_entries=256, clock=time.monotonic, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    async def get(self, symbol):
+        """Return the news list for ``symbol`` (empty if upstream has none)."""
+        entry = self._entries.get(symbol)
+        if self.shared is not None and (entry is None or self.clock() - entry[0] > self.ttl):
+            entry = await self._adopt_shared(symbol, entry)
+        if entry is not None and self.clock() - entry[0] <= self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(symbol)
+            return entry[1]
+
+        self.misses += 1
+        try:
+            news = await upstream.run_shared("news", symbol, upstream.fetch_news)
+        except CircuitOpenError:
+            if entry is None or self.clock() - entry[0] > self.max_stale:
+                raise
+            logging.info("Upstream unavailable, serving stale news for %s", symbol)
+            return StaleNews(entry[1])
+        if news:
+            self._store(symbol, self.clock(), news)
+            if self.shared is not None:
+                await self.shared.set_async("news", symbol, news, self.max_stale)
+        return news or []
+
+    def _store(self, symbol, fetched_at, news):
+        self._entries[symbol] = (fetched_at, news)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _adopt_shared(self, symbol, entry):
+        """Replace ``entry`` by a newer shared one, if any; returns the entry to use."""
+        shared = await self.shared.get_async("news", symbol)
+        if shared is None:
+            return entry
+        news, age = shared
+        fetched_at = self.clock() - age
+        if entry is not None and entry[0] >= fetched_at:
+            return entry
+        self._store(symbol, fetched_at, news)
+        return fetched_at, news
+
+    def snapshot(self):
+        """``[symbol, news, age]`` for every entry, least recently used first."""
+        now = self.clock()
+        return [[symbol, news, now - fetched_at] for symbol, (fetched_at, news) in self._entries.items()]
+
+    def restore(self, entries, elapsed):
+        """Re-insert snapshot entries still within ``max_stale`` after ``elapsed`` seconds; returns how many."""
+        now = self.clock()
+        restored = 0
+        for symbol, news, age in entries[-self.max_entries:]:
+            age += elapsed
+            if age > self.max_stale or symbol in self._entries:
+                continue
+            self._entries[symbol] = (now - age, news)
+            restored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return restored
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+news_cache = NewsCache(
+    ttl=float(os.getenv("NEWS_CACHE_TTL", 300)),
+    max_stale=float(os.getenv("NEWS_CACHE_MAX_STALE", 86400)),
+    max_entries=int(os.getenv("NEWS_CACHE_SIZE", 256)),
+    shared=shared_cache,
+)
@@ -0,0 +1,163 @@
+import copy
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from shared_cache import shared_cache
+from tickers import replace_company_names
+
+# An action whose end date is 'current' or within this many days of the day
+# it was planned is treated as relative to "now" and re-anchored on a hit.
+RELATIVE_WINDOW_DAYS = 3
+
+_POSSESSIVE = re.compile(r"(\w)'s\b")
+_PUNCTUATION = re.compile(r"[^\w\s&/^.-]|(?<!\w)[./-]|[./-](?!\w)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def clean_query(query):
+    """Lowercase ``query`` and strip possessives and punctuation, collapsing whitespace."""
+    text = query.lower()
+    text = _POSSESSIVE.sub(r"\1", text)
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_query(query):
+    """
+    Reduce a query to a cache key: ``clean_query`` with company names
+    replaced by tickers, so "Compare Apple and Microsoft!" and "compare AAPL
+    and MSFT" share a key.
+    """
+    return replace_company_names(clean_query(query))
+
+
+def _shift(value, delta):
+    return (date.fromisoformat(value) + delta).isoformat()
+
+
+def _is_relative(action, anchor):
+    end = action.get("endDate")
+    if end == "current":
+        return True
+    try:
+        return date.fromisoformat(end) >= anchor - timedelta(days=RELATIVE_WINDOW_DAYS)
+    except (TypeError, ValueError):
+        return False
+
+
+def reanchor(plan, anchor, today):
+    """Shift the date range of every "now"-relative action from ``anchor`` to ``today``."""
+    plan = copy.deepcopy(plan)
+    delta = today - anchor
+    if not delta:
+        return plan
+    for action in plan.get("actions", []):
+        if not isinstance(action, dict) or not _is_relative(action, anchor):
+            continue
+        try:
+            if action.get("startDate"):
+                action["startDate"] = _shift(action["startDate"], delta)
+            if action.get("endDate") and action["endDate"] != "current":
+                action["endDate"] = _shift(action["endDate"], delta)
+        except ValueError:
+            logging.debug("Leaving unparseable dates in cached action as-is: %s", action)
+    return plan
+
+
+class PlanCache:
+    """
+    Bounded LRU cache of query plans keyed by ``normalize_query``.
+
+    Plans are stored with the date they were made on. On a hit, actions whose
+    range ends "now" are shifted forward so "last month" still means last
+    month; historical ranges and ``keyDates`` are returned untouched. Entries
+    expire after ``ttl`` seconds so key dates for relative queries do not go
+    stale indefinitely. With a ``shared`` cache tier, plans are published to
+    it and a local miss falls back to the plans other workers made.
+    """
+
+    def __init__(self, max_entries=512, ttl=24 * 3600, clock=time.monotonic, today=date.today, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.ttl = ttl
+        self.clock = clock
+        self.today = today
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    async def get(self, query):
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is None or self.clock() - entry["stored_at"] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            entry = await self._from_shared(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._store(key, entry)
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return reanchor(entry["plan"], entry["anchor"], self.today())
+
+    async def put(self, query, plan):
+        if not isinstance(plan, dict) or not isinstance(plan.get("actions"), list):
+            return
+        key = normalize_query(query)
+        anchor = self.today()
+        self._store(key, {"plan": copy.deepcopy(plan), "anchor": anchor, "stored_at": self.clock()})
+        if self.shared is not None:
+            await self.shared.set_async("plan", key, {"plan": plan, "anchor": anchor.isoformat()}, self.ttl)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _from_shared(self, key):
+        if self.shared is None:
+            return None
+        shared = await self.shared.get_async("plan", key)
+        if shared is None or shared[1] > self.ttl:
+            return None
+        value, age = shared
+        return {"plan": value["plan"], "anchor": date.fromisoformat(value["anchor"]), "stored_at": self.clock() - age}
+
+    def snapshot(self):
+        """``[key, plan, anchor, age]`` for every entry, least recently used first."""
+        now = self.clock()
+        return [[key, entry["plan"], entry["anchor"].isoformat(), now - entry["stored_at"]]
+                for key, entry in self._entries.items()]
+
+    def restore(self, entries, elapsed):
+        """Re-insert snapshot entries still within ``ttl`` after ``elapsed`` seconds; returns how many."""
+        now = self.clock()
+        restored = 0
+        for key, plan, anchor, age in entries[-self.max_entries:]:
+            age += elapsed
+            if age > self.ttl or key in self._entries:
+                continue
+            self._entries[key] = {"plan": plan, "anchor": date.fromisoformat(anchor), "stored_at": now - age}
+            restored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return restored
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+plan_cache = PlanCache(
+    max_entries=int(os.getenv("PLAN_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("PLAN_CACHE_TTL", 24 * 3600)),
+    shared=shared_cache,
+)
@@ -0,0 +1,72 @@
+import json
+
+
+class ActionStreamParser:
+    """
+    Incremental scanner over a query plan that is still being streamed.
+
+    ``feed`` takes the next chunk of model output and returns the entries of
+    the top-level ``"actions"`` array that were completed by it, each parsed
+    as soon as its closing brace arrives, so they can be dispatched before the
+    model has written the rest of the plan. Text outside the top-level object
+    (such as a Markdown code fence) is ignored. The full plan is still parsed
+    with ``json.loads`` once the stream ends.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.emitted = 0
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+        self._actions_depth = None
+        self._action_start = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        actions = []
+        text, stack = self.text, self._stack
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+            if not stack and char != "{":
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ":" and len(stack) == 1:
+                self._key = self._last_string
+            elif char == ",":
+                if len(stack) == 1:
+                    self._key = None
+            elif char in "{[":
+                stack.append(char)
+                if char == "[" and len(stack) == 2 and self._key == "actions":
+                    self._actions_depth = 2
+                elif char == "{" and self._actions_depth is not None and len(stack) == self._actions_depth + 1:
+                    self._action_start = i
+            elif char in "}]":
+                if char == "}" and self._action_start is not None and len(stack) == self._actions_depth + 1:
+                    try:
+                        actions.append(json.loads(text[self._action_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._action_start = None
+                if char == "]" and len(stack) == self._actions_depth:
+                    self._actions_depth = None
+                stack.pop()
+        self._pos = len(text)
+        self.emitted += len(actions)
+        return actions
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import time
+
+
+class Popularity:
+    """
+    Exponentially decaying request counts per symbol: every request adds 1
+    and scores halve every ``half_life`` seconds, so the ranking follows what
+    users ask for now rather than all time. Only the ``max_symbols`` highest
+    scores are kept.
+    """
+
+    def __init__(self, half_life=3600, max_symbols=1000, clock=time.monotonic):
+        self.half_life = half_life
+        self.max_symbols = max_symbols
+        self.clock = clock
+        self._scores = {}
+
+    def _decayed(self, symbol, now):
+        score, updated = self._scores.get(symbol, (0.0, now))
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, symbols):
+        now = self.clock()
+        for symbol in dict.fromkeys(symbols):
+            self._scores[symbol] = (self._decayed(symbol, now) + 1, now)
+        if len(self._scores) > self.max_symbols:
+            for symbol in self.top(len(self._scores))[self.max_symbols:]:
+                del self._scores[symbol]
+
+    def top(self, n):
+        now = self.clock()
+        return sorted(self._scores, key=lambda symbol: self._decayed(symbol, now), reverse=True)[:n]
+
+
+class Prefetcher:
+    """
+    Background warm-up of the upstream-backed caches.
+
+    Every ``interval`` seconds, and once at startup (after ``start``'s
+    ``after`` awaitable, if any, has finished), each of ``warmers``
+    (``{kind: async fn(symbol)}``) is run for the seed symbols and the
+    ``top_n`` most popular ones. Prefetching only uses upstream capacity
+    foreground requests leave idle: a cycle stops as soon as the governor has
+    no headroom, or once ``max_calls`` upstream calls (foreground included)
+    were made since it began.
+    """
+
+    def __init__(self, warmers, governor, popularity=None, seeds=(), top_n=20, interval=600, max_calls=100):
+        self.warmers = warmers
+        self.governor = governor
+        self.popularity = popularity or Popularity()
+        self.seeds = list(seeds)
+        self.top_n = top_n
+        self.interval = interval
+        self.max_calls = max_calls
+        self.warmed = 0
+        self.failed = 0
+        self.cycles = 0
+        self._task = None
+
+    def record(self, symbols):
+        self.popularity.record(symbols)
+
+    def targets(self):
+        return list(dict.fromkeys(self.seeds + self.popularity.top(self.top_n)))
+
+    async def run_once(self):
+        """Run one prefetch cycle; returns the number of (kind, symbol) warm-ups done."""
+        self.cycles += 1
+        start_calls = self.governor.calls
+        done = 0
+        for symbol in self.targets():
+            for kind, warm in self.warmers.items():
+                if self.governor.calls - start_calls >= self.max_calls:
+                    logging.info("Prefetch cycle stopped after reaching its upstream budget (%s calls)", self.max_calls)
+                    return done
+                if not self.governor.has_headroom():
+                    logging.info("Prefetch cycle yielding to foreground requests")
+                    return done
+                try:
+                    await warm(symbol)
+                    self.warmed += 1
+                    done += 1
+                except Exception as e:
+                    self.failed += 1
+                    logging.warning("Prefetching %s for %s failed: %s", kind, symbol, e)
+        return done
+
+    async def _loop(self, after=None):
+        if after is not None:
+            await after
+        while True:
+            try:
+                done = await self.run_once()
+                logging.info("Prefetch cycle warmed %s entries", done)
+            except Exception as e:
+                logging.error("Prefetch cycle failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, after=None):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(after))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {"cycles": self.cycles, "warmed": self.warmed, "failed": self.failed, "targets": self.targets()}
+
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() not in ("", "0", "false", "no")
+PREFETCH_SEEDS = [s.strip().upper() for s in os.getenv("PREFETCH_SEEDS", "SPY,QQQ,AAPL,MSFT,NVDA,AMZN,GOOGL,META,TSLA").split(",") if s.strip()]
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", 20))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", 600))
+PREFETCH_MAX_CALLS = int(os.getenv("PREFETCH_MAX_CALLS", 100))
+PREFETCH_HISTORY_DAYS = int(os.getenv("PREFETCH_HISTORY_DAYS", 365))
@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+from lazy import lazy_import
+from shared_cache import shared_cache
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+STORE_VERSION = 1
+
+_EPOCH = date(1970, 1, 1)
+_UNSAFE_CHARS = re.compile(r"[^A-Z0-9.^=_-]")
+
+
+def parse_date(value):
+    """Parse a 'YYYY-MM-DD' string (or date/datetime) into a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def normalize_history(hist):
+    """Reduce a yfinance history frame to a tz-naive daily OHLCV frame."""
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=list(COLUMNS), index=pd.DatetimeIndex([], name="Date"), dtype="float64")
+    frame = hist.reindex(columns=list(COLUMNS)).astype("float64")
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize().rename("Date")
+    return frame[~frame.index.duplicated(keep="last")].sort_index()
+
+
+def slice_history(hist, start, end):
+    """Rows of a normalized history frame dated within ``[start, end)``."""
+    start, end = pd.Timestamp(parse_date(start)), pd.Timestamp(parse_date(end))
+    return hist[(hist.index >= start) & (hist.index < end)]
+
+
+def price_matrix(histories, columns=("Close",)):
+    """
+    Align several symbols' history frames on one shared date axis.
+
+    Returns a frame indexed by the union of all dates with ``(symbol, column)``
+    MultiIndex columns; dates a symbol has no bar for are NaN.
+    """
+    frame = pd.concat({symbol: hist.reindex(columns=list(columns)) for symbol, hist in histories.items()}, axis=1)
+    return frame.sort_index()
+
+
+class PriceStore:
+    """
+    On-disk, per-symbol daily price store.
+
+    Each symbol is kept as a single ``<SYMBOL>.npy`` file holding a
+    ``(1 + len(COLUMNS), rows)`` float64 matrix: row 0 is the date as days
+    since the epoch, the remaining rows are the OHLCV columns. Every column is
+    contiguous, so a range read is a ``searchsorted`` plus a slice over a
+    memory-mapped file. A ``<SYMBOL>.json`` sidecar records the half-open
+    ``[start, end)`` window already fetched from upstream, which lets
+    ``get_history`` ask upstream only for the dates it has never seen.
+
+    Dates on or after today are never persisted: the trailing "current" bar is
+    still moving, so it is fetched again on every request that covers it.
+    Because upstream prices are split/dividend adjusted, a symbol whose data
+    is older than ``max_age_days`` is discarded and fetched afresh.
+
+    Workers on one host share the directory. With a ``shared`` cache tier
+    (for workers on other hosts), every write is also published there, and a
+    range not covered on disk first adopts a wider window another worker
+    published before asking upstream.
+    """
+
+    def __init__(self, root, max_age_days=7, shared=None):
+        self.root = root
+        self.shared = shared
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _paths(self, symbol):
+        name = _UNSAFE_CHARS.sub("_", symbol.upper())
+        base = os.path.join(self.root, name)
+        return base + ".npy", base + ".json"
+
+    def _read_meta(self, symbol):
+        _, meta_path = self._paths(symbol)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != STORE_VERSION:
+            return None
+        if time.time() - meta.get("fetched_at", 0) > self.max_age_days * 86400:
+            return None
+        return meta
+
+    def _load_matrix(self, symbol):
+        data_path, _ = self._paths(symbol)
+        try:
+            return np.load(data_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _read_stored(self, symbol):
+        """
+        ``(meta, matrix)`` for ``symbol``, or ``(None, None)`` if nothing
+        usable is stored. The two files are replaced one after the other, so
+        a matrix whose row count disagrees with its sidecar (another worker
+        is mid-write) counts as nothing stored.
+        """
+        meta = self._read_meta(symbol)
+        if meta is None:
+            return None, None
+        matrix = self._load_matrix(symbol)
+        if matrix is None or matrix.shape[1] != meta.get("rows"):
+            return None, None
+        return meta, matrix
+
+    def _read_frame(self, symbol, start=None, end=None, matrix=None):
+        if matrix is None:
+            matrix = self._load_matrix(symbol)
+        if matrix is None:
+            return normalize_history(None)
+        days = matrix[0]
+        lo = 0 if start is None else int(np.searchsorted(days, (start - _EPOCH).days, side="left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, (end - _EPOCH).days, side="left"))
+        block = np.array(matrix[:, lo:hi])
+        index = pd.DatetimeIndex(block[0].astype("int64").astype("datetime64[D]"), name="Date")
+        return pd.DataFrame(block[1:].T, index=index, columns=list(COLUMNS))
+
+    def _write(self, symbol, frame, start, end, fetched_at=None):
+        days = (frame.index.values.astype("datetime64[D]").astype("int64")).astype("float64")
+        matrix = np.vstack([days, frame[list(COLUMNS)].to_numpy(dtype="float64").T])
+        self._write_matrix(symbol, matrix, start, end, fetched_at)
+        return matrix
+
+    def _replace(self, path, write):
+        # Unique temp names, so workers sharing the directory never write
+        # into each other's half-written file.
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_matrix(self, symbol, matrix, start, end, fetched_at=None):
+        data_path, meta_path = self._paths(symbol)
+        self._replace(data_path, lambda f: np.save(f, matrix))
+        meta = {
+            "version": STORE_VERSION,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "rows": int(matrix.shape[1]),
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+        }
+        self._replace(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+
+    def get_history(self, symbol, start, end, fetch):
+        """
+        Return the OHLCV frame for ``symbol`` over ``[start, end)``.
+
+        ``fetch(symbol, start, end)`` is called only for the parts of the range
+        not already on disk and must return a yfinance-style history frame.
+        """
+        start, end = parse_date(start), parse_date(end)
+        if start >= end:
+            return normalize_history(None)
+        today = date.today()
+
+        with self._lock(symbol):
+            meta, matrix = self._read_stored(symbol)
+            gaps = _gaps(meta, start, end)
+            if gaps and self.shared is not None and self._adopt_shared(symbol, meta):
+                meta, matrix = self._read_stored(symbol)
+                gaps = _gaps(meta, start, end)
+
+            if not gaps:
+                self.hits += 1
+                logging.debug("Price store hit for %s: %s -> %s", symbol, start, end)
+                return self._read_frame(symbol, start, end, matrix)
+
+            self.misses += 1
+            logging.info("Price store fetching %s gaps for %s between %s and %s", len(gaps), symbol, gaps[0][0], gaps[-1][1])
+            fetched = [normalize_history(fetch(symbol, s.isoformat(), e.isoformat())) for s, e in gaps]
+            existing = self._read_frame(symbol, matrix=matrix) if meta is not None else normalize_history(None)
+            merged = pd.concat([existing] + [f for f in fetched if not f.empty])
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+            settled = merged[merged.index < pd.Timestamp(today)]
+            # Gap fills keep the age of the bars already stored, so a symbol
+            # requested every day still expires after max_age_days and picks
+            # up split/dividend re-adjustments with a full refetch.
+            if meta is None:
+                new_start, new_end, fetched_at = start, min(end, today), time.time()
+            else:
+                new_start = min(start, parse_date(meta["start"]))
+                new_end = max(parse_date(meta["end"]), min(end, today))
+                fetched_at = meta["fetched_at"]
+            if not settled.empty and new_end > new_start:
+                matrix = self._write(symbol, settled, new_start, new_end, fetched_at)
+                if self.shared is not None:
+                    value = {"start": new_start.isoformat(), "end": new_end.isoformat(), "matrix": matrix}
+                    self.shared.set("history", symbol, value, self.max_age_days * 86400, age=time.time() - fetched_at)
+
+            return slice_history(merged, start, end)
+
+    def _adopt_shared(self, symbol, meta):
+        """Write the shared copy of ``symbol`` to disk if it covers more than ``meta``; returns whether it did."""
+        shared = self.shared.get("history", symbol)
+        if shared is None:
+            return False
+        value, age = shared
+        start, end = parse_date(value["start"]), parse_date(value["end"])
+        if meta is not None:
+            cov_start, cov_end = parse_date(meta["start"]), parse_date(meta["end"])
+            if start > cov_start or end < cov_end or (start, end) == (cov_start, cov_end):
+                return False
+        self._write_matrix(symbol, value["matrix"], start, end, time.time() - age)
+        return True
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def read_cached(self, symbol, start, end):
+        """
+        Whatever is on disk for ``symbol`` over ``[start, end)``, regardless of
+        age or coverage, without calling upstream. Used as a stale fallback
+        while upstream is unavailable.
+        """
+        start, end = parse_date(start), parse_date(end)
+        with self._lock(symbol):
+            return self._read_frame(symbol, start, end)
+
+
+def _gaps(meta, start, end):
+    """The parts of ``[start, end)`` outside the window ``meta`` says is on disk."""
+    if meta is None:
+        return [(start, end)]
+    cov_start, cov_end = parse_date(meta["start"]), parse_date(meta["end"])
+    gaps = []
+    if start < cov_start:
+        gaps.append((start, cov_start))
+    if end > cov_end:
+        gaps.append((cov_end, end))
+    return gaps
+
+
+def _default_store_dir():
+    # With SNAPSHOT_DIR on a persistent volume, keep the price files next to
+    # the cache snapshots so they survive machine restarts too.
+    if os.getenv("SNAPSHOT_DIR"):
+        return os.path.join(os.getenv("SNAPSHOT_DIR"), "prices")
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), ".price_store")
+
+
+price_store = PriceStore(
+    os.getenv("PRICE_STORE_DIR") or _default_store_dir(),
+    max_age_days=int(os.getenv("PRICE_STORE_MAX_AGE_DAYS", 7)),
+    shared=shared_cache,
+)
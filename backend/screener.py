@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import operator
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from lazy import lazy_import
+from tickers import COMPANY_TICKERS
+
+np = lazy_import("numpy")
+
+# Descriptive fields that can be filtered on by equality ("sector=Technology").
+TEXT_FIELDS = ("shortName", "sector", "industry")
+
+OPERATORS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    "lt": operator.lt, "lte": operator.le, "gt": operator.gt, "gte": operator.ge, "eq": operator.eq, "ne": operator.ne,
+}
+
+_FILTER = re.compile(r"^\s*([\w.]+)\s*(<=|>=|==|!=|<|>|=)\s*(.+?)\s*$")
+
+
+def parse_filters(text):
+    """Parse ``"forwardPE<20,sector=Technology"`` into ``[(field, op, value), ...]``."""
+    filters = []
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        match = _FILTER.match(part)
+        if match is None:
+            raise ValueError(f"Invalid screen filter: {part.strip()}")
+        filters.append(match.groups())
+    return filters
+
+
+def normalize_filter(spec):
+    """Accept a filter as ``"field<value"``, ``[field, op, value]`` or ``{"metric", "op", "value"}``."""
+    if isinstance(spec, str):
+        return parse_filters(spec)[0]
+    if isinstance(spec, dict):
+        spec = (spec.get("metric") or spec.get("field"), spec.get("op") or spec.get("operator"), spec.get("value"))
+    if not isinstance(spec, (list, tuple)) or len(spec) != 3:
+        raise ValueError(f"Invalid screen filter: {spec}")
+    return tuple(spec)
+
+
+class MetricsTable:
+    """
+    Immutable columnar snapshot of the screened metrics for a universe.
+
+    Each numeric metric is one contiguous float64 column (NaN where a symbol
+    has no value) and each text field a lowercased object column, so a filter
+    is a vectorized comparison over the whole universe. A refresh builds a
+    new table and swaps it in, so readers never see a half-updated one.
+    """
+
+    def __init__(self, rows, metrics, built_at=None):
+        self.symbols = list(rows)
+        self.metrics = list(metrics)
+        self.built_at = time.time() if built_at is None else built_at
+        self.numeric = {metric: np.array([_number(rows[symbol].get(metric)) for symbol in self.symbols], dtype="float64")
+                        for metric in self.metrics}
+        self.text = {field: np.array([rows[symbol].get(field) for symbol in self.symbols], dtype=object)
+                     for field in TEXT_FIELDS}
+        self._text_lower = {field: np.array([str(value).lower() if value is not None else None for value in column], dtype=object)
+                            for field, column in self.text.items()}
+        self._names = {name.lower(): name for name in self.metrics + list(TEXT_FIELDS)}
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def resolve(self, name):
+        field = self._names.get(str(name).lower())
+        if field is None:
+            raise ValueError(f"Unknown screen metric: {name}")
+        return field
+
+    def mask(self, filters):
+        mask = np.ones(len(self.symbols), dtype=bool)
+        for spec in filters:
+            name, op, value = normalize_filter(spec)
+            field = self.resolve(name)
+            compare = OPERATORS.get(op)
+            if compare is None:
+                raise ValueError(f"Unsupported screen operator: {op}")
+            if field in self.numeric:
+                column = self.numeric[field]
+                try:
+                    threshold = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Screen filter on {field} needs a number, got {value!r}")
+                with np.errstate(invalid="ignore"):
+                    mask &= compare(column, threshold) & ~np.isnan(column)
+            elif compare in (operator.eq, operator.ne):
+                mask &= compare(self._text_lower[field], str(value).lower())
+            else:
+                raise ValueError(f"Only = and != are supported on {field}")
+        return mask
+
+    def screen(self, filters=(), sort=None, descending=False, limit=20, columns=None):
+        """
+        Symbols passing every filter, ordered by ``sort`` (missing values
+        last) and cut to the top ``limit``; returns ``(matched, rows)``.
+        Only the top ``limit`` entries are fully sorted.
+        """
+        indices = np.flatnonzero(self.mask(filters))
+        matched = len(indices)
+        sort = self.resolve(sort) if sort else None
+        if sort is not None:
+            if sort not in self.numeric:
+                raise ValueError(f"Cannot sort by {sort}")
+            keys = self.numeric[sort][indices]
+            present = ~np.isnan(keys)
+            ranked, keys = indices[present], keys[present]
+            if descending:
+                keys = -keys
+            k = min(limit, len(ranked))
+            if 0 < k < len(ranked):
+                top = np.argpartition(keys, k - 1)[:k]
+                ranked, keys = ranked[top], keys[top]
+            ranked = ranked[np.argsort(keys, kind="stable")][:limit]
+            indices = np.concatenate([ranked, indices[~present][:limit - len(ranked)]])
+        indices = indices[:limit]
+
+        if columns is None:
+            columns = [self.resolve(name) for name, _, _ in map(normalize_filter, filters)]
+            columns = list(dict.fromkeys(["shortName", "sector"] + ([sort] if sort else []) + columns))
+        else:
+            columns = [self.resolve(name) for name in columns]
+        rows = []
+        for i in indices:
+            row = {"symbol": self.symbols[i]}
+            for column in columns:
+                if column in self.numeric:
+                    value = float(self.numeric[column][i])
+                    row[column] = None if np.isnan(value) else value
+                else:
+                    row[column] = self.text[column][i]
+            rows.append(row)
+        return matched, rows
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return float("nan")
+    return float(value)
+
+
+class Screener:
+    """
+    Keeps a ``MetricsTable`` of ``metrics`` for every symbol of ``universe``
+    and refreshes it every ``interval`` seconds in the background.
+
+    ``load(symbols, fields)`` is an async iterator of ``(symbol, values)``
+    pairs (values may be an exception), such as ``InfoCache.iter_many``;
+    symbols are loaded ``batch`` at a time. A symbol whose lookup fails keeps
+    its row from the previous table. The first screen before any refresh
+    finished waits for one.
+
+    With a ``governor``, each batch waits until it has headroom, so a rebuild
+    only uses upstream capacity foreground requests leave idle; the previous
+    table keeps being served meanwhile. A screen waiting for the first table
+    is itself a foreground request, so while one waits batches go ahead.
+    """
+
+    def __init__(self, load, universe, metrics, interval=900, batch=10, governor=None, backoff=1.0):
+        self.load = load
+        self.universe = list(dict.fromkeys(universe))
+        self.metrics = list(metrics)
+        self.interval = interval
+        self.batch = batch
+        self.governor = governor
+        self.backoff = backoff
+        self.table = None
+        self.refreshes = 0
+        self.failed = 0
+        self.deferred = 0
+        self._waiting = 0
+        self._refreshing = None
+        self._task = None
+
+    async def _build(self):
+        previous = self.table.rows if self.table is not None else {}
+        fields = self.metrics + list(TEXT_FIELDS)
+        rows = {}
+        failed = 0
+        for i in range(0, len(self.universe), self.batch):
+            while self.governor is not None and not self._waiting and not self.governor.has_headroom():
+                self.deferred += 1
+                await asyncio.sleep(self.backoff)
+            async for symbol, values in self.load(self.universe[i:i + self.batch], fields):
+                if isinstance(values, Exception):
+                    failed += 1
+                    if symbol in previous:
+                        rows[symbol] = previous[symbol]
+                    continue
+                rows[symbol] = values
+        self.table = MetricsTable(rows, self.metrics)
+        self.refreshes += 1
+        self.failed = failed
+        logging.info("Screener table refreshed: %s of %s symbols (%s lookups failed)", len(rows), len(self.universe), failed)
+        return self.table
+
+    async def refresh(self):
+        """Rebuild the table, sharing a rebuild that is already running."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._build())
+            self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+        return await asyncio.shield(self._refreshing)
+
+    async def current(self):
+        """The latest table, building the first one if needed."""
+        if self.table is None:
+            self._waiting += 1
+            try:
+                return await self.refresh()
+            finally:
+                self._waiting -= 1
+        return self.table
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error("Screener refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        table = self.table
+        return {
+            "universe": len(self.universe),
+            "rows": len(table) if table is not None else 0,
+            "age": time.time() - table.built_at if table is not None else None,
+            "refreshes": self.refreshes,
+            "failed": self.failed,
+            "deferred": self.deferred,
+        }
+
+    def as_of(self):
+        return datetime.fromtimestamp(self.table.built_at, tz=timezone.utc).isoformat()
+
+
+def _universe_from_env():
+    path = os.getenv("SCREENER_UNIVERSE_FILE")
+    if path:
+        with open(path) as f:
+            return [line.strip().upper() for line in f if line.strip() and not line.startswith("#")]
+    symbols = os.getenv("SCREENER_UNIVERSE")
+    if symbols:
+        return [s.strip().upper() for s in symbols.split(",") if s.strip()]
+    return sorted(set(COMPANY_TICKERS.values()))
+
+
+SCREENER_ENABLED = os.getenv("SCREENER_ENABLED", "1").lower() not in ("", "0", "false", "no")
+SCREENER_UNIVERSE = _universe_from_env()
+SCREENER_INTERVAL = float(os.getenv("SCREENER_INTERVAL", 900))
+SCREENER_BATCH = int(os.getenv("SCREENER_BATCH", 10))
+SCREENER_MAX_LIMIT = int(os.getenv("SCREENER_MAX_LIMIT", 100))
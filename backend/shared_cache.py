@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from lazy import lazy_import
+from snapshot import SNAPSHOT_DIR
+
+np = lazy_import("numpy")
+
+MAGIC = b"NLS"
+FORMAT_VERSION = 1
+
+# msgpack extension type code for numpy arrays.
+_NDARRAY = 1
+
+
+def _pack_default(value):
+    import msgpack
+
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return msgpack.ExtType(_NDARRAY, msgpack.packb([array.dtype.str, list(array.shape), array.tobytes()]))
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__} for the shared cache")
+
+
+def _unpack_ext(code, data):
+    import msgpack
+
+    if code == _NDARRAY:
+        dtype, shape, raw = msgpack.unpackb(data)
+        return np.frombuffer(raw, dtype=np.dtype(dtype)).reshape(shape)
+    return msgpack.ExtType(code, data)
+
+
+def encode(value, stored_at=None):
+    """
+    Serialize ``value`` into a versioned blob: ``MAGIC``, one version byte,
+    then msgpack of ``[stored_at, value]``. Numpy arrays are packed as raw
+    buffers with their dtype and shape, so price series round-trip without
+    going through Python floats.
+    """
+    import msgpack
+
+    payload = msgpack.packb([time.time() if stored_at is None else stored_at, value], default=_pack_default)
+    return MAGIC + bytes([FORMAT_VERSION]) + payload
+
+
+def decode(blob):
+    """Return ``(stored_at, value)`` from an ``encode`` blob, or None if it has another format or version."""
+    import msgpack
+
+    if not blob or len(blob) <= len(MAGIC) or bytes(blob[:len(MAGIC)]) != MAGIC or blob[len(MAGIC)] != FORMAT_VERSION:
+        return None
+    stored_at, value = msgpack.unpackb(memoryview(blob)[len(MAGIC) + 1:], ext_hook=_unpack_ext, strict_map_key=False)
+    return stored_at, value
+
+
+class SqliteStore:
+    """
+    Key/value store in a local SQLite file, shared by every worker process on
+    the host. The database runs in WAL mode so readers never wait on a writer,
+    and each thread gets its own connection. Expired rows are ignored on read
+    and purged every ``purge_every`` writes.
+    """
+
+    def __init__(self, path, purge_every=500):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ex=None):
+        expires_at = None if ex is None else time.time() + ex
+        with self._connection() as db:
+            db.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+
+class MemoryStore:
+    """
+    In-process stand-in for a network key/value store, with the same
+    ``get(key)`` / ``set(key, value, ex=seconds)`` calls a Redis client
+    offers. Used in tests and as a reference for other backends.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._entries[key] = (bytes(value), None if ex is None else self.clock() + ex)
+
+
+class SharedCache:
+    """
+    Cache tier shared across worker processes (and, with a network store,
+    across hosts), sitting behind each worker's in-memory caches.
+
+    ``store`` is any object with ``get(key) -> bytes | None`` and
+    ``set(key, value, ex=seconds)``: ``SqliteStore`` for workers on one host,
+    a Redis client or ``MemoryStore`` for a network store. Values are
+    ``encode``d with the wall-clock time they were stored, so ``get`` can
+    return their age and each worker applies its own freshness rules. Store
+    failures are logged and treated as misses: the shared tier only ever saves
+    upstream calls, it never fails a request.
+    """
+
+    def __init__(self, store, prefix="nlpstocks"):
+        self.store = store
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def _key(self, namespace, key):
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get(self, namespace, key):
+        """Return ``(value, age_seconds)`` for ``key`` in ``namespace``, or None."""
+        try:
+            entry = decode(self.store.get(self._key(namespace, key)))
+        except Exception as e:
+            self.errors += 1
+            logging.warning("Shared cache read failed for %s %s: %s", namespace, key, e)
+            return None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        stored_at, value = entry
+        return value, max(0.0, time.time() - stored_at)
+
+    def set(self, namespace, key, value, ttl, age=0.0):
+        """Store ``value`` for ``ttl`` seconds; ``age`` backdates it when it was fetched earlier."""
+        if ttl - age <= 0:
+            return
+        try:
+            self.store.set(self._key(namespace, key), encode(value, time.time() - age), ex=math.ceil(ttl - age))
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            logging.warning("Shared cache write failed for %s %s: %s", namespace, key, e)
+
+    async def get_async(self, namespace, key):
+        """``get`` on a worker thread, for callers on the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, namespace, key)
+
+    async def set_async(self, namespace, key, value, ttl, age=0.0):
+        """``set`` on a worker thread, for callers on the event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.set, namespace, key, value, ttl, age)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "errors": self.errors}
+
+
+def open_store(url):
+    """
+    Build a store from ``SHARED_CACHE_URL``: ``sqlite:///abs/path/file.db``,
+    ``redis://host:port/db`` (needs the ``redis`` package) or ``memory://``.
+    """
+    if url.startswith("sqlite://"):
+        return SqliteStore(url[len("sqlite://"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_CACHE_URL points at Redis but the redis package is not installed")
+        return redis.Redis.from_url(url)
+    if url.startswith("memory://"):
+        return MemoryStore()
+    raise ValueError(f"Unsupported SHARED_CACHE_URL: {url}")
+
+
+def _shared_cache_from_env():
+    url = os.getenv("SHARED_CACHE_URL", "")
+    if not url:
+        return None
+    if url == "sqlite":
+        url = "sqlite://" + os.path.join(SNAPSHOT_DIR, "shared.db")
+    try:
+        return SharedCache(open_store(url), prefix=os.getenv("SHARED_CACHE_PREFIX", "nlpstocks"))
+    except Exception as e:
+        logging.error("Shared cache disabled, could not open %s: %s", url, e)
+        return None
+
+
+shared_cache = _shared_cache_from_env()
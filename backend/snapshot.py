@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import mmap
+import os
+import tempfile
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotStore:
+    """
+    Versioned on-disk snapshots, one msgpack file per cache.
+
+    Each ``<name>.snap`` file holds ``{"version", "name", "saved_at",
+    "entries"}``; ``saved_at`` is wall-clock time so the age of every entry
+    can be carried across a restart. Files are written atomically and read
+    through ``mmap``, so a restore does not copy the file before decoding it.
+    A file with another version or that fails to decode is ignored.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.snap")
+
+    def save(self, name, entries):
+        import msgpack
+
+        path = self._path(name)
+        payload = msgpack.packb({"version": SNAPSHOT_VERSION, "name": name, "saved_at": time.time(), "entries": entries})
+        # Unique temp names, so workers sharing the directory never write
+        # into each other's half-written file.
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return len(payload)
+
+    def load(self, name):
+        """Return ``(saved_at, entries)`` for ``name``, or None if there is no usable snapshot."""
+        import msgpack
+
+        try:
+            with open(self._path(name), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                snapshot = msgpack.unpackb(view, strict_map_key=False)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning("Ignoring unreadable %s snapshot: %s", name, e)
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("name") != name:
+            logging.warning("Ignoring %s snapshot with unsupported version", name)
+            return None
+        return snapshot["saved_at"], snapshot["entries"]
+
+
+class Snapshotter:
+    """
+    Saves and restores in-memory caches through a ``SnapshotStore``.
+
+    ``caches`` maps a snapshot name to an object with ``snapshot()``, returning
+    a msgpack-serializable list of entries with their ages, and
+    ``restore(entries, elapsed)``, which re-inserts the entries still within
+    their TTLs after ``elapsed`` seconds offline. Entries are collected on the
+    event loop but encoded and written on a worker thread.
+
+    ``start`` restores in the background, so startup does not wait on the
+    snapshot size, then saves every ``interval`` seconds; ``stop`` saves once
+    more before shutdown, provided the restore had finished. Work that should
+    only begin once the caches are restored awaits ``wait_restored``.
+    """
+
+    def __init__(self, store, caches, interval=300):
+        self.store = store
+        self.caches = caches
+        self.interval = interval
+        self.restored = {}
+        self._restore_done = False
+        self._restore = None
+        self._task = None
+
+    async def save_all(self):
+        snapshots = {name: cache.snapshot() for name, cache in self.caches.items()}
+        loop = asyncio.get_running_loop()
+        for name, entries in snapshots.items():
+            try:
+                size = await loop.run_in_executor(None, self.store.save, name, entries)
+                logging.info("Saved %s snapshot: %s entries, %s bytes", name, len(entries), size)
+            except Exception as e:
+                logging.error("Failed to save %s snapshot: %s", name, e)
+
+    async def restore_all(self):
+        loop = asyncio.get_running_loop()
+        for name, cache in self.caches.items():
+            loaded = await loop.run_in_executor(None, self.store.load, name)
+            if loaded is None:
+                continue
+            saved_at, entries = loaded
+            try:
+                self.restored[name] = cache.restore(entries, max(0.0, time.time() - saved_at))
+                logging.info("Restored %s of %s %s snapshot entries", self.restored[name], len(entries), name)
+            except Exception as e:
+                logging.error("Failed to restore %s snapshot: %s", name, e)
+        self._restore_done = True
+
+    async def _loop(self):
+        await self._restore
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save_all()
+
+    def start(self):
+        if self._task is None:
+            self._restore = asyncio.ensure_future(self.restore_all())
+            self._task = asyncio.create_task(self._loop())
+
+    async def wait_restored(self):
+        """Wait until the restore begun by ``start`` has finished, successfully or not."""
+        if self._restore is not None:
+            await asyncio.wait([self._restore])
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._restore is not None and not self._restore.done():
+            self._restore.cancel()
+            await asyncio.wait([self._restore])
+        # Saving before the restore finished would overwrite the snapshot
+        # with a partial one.
+        if self._restore_done:
+            await self.save_all()
+
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1").lower() not in ("", "0", "false", "no")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 300))
@@ -0,0 +1,56 @@
+import logging
+import time
+
+_STARTED = time.perf_counter()
+
+
+class StartupReport:
+    """
+    Timeline of the app's start: how long each import/init phase of ``main``
+    took, then the background warm-up of the heavy dependencies that are
+    deliberately not loaded at import time. The app counts as ready once the
+    warm-up has run, whether or not every step succeeded.
+    """
+
+    def __init__(self, started=None, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.phases = {}
+        self.warmup = {}
+        self.errors = {}
+        self.ready = False
+        self.ready_at = None
+        self._last = self.started
+
+    def mark(self, phase):
+        """Record the time since the previous mark as ``phase``."""
+        now = self.clock()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def warm_up(self, steps):
+        """Run each ``(name, fn)`` step in turn, timing it and recording failures."""
+        for name, fn in steps:
+            started = self.clock()
+            try:
+                fn()
+            except Exception as e:
+                self.errors[name] = str(e)
+                logging.warning("Warm-up step %s failed: %s", name, e)
+            self.warmup[name] = self.clock() - started
+        self.ready = True
+        self.ready_at = self.clock()
+        logging.info("Startup report: %s", self.report())
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "import_seconds": round(sum(self.phases.values()), 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "warmup": {name: round(seconds, 4) for name, seconds in self.warmup.items()},
+            "errors": self.errors,
+            "time_to_ready": None if self.ready_at is None else round(self.ready_at - self.started, 4),
+        }
+
+
+startup_report = StartupReport(started=_STARTED)
@@ -0,0 +1,44 @@
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+NDJSON_FORMATS = {"ndjson", "true", "1"}
+SSE_FORMATS = {"sse"}
+OFF_FORMATS = {"", "false", "0", "no"}
+
+
+def wants_stream(fmt):
+    """True if a ``stream`` query parameter asks for a streamed response."""
+    return fmt is not None and fmt.lower() not in OFF_FORMATS
+
+
+def ndjson_line(record):
+    return json.dumps(record, default=str) + "\n"
+
+
+def sse_message(record):
+    return f"event: {record.get('event', 'message')}\ndata: {json.dumps(record, default=str)}\n\n"
+
+
+def stream_response(records, fmt):
+    """
+    Stream an async iterator of dict records as NDJSON (``fmt`` of "ndjson",
+    "true" or "1") or as server-sent events (``fmt`` of "sse"), followed by a
+    final ``{"event": "done"}`` record. Each record's ``event`` key names the
+    SSE event.
+    """
+    fmt = fmt.lower()
+    if fmt in NDJSON_FORMATS:
+        encode, media_type = ndjson_line, "application/x-ndjson"
+    elif fmt in SSE_FORMATS:
+        encode, media_type = sse_message, "text/event-stream"
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {fmt}")
+
+    async def body():
+        async for record in records:
+            yield encode(record)
+        yield encode({"event": "done"})
+
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
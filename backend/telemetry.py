@@ -0,0 +1,239 @@
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        return self.header() + [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                                for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(_label_key(labels), ([0], 0.0))
+        return sum(counts)
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Minimal Prometheus-style metrics registry rendered in the text exposition
+    format. Besides counters, gauges and histograms updated in place,
+    ``collector`` callbacks are called at scrape time to report values read
+    off other components (cache and governor stats).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def collector(self, fn):
+        """Register ``fn() -> [(name, kind, help, [(labels, value), ...]), ...]``, called at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                logging.warning("Metrics collector %s failed: %s", collect.__name__, e)
+                continue
+            for name, kind, help_text, samples in families:
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+                lines.extend(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_seconds = registry.histogram("http_request_duration_seconds", "HTTP request latency by route, method and status.")
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served.")
+stage_seconds = registry.histogram("stage_duration_seconds", "Time spent in each stage of request handling.")
+upstream_seconds = registry.histogram("upstream_call_duration_seconds", "Latency of individual upstream call attempts.")
+upstream_calls = registry.counter("upstream_calls_total", "Upstream call attempts by host and outcome.")
+
+# Stage timings of the request being served, for the Server-Timing header.
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def stage(name, detail=None):
+    """Time a stage of request handling into ``stage_seconds`` and the current request's trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=name)
+        trace = current_trace.get()
+        if trace is not None:
+            key = name if detail is None else f"{name}.{detail}"
+            trace[key] = trace.get(key, 0.0) + elapsed
+
+
+def observe_upstream(host, seconds, outcome):
+    """Governor observer: one upstream call attempt finished with ``outcome`` ("ok", "no_data", "error" or "rejected")."""
+    upstream_calls.inc(host=host, outcome=outcome)
+    if outcome != "rejected":
+        upstream_seconds.observe(seconds, host=host)
+
+
+def server_timing(trace):
+    return ", ".join(f'{key.replace(" ", "_")};dur={seconds * 1000:.1f}' for key, seconds in trace.items())
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware recording request latency and in-flight requests, and
+    adding a ``Server-Timing`` header with the stages timed so far (for
+    streamed responses, the ones finished before the first byte).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = {}
+        token = current_trace.set(trace)
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace:
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing(trace).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            requests_in_flight.dec()
+            route = scope.get("route")
+            request_seconds.observe(time.perf_counter() - started, route=getattr(route, "path", "unmatched"),
+                                    method=scope["method"], status=status)
+            current_trace.reset(token)
+
+
+class SampledFilter(logging.Filter):
+    """Let through every WARNING and above, but only a ``rate`` fraction of lower-level records."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging(level="INFO", sample_rate=1.0):
+    logging.basicConfig(level=getattr(logging, str(level).upper(), logging.INFO))
+    if sample_rate < 1:
+        for handler in logging.getLogger().handlers:
+            handler.addFilter(SampledFilter(sample_rate))
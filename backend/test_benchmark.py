@@ -0,0 +1,51 @@
+import json
+from benchmark import run_benchmark, compare, main_cli
+
+def test_benchmark_reports_every_level():
+    """
+    Test that a small offline run produces one machine-readable result per
+    scenario and concurrency level, with ordered latency percentiles.
+    """
+    report = run_benchmark(scenarios=["stock_data", "query"], concurrency=(1, 2), requests=4,
+                           upstream_latency=0, upstream_jitter=0, llm_chunk_latency=0)
+    json.dumps(report)
+    assert [(r["scenario"], r["concurrency"]) for r in report["results"]] == \
+        [("stock_data", 1), ("stock_data", 2), ("query", 1), ("query", 2)]
+    for result in report["results"]:
+        assert result["errors"] == 0
+        latency = result["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert result["throughput_rps"] > 0
+        assert result["rss_mb"] is None or result["rss_mb"] > 0
+    assert report["results"][-1]["llm_calls"] == 4
+
+def test_injected_upstream_failures_are_counted():
+    """
+    Test that a fake upstream failing every call shows up as errors rather
+    than aborting the run.
+    """
+    report = run_benchmark(scenarios=["stock_news"], concurrency=(2,), requests=4,
+                           upstream_latency=0, upstream_jitter=0, upstream_failure_rate=1.0)
+    result = report["results"][0]
+    assert result["errors"] == 4
+    assert set(result["statuses"]) <= {"500", "503"}
+
+def test_baseline_comparison_flags_regressions(tmp_path):
+    """
+    Test that --baseline exits non-zero when p95 latency regressed beyond
+    the tolerance.
+    """
+    def report(p95, rps):
+        return {"results": [{"scenario": "stock_news", "concurrency": 1, "throughput_rps": rps,
+                             "latency_ms": {"p95": p95}}]}
+    assert compare(report(10.0, 100), report(11.0, 95)) == []
+    regressions = compare(report(10.0, 100), report(20.0, 50))
+    assert [r["metric"] for r in regressions] == ["p95_ms", "throughput_rps"]
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report(0.001, 1e9)))
+    output = tmp_path / "bench.json"
+    args = ["--scenarios", "stock_news", "--concurrency", "1", "--requests", "2", "--upstream-latency", "0",
+            "--upstream-jitter", "0", "--baseline", str(baseline), "--output", str(output)]
+    assert main_cli(args) == 1
+    assert json.loads(output.read_text())["regressions"]
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+import pytest
+import upstream
+from coalesce import SingleFlight
+
+class CountingFetch:
+    def __init__(self, delay=0.1, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, symbol, *args):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return (symbol, args)
+
+def test_identical_concurrent_calls_share_one_fetch():
+    """
+    Test that concurrent callers for the same key get the result of a
+    single upstream call.
+    """
+    fetch = CountingFetch()
+    async def scenario():
+        return await asyncio.gather(*(upstream.run_shared("info", "AAPL", fetch) for _ in range(20)))
+    results = asyncio.run(scenario())
+    assert fetch.calls == 1
+    assert results == [("AAPL", ())] * 20
+
+def test_wider_inflight_range_serves_narrower_request():
+    """
+    Test that a request whose span lies inside an in-flight call's span
+    shares it, while a wider request starts its own call.
+    """
+    flights = SingleFlight()
+    fetch = CountingFetch()
+    async def call(lo, hi):
+        return await flights.do(("history", "AAPL"), lambda: upstream.run_blocking(fetch, "AAPL", lo, hi), span=(lo, hi))
+    async def scenario():
+        wide = asyncio.create_task(call(0, 100))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(wide, call(10, 20), call(50, 150))
+    wide, narrow, wider = asyncio.run(scenario())
+    assert narrow == wide == ("AAPL", (0, 100))
+    assert wider == ("AAPL", (50, 150))
+    assert fetch.calls == 2
+    assert flights.stats() == {"calls": 2, "shared": 1, "in_flight": 0}
+
+def test_errors_fan_out_and_are_not_cached():
+    """
+    Test that a failing shared call raises for every waiter and that the
+    next call after it finishes goes upstream again.
+    """
+    fetch = CountingFetch(error=ValueError("No data available for symbol: ZZZZ"))
+    async def scenario():
+        first = await asyncio.gather(*(upstream.run_shared("news", "ZZZZ", fetch) for _ in range(5)), return_exceptions=True)
+        second = await asyncio.gather(upstream.run_shared("news", "ZZZZ", fetch), return_exceptions=True)
+        return first + second
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert fetch.calls == 2
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    """
+    Test that one waiter timing out leaves the shared call running for
+    the others.
+    """
+    flights = SingleFlight()
+    fetch = CountingFetch(delay=0.2)
+    async def call():
+        return await flights.do("key", lambda: upstream.run_blocking(fetch, "AAPL"))
+    async def scenario():
+        impatient = asyncio.wait_for(call(), 0.05)
+        results = await asyncio.gather(impatient, call(), return_exceptions=True)
+        return results
+    impatient, patient = asyncio.run(scenario())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == ("AAPL", ())
+    assert fetch.calls == 1
@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from downsample import lttb_indices, minmax_indices, downsample_matrix
+from price_store import price_matrix
+from test_query_endpoint import client
+
+def make_matrix(days=1000):
+    index = pd.date_range("2020-01-01", periods=days, freq="D", name="Date")
+    aapl = pd.DataFrame({"Close": np.sin(np.arange(days) / 20.0)}, index=index)
+    msft = pd.DataFrame({"Close": np.cos(np.arange(days) / 50.0)}, index=index)
+    return price_matrix({"AAPL": aapl, "MSFT": msft})
+
+def test_lttb_keeps_endpoints_and_extremes():
+    """
+    Test that LTTB returns the requested number of increasing indices,
+    including both endpoints and a spike.
+    """
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[250] = 100.0
+    picked = lttb_indices(x, y, 50)
+    assert len(picked) == 50
+    assert picked[0] == 0 and picked[-1] == 499
+    assert np.all(np.diff(picked) > 0)
+    assert 250 in picked
+
+def test_minmax_keeps_bucket_extremes():
+    """
+    Test that min/max bucketing keeps the global minimum and maximum.
+    """
+    y = np.sin(np.arange(1000) / 10.0)
+    picked = minmax_indices(y, 40)
+    assert len(picked) <= 42
+    assert np.argmax(y) in picked and np.argmin(y) in picked
+
+def test_downsample_matrix_shares_axis_and_keeps_key_dates():
+    """
+    Test that all symbols are downsampled onto one date axis within budget
+    and that rows nearest the key dates are kept.
+    """
+    matrix = make_matrix()
+    reduced = downsample_matrix(matrix, 100, key_dates=["2021-03-14"])
+    assert len(reduced) <= 101
+    assert pd.Timestamp("2021-03-14") in reduced.index
+    assert list(reduced.columns) == list(matrix.columns)
+    assert not reduced.isna().any().any()
+
+def test_downsample_matrix_is_noop_under_budget():
+    """
+    Test that short series are returned untouched.
+    """
+    matrix = make_matrix(50)
+    assert downsample_matrix(matrix, 100) is matrix
+
+def test_stock_data_max_points(client):
+    """
+    Test that /api/stock_data honours max_points and key_dates while all
+    symbols keep the same dates.
+    """
+    url = "/api/stock_data?symbols=AAPL,MSFT&start_date=2015-01-01&end_date=2023-01-01"
+    full = client.get(url).json()
+    reduced = client.get(url + "&max_points=60&key_dates=2019-07-06").json()
+    assert len(full["AAPL"]) > 1000
+    assert len(reduced["AAPL"]) <= 61
+    assert list(reduced["AAPL"]) == list(reduced["MSFT"])
+    assert "2019-07-05" in reduced["AAPL"]
+
+def test_stock_data_rejects_bad_downsample_params(client):
+    """
+    Test that unknown methods and malformed key dates are rejected.
+    """
+    url = "/api/stock_data?symbols=AAPL&start_date=2020-01-01&end_date=2021-01-01&max_points=10"
+    assert client.get(url + "&downsample=fft").status_code == 400
+    assert client.get(url + "&key_dates=July").status_code == 400
+    assert client.get(url.replace("max_points=10", "max_points=1")).status_code == 422
+
+def test_streamed_stock_data_is_downsampled(client):
+    """
+    Test that streamed symbol records honour max_points and key_dates, and
+    that formats and columns the stream cannot carry are rejected.
+    """
+    url = "/api/stock_data?symbols=AAPL,MSFT&start_date=2015-01-01&end_date=2023-01-01&stream=ndjson"
+    response = client.get(url + "&max_points=60&key_dates=2019-07-06")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines() if line]
+    series = {record["symbol"]: record["data"] for record in records if record["event"] == "symbol"}
+    assert set(series) == {"AAPL", "MSFT"}
+    assert all(len(points) <= 61 and "2019-07-05" in points for points in series.values())
+    assert client.get(url + "&format=columnar").status_code == 400
+    assert client.get(url + "&columns=Close,Volume").status_code == 400
+    assert client.get(url + "&downsample=fft").status_code == 400
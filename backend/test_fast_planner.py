@@ -0,0 +1,91 @@
+import pytest
+from datetime import date
+from fastapi.testclient import TestClient
+from fast_planner import plan_query
+
+TODAY = date(2024, 6, 15)
+
+def test_plan_simple_history_query():
+    """
+    Test that a ticker with a compact range is planned locally as a
+    getHistory action ending 'current'.
+    """
+    plan = plan_query("TSLA 1y", TODAY)
+    assert plan["actions"] == [
+        {"type": "getHistory", "symbols": ["TSLA"], "startDate": "2023-06-15", "endDate": "current"}
+    ]
+    assert plan["keyDates"] == []
+    assert plan["description"]
+
+def test_plan_comparison_with_company_names():
+    """
+    Test that company names are resolved to tickers and relative
+    ranges are parsed.
+    """
+    plan = plan_query("Compare Apple and Microsoft stocks over the last month", TODAY)
+    action = plan["actions"][0]
+    assert action["type"] == "getHistory"
+    assert action["symbols"] == ["AAPL", "MSFT"]
+    assert action["startDate"] == "2024-05-15"
+
+def test_plan_metrics_query():
+    """
+    Test that metric phrases map onto the metric names offered to the LLM.
+    """
+    plan = plan_query("What are the current P/E ratios and market caps of Tesla and Amazon?", TODAY)
+    assert plan["actions"] == [
+        {"type": "getMetrics", "symbols": ["TSLA", "AMZN"], "metrics": ["trailingPE", "marketCap"]}
+    ]
+
+def test_plan_news_query():
+    """
+    Test that news requests produce a getNews action.
+    """
+    plan = plan_query("Get me the latest news about Google", TODAY)
+    assert plan["actions"] == [{"type": "getNews", "symbols": ["GOOGL"]}]
+
+@pytest.mark.parametrize("query,start,end", [
+    ("NVDA ytd", "2024-01-01", "current"),
+    ("SOFI since 2021", "2021-01-01", "current"),
+    ("AAPL in 2022", "2022-01-01", "2023-01-01"),
+    ("MSFT past 3 months", "2024-03-15", "current"),
+    ("AMZN this quarter", "2024-04-01", "current"),
+])
+def test_plan_date_ranges(query, start, end):
+    """
+    Test the supported relative and calendar date range forms.
+    """
+    action = plan_query(query, TODAY)["actions"][0]
+    assert (action["startDate"], action["endDate"]) == (start, end)
+
+@pytest.mark.parametrize("query", [
+    "Show me Tesla's stock graph during covid",
+    "What were the significant events for Apple stock in the last quarter?",
+    "12345",
+    "show me the best stocks",
+    "AAPL last month and last year",
+    "what does apple stock cost",
+    "apple v microsoft",
+    "spot price of coin",
+])
+def test_unrecognized_queries_fall_through(query):
+    """
+    Test that queries with words the planner does not understand are
+    left for the LLM.
+    """
+    assert plan_query(query, TODAY) is None
+
+def test_process_query_reports_fast_path(monkeypatch):
+    """
+    Test that /api/process_query serves simple queries without the LLM
+    and reports the path in the X-Plan-Source header.
+    """
+    monkeypatch.setenv("REACT_APP_OPENAI_API_KEY", "test")
+    import main
+    def fail():
+        raise AssertionError("LLM should not be called")
+    monkeypatch.setattr(main, "get_client", fail)
+    response = TestClient(main.app).post("/api/process_query", json={"query": "compare AAPL and MSFT last month"})
+    assert response.status_code == 200
+    assert response.headers["X-Plan-Source"] == "fast_path"
+    assert response.json()["actions"][0]["symbols"] == ["AAPL", "MSFT"]
@@ -0,0 +1,141 @@
+import pytest
+import upstream
+from governor import Governor, TokenBucket, AdaptiveLimiter, CircuitOpenError
+from info_cache import InfoCache
+from test_query_endpoint import client
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def flaky(failures, error=ConnectionError("reset")):
+    """A call that raises ``error`` the first ``failures`` times, then returns "ok"."""
+    calls = []
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return "ok"
+    call.calls = calls
+    return call
+
+@pytest.fixture
+def governor(monkeypatch):
+    clock = FakeClock()
+    governor = Governor(rate=0, retries=0, failure_threshold=1, reset_timeout=30, clock=clock, sleep=clock.sleep)
+    monkeypatch.setattr(upstream, "governor", governor)
+    return governor
+
+def test_token_bucket_waits_once_burst_is_spent():
+    """
+    Test that calls past the burst wait for the bucket to refill at the
+    configured rate.
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.now == pytest.approx(1.0)
+
+def test_limiter_grows_on_success_and_halves_on_error():
+    """
+    Test the AIMD rule: fast successes raise the concurrency limit slowly,
+    an error halves it, and it stays within its bounds.
+    """
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8, target_latency=1.0)
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(0.1, ok=True)
+    assert 5 < limiter.limit < 6
+    limiter.acquire()
+    limiter.release(0.1, ok=False)
+    assert 2.5 < limiter.limit < 3
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(0.1, ok=False)
+    assert limiter.limit == 1
+
+def test_failed_calls_are_retried_with_bounded_jitter():
+    """
+    Test that transient failures are retried with backoff delays within
+    the exponential cap, and the eventual result is returned.
+    """
+    clock = FakeClock()
+    delays = []
+    governor = Governor(rate=0, retries=3, backoff_base=0.5, backoff_cap=1.0, clock=clock, sleep=delays.append)
+    call = flaky(2)
+    assert governor.call("yahoo", call) == "ok"
+    assert len(call.calls) == 3
+    assert governor.stats()["retries"] == 2
+    assert 0 <= delays[0] <= 0.5 and 0 <= delays[1] <= 1.0
+
+def test_missing_data_is_not_retried():
+    """
+    Test that a ValueError (no data for the symbol) is raised at once and
+    does not count against the host's circuit.
+    """
+    governor = Governor(rate=0, retries=3, failure_threshold=1, sleep=lambda s: None)
+    call = flaky(1, ValueError("No data"))
+    with pytest.raises(ValueError):
+        governor.call("yahoo", call)
+    assert len(call.calls) == 1
+    assert governor.breaker("yahoo").state == "closed"
+
+def test_circuit_opens_fails_fast_and_recovers(governor):
+    """
+    Test that repeated failures open the circuit, calls then fail without
+    reaching upstream, and a successful probe after the reset timeout
+    closes it again.
+    """
+    call = flaky(1)
+    with pytest.raises(ConnectionError):
+        governor.call("yahoo", call)
+    with pytest.raises(CircuitOpenError):
+        governor.call("yahoo", call)
+    assert len(call.calls) == 1
+    governor.sleep(30)
+    assert governor.call("yahoo", call) == "ok"
+    assert governor.breaker("yahoo").state == "closed"
+
+def test_open_circuit_serves_stale_history(client, governor):
+    """
+    Test that /api/stock_data answers from the price store while the
+    circuit is open, flagging the stale symbols in a header.
+    """
+    assert client.get("/api/stock_data?symbols=AAPL&start_date=2023-01-02&end_date=2023-02-01").status_code == 200
+    governor.breaker(upstream.YAHOO).record_failure()
+    response = client.get("/api/stock_data?symbols=AAPL&start_date=2023-01-02&end_date=2023-03-01")
+    assert response.status_code == 200
+    assert response.headers["X-Stale-Symbols"] == "AAPL"
+    assert max(response.json()["AAPL"]) < "2023-02-01"
+
+def test_open_circuit_serves_expired_info(client, governor, monkeypatch):
+    """
+    Test that expired cached metrics are still served, marked stale, while
+    the circuit is open.
+    """
+    clock = FakeClock()
+    monkeypatch.setattr("main.info_cache", InfoCache(max_stale=60, clock=clock))
+    assert client.get("/api/stock_metrics?symbols=AAPL&metrics=marketCap").status_code == 200
+    clock.now += 3600
+    governor.breaker(upstream.YAHOO).record_failure()
+    response = client.get("/api/stock_metrics?symbols=AAPL&metrics=marketCap")
+    assert response.status_code == 200
+    assert response.json() == {"AAPL": {"marketCap": 1000}}
+    assert response.headers["X-Stale-Symbols"] == "AAPL"
+
+def test_open_circuit_without_cache_returns_503(client, governor):
+    """
+    Test that with nothing cached an open circuit surfaces as a 503 with a
+    Retry-After hint.
+    """
+    governor.breaker(upstream.YAHOO).record_failure()
+    response = client.get("/api/stock_news?symbol=AAPL")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from info_cache import InfoCache, FRESHNESS
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeInfo:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, symbol):
+        self.calls += 1
+        if symbol == "INVALID":
+            return {}
+        return {"marketCap": 1000 + self.calls, "regularMarketPrice": 10.0 + self.calls,
+                "bookValue": 4.2, "longBusinessSummary": "x" * 5000}
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_repeat_lookup_is_served_from_cache():
+    """
+    Test that a second lookup within the TTL does not hit upstream and
+    that unrequested bulky fields are projected away.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock)
+    async def scenario():
+        first = await cache.get("AAPL", ["marketCap", "bookValue"])
+        second = await cache.get("AAPL", ["marketCap"])
+        return first, second
+    first, second = run(scenario())
+    assert first == {"marketCap": 1001, "bookValue": 4.2}
+    assert second == {"marketCap": 1001}
+    assert fetch.calls == 1
+    assert "longBusinessSummary" not in cache._records["AAPL"].values
+
+def test_price_fields_expire_before_fundamentals():
+    """
+    Test that freshness is judged by the most volatile requested field.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock, max_stale=0)
+    async def scenario():
+        await cache.get("AAPL", ["bookValue", "regularMarketPrice"])
+        clock.now += FRESHNESS["price"] + 1
+        await cache.get("AAPL", ["bookValue"])
+        assert fetch.calls == 1
+        await cache.get("AAPL", ["regularMarketPrice"])
+        assert fetch.calls == 2
+    run(scenario())
+
+def test_stale_values_are_served_while_revalidating():
+    """
+    Test that an expired record is returned immediately and refreshed
+    in the background.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock, max_stale=3600)
+    async def scenario():
+        await cache.get("AAPL", ["regularMarketPrice"])
+        clock.now += FRESHNESS["price"] + 1
+        stale = await cache.get("AAPL", ["regularMarketPrice"])
+        assert stale == {"regularMarketPrice": 11.0}
+        await asyncio.gather(*cache._refreshing.values())
+        return await cache.get("AAPL", ["regularMarketPrice"])
+    assert run(scenario()) == {"regularMarketPrice": 12.0}
+    assert cache.stale_hits == 1
+
+def test_max_age_waits_for_fresh_values():
+    """
+    Test that a lookup with ``max_age`` judges freshness by it alone and
+    reloads an older record instead of serving it stale.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock, max_stale=3600)
+    async def scenario():
+        await cache.get("AAPL", ["regularMarketPrice"])
+        clock.now += FRESHNESS["price"] + 1
+        assert await cache.get("AAPL", ["regularMarketPrice"], max_age=60) == {"regularMarketPrice": 11.0}
+        clock.now += 60
+        return await cache.get("AAPL", ["regularMarketPrice"], max_age=60)
+    assert run(scenario()) == {"regularMarketPrice": 12.0}
+    assert fetch.calls == 2
+    assert cache.stale_hits == 0 and not cache._refreshing
+
+def test_uncached_field_widens_projection():
+    """
+    Test that a field outside the cached projection triggers a refetch
+    and is kept afterwards.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock)
+    async def scenario():
+        await cache.get("AAPL", ["marketCap"])
+        await cache.get("AAPL", ["longBusinessSummary"])
+        await cache.get("AAPL", ["longBusinessSummary", "marketCap"])
+    run(scenario())
+    assert fetch.calls == 2
+
+def test_lru_eviction_under_memory_cap():
+    """
+    Test that the least recently used record is evicted once the cache
+    exceeds its byte budget.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock, max_bytes=1)
+    async def scenario():
+        await cache.get("AAPL", ["marketCap"])
+        await cache.get("MSFT", ["marketCap"])
+    run(scenario())
+    assert list(cache._records) == ["MSFT"]
+
+def test_empty_info_raises_and_is_not_cached():
+    """
+    Test that a symbol without upstream info raises ValueError.
+    """
+    fetch, clock = FakeInfo(), FakeClock()
+    cache = InfoCache(fetch=fetch, clock=clock)
+    with pytest.raises(ValueError, match="No data available for symbol: INVALID"):
+        run(cache.get("INVALID", ["marketCap"]))
+    assert "INVALID" not in cache._records
@@ -0,0 +1,164 @@
+import asyncio
+import pandas as pd
+import pytest
+import main
+from governor import CircuitOpenError
+from live import LiveHub, intraday_points, parse_live_symbols
+from test_query_endpoint import client
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeIntraday:
+    """Serves a growing list of minutes per symbol, counting upstream calls."""
+    def __init__(self):
+        self.calls = []
+        self.points = {}
+        self.error = None
+
+    def add(self, symbol, *points):
+        self.points.setdefault(symbol, []).extend([list(point) for point in points])
+
+    async def __call__(self, symbol):
+        self.calls.append(symbol)
+        if self.error is not None:
+            raise self.error
+        points = [list(point) for point in self.points.get(symbol, [])]
+        if not points:
+            return [], None
+        bar = {"date": "2024-05-01", "Open": points[0][1], "High": max(p[1] for p in points),
+               "Low": min(p[1] for p in points), "Close": points[-1][1], "Volume": sum(p[2] for p in points)}
+        return points, bar
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+def test_intraday_points_builds_running_bar():
+    """
+    Test that minute bars reduce to [epoch_ms, close, volume] points and
+    the day's running OHLCV.
+    """
+    index = pd.date_range("2024-05-01 09:30", periods=3, freq="min", tz="America/New_York")
+    frame = pd.DataFrame({"Open": [10.0, 11.0, 12.0], "High": [11.0, 13.0, 12.5], "Low": [9.5, 10.5, 11.5],
+                          "Close": [11.0, 12.0, 12.2], "Volume": [100, 200, 50]}, index=index)
+    points, bar = intraday_points(frame)
+    assert points[0] == [int(index[0].timestamp() * 1000), 11.0, 100.0]
+    assert len(points) == 3
+    assert bar == {"date": "2024-05-01", "Open": 10.0, "High": 13.0, "Low": 9.5, "Close": 12.2, "Volume": 350.0}
+    assert intraday_points(frame.iloc[:0]) == ([], None)
+
+def test_one_poll_fans_out_incremental_ticks():
+    """
+    Test that many subscribers to one symbol share each upstream poll, get
+    only the new minutes (plus a changed last minute), and that a late
+    subscriber starts from a snapshot of the series so far.
+    """
+    fetch = FakeIntraday()
+    hub = LiveHub(fetch, interval=3600)
+    async def scenario():
+        queues = [asyncio.Queue(10) for _ in range(3)]
+        fetch.add("AAPL", (1, 10.0, 5), (2, 10.5, 5))
+        for queue in queues:
+            hub.subscribe("AAPL", queue)
+        await asyncio.sleep(0)
+        live = hub._symbols["AAPL"]
+        first = [drain(queue) for queue in queues]
+
+        fetch.points["AAPL"][-1] = [2, 10.7, 8]
+        fetch.add("AAPL", (3, 11.0, 4))
+        await hub.poll_once(live)
+        second = drain(queues[0])
+        await hub.poll_once(live)
+        unchanged = drain(queues[1])
+
+        late = asyncio.Queue(10)
+        hub.subscribe("AAPL", late)
+        snapshot = drain(late)
+        await hub.stop()
+        return first, second, unchanged, snapshot
+    first, second, unchanged, snapshot = asyncio.run(scenario())
+    assert fetch.calls == ["AAPL"] * 3
+    assert all(messages == first[0] for messages in first)
+    assert first[0][0]["points"] == [[1, 10.0, 5], [2, 10.5, 5]]
+    assert second[0]["points"] == [[2, 10.7, 8], [3, 11.0, 4]]
+    assert second[0]["bar"]["Close"] == 11.0
+    assert [m["points"] for m in unchanged] == [[[2, 10.7, 8], [3, 11.0, 4]]]
+    assert snapshot == [{"event": "snapshot", "symbol": "AAPL", "bar": second[0]["bar"],
+                         "points": [[1, 10.0, 5], [2, 10.7, 8], [3, 11.0, 4]]}]
+
+def test_idle_symbols_stop_polling():
+    """
+    Test that a symbol keeps its poller through a brief gap between
+    subscribers but stops once idle past the timeout.
+    """
+    fetch, clock = FakeIntraday(), FakeClock()
+    hub = LiveHub(fetch, interval=0.001, idle_timeout=30, clock=clock)
+    async def scenario():
+        queue = asyncio.Queue(100)
+        hub.subscribe("MSFT", queue)
+        await asyncio.sleep(0.01)
+        hub.unsubscribe("MSFT", queue)
+        clock.now += 10
+        await asyncio.sleep(0.01)
+        assert hub.stats()["symbols"] == 1
+        clock.now += 30
+        await asyncio.sleep(0.01)
+        calls = len(fetch.calls)
+        await asyncio.sleep(0.01)
+        return calls
+    calls = asyncio.run(scenario())
+    assert hub.stats()["symbols"] == 0
+    assert len(fetch.calls) == calls
+
+def test_open_circuit_sends_status():
+    """
+    Test that subscribers are told when upstream is unavailable instead of
+    the poller failing.
+    """
+    fetch = FakeIntraday()
+    fetch.error = CircuitOpenError("yahoo", 12.0)
+    hub = LiveHub(fetch, interval=3600)
+    async def scenario():
+        queue = asyncio.Queue(10)
+        hub.subscribe("TSLA", queue)
+        await asyncio.sleep(0)
+        messages = drain(queue)
+        await hub.stop()
+        return messages
+    assert asyncio.run(scenario()) == [{"event": "status", "symbol": "TSLA", "stale": True, "retryAfter": 12.0}]
+
+def test_websocket_subscriptions(client, monkeypatch):
+    """
+    Test the WebSocket endpoint: initial symbols stream ticks, subscribe
+    messages add symbols, and invalid requests get an error event.
+    """
+    fetch = FakeIntraday()
+    fetch.add("AAPL", (1, 10.0, 5))
+    fetch.add("MSFT", (1, 20.0, 5))
+    monkeypatch.setattr(main, "live_hub", LiveHub(fetch, interval=3600))
+    with client.websocket_connect("/api/live/ws?symbols=aapl") as ws:
+        assert ws.receive_json()["symbol"] == "AAPL"
+        ws.send_json({"subscribe": ["MSFT"]})
+        messages = [ws.receive_json(), ws.receive_json()]
+        assert {"event": "subscribed", "symbols": ["AAPL", "MSFT"]} in messages
+        assert any(m.get("event") == "tick" and m["symbol"] == "MSFT" for m in messages)
+        ws.send_json({"subscribe": [f"S{i}" for i in range(main.LIVE_MAX_SYMBOLS)]})
+        assert ws.receive_json()["event"] == "error"
+    assert main.live_hub.stats()["subscribers"] == 0
+
+def test_live_stream_validates_symbols(client):
+    """
+    Test that the SSE endpoint rejects empty or oversized symbol lists.
+    """
+    assert client.get("/api/live?symbols=,").status_code == 400
+    too_many = ",".join(f"S{i}" for i in range(main.LIVE_MAX_SYMBOLS + 1))
+    assert client.get(f"/api/live?symbols={too_many}").status_code == 400
+    with pytest.raises(ValueError):
+        parse_live_symbols({"AAPL": 1}, 5)
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from datetime import date
+from plan_cache import PlanCache, normalize_query
+
+class Today:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_plan():
+    return {
+        "actions": [
+            {"type": "getHistory", "symbols": ["AAPL", "MSFT"], "startDate": "2024-05-01", "endDate": "current"},
+            {"type": "getHistory", "symbols": ["TSLA"], "startDate": "2020-02-01", "endDate": "2020-06-30"},
+        ],
+        "description": "Compare Apple and Microsoft",
+        "keyDates": [{"date": "2024-05-02", "description": "Earnings", "symbol": "AAPL"}],
+    }
+
+def test_normalize_query_equates_aliases_and_punctuation():
+    """
+    Test that case, whitespace, punctuation and company names do not
+    change the cache key.
+    """
+    assert normalize_query("Compare Apple and Microsoft stocks over the last month!") == \
+        normalize_query("compare  AAPL and msft stocks over the last month")
+    assert normalize_query("Tesla's P/E?") == "tsla p/e"
+
+def test_hit_reanchors_relative_ranges():
+    """
+    Test that a cached plan ending 'current' is shifted to today while
+    historical ranges and key dates are left unchanged.
+    """
+    today = Today(date(2024, 6, 1))
+    cache = PlanCache(today=today)
+    run(cache.put("Compare Apple and Microsoft", make_plan()))
+    today.value = date(2024, 6, 11)
+    plan = run(cache.get("compare AAPL and MSFT"))
+    assert plan["actions"][0]["startDate"] == "2024-05-11"
+    assert plan["actions"][0]["endDate"] == "current"
+    assert plan["actions"][1]["startDate"] == "2020-02-01"
+    assert plan["keyDates"] == make_plan()["keyDates"]
+    assert cache.stats()["hits"] == 1
+
+def test_cached_plan_is_not_mutated_by_callers():
+    """
+    Test that modifying a returned plan does not corrupt the cache.
+    """
+    cache = PlanCache()
+    run(cache.put("tsla 1y", make_plan()))
+    run(cache.get("tsla 1y"))["actions"].clear()
+    assert len(run(cache.get("tsla 1y"))["actions"]) == 2
+
+def test_eviction_and_counters():
+    """
+    Test that the cache stays bounded and counts hits, misses and
+    evictions.
+    """
+    cache = PlanCache(max_entries=2)
+    for query in ["aapl 1y", "msft 1y", "tsla 1y"]:
+        run(cache.put(query, make_plan()))
+    assert run(cache.get("aapl 1y")) is None
+    assert run(cache.get("tsla 1y")) is not None
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+def test_entries_expire_after_ttl():
+    """
+    Test that plans older than the TTL are treated as misses.
+    """
+    now = [0.0]
+    cache = PlanCache(ttl=60, clock=lambda: now[0])
+    run(cache.put("aapl 1y", make_plan()))
+    now[0] = 61.0
+    assert run(cache.get("aapl 1y")) is None
+
+def test_invalid_plans_are_not_cached():
+    """
+    Test that responses without an actions list are never cached.
+    """
+    cache = PlanCache()
+    run(cache.put("aapl", {"description": "no actions"}))
+    assert run(cache.get("aapl")) is None
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import main
+from plan_stream import ActionStreamParser
+from test_query_endpoint import client
+
+PLAN = {
+    "actions": [
+        {"type": "getHistory", "symbols": ["AAPL"], "startDate": "2023-01-02", "endDate": "2023-03-01"},
+        {"type": "getNews", "symbols": ["AAPL"], "note": "quotes \" and {braces} [here]"},
+    ],
+    "description": "Apple around its earnings",
+    "keyDates": [{"date": "2023-02-02", "description": "Earnings", "symbol": "AAPL"}],
+}
+RAW = "```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+
+class FakeCompletions:
+    """Streams RAW a few characters per chunk, logging each chunk it yields."""
+    def __init__(self, log):
+        self.log = log
+
+    async def create(self, model, messages, stream):
+        assert stream is True
+        async def chunks():
+            for i in range(0, len(RAW), 7):
+                await asyncio.sleep(0.001)
+                self.log.append("chunk")
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=RAW[i:i + 7]))])
+        return chunks()
+
+def fake_client(log):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(log)))
+
+def test_parser_emits_each_action_once_complete():
+    """
+    Test that actions are emitted as soon as their closing brace arrives,
+    ignoring the code fence and brackets or quotes inside strings.
+    """
+    parser = ActionStreamParser()
+    emitted = []
+    for i, char in enumerate(RAW):
+        for action in parser.feed(char):
+            emitted.append((action, i))
+    assert [action for action, _ in emitted] == PLAN["actions"]
+    assert emitted[-1][1] < RAW.index("description")
+    assert parser.emitted == 2
+    assert parser.text == RAW
+
+def test_query_dispatches_actions_while_plan_streams(client, monkeypatch):
+    """
+    Test that /api/query starts running an action before the completion
+    has finished streaming, and still returns the full plan and results.
+    """
+    log = []
+    monkeypatch.setattr(main, "get_client", lambda: fake_client(log))
+    run_action = main.run_action
+    async def logged_run_action(action, *args):
+        log.append(f"start {action['type']}")
+        return await run_action(action, *args)
+    monkeypatch.setattr(main, "run_action", logged_run_action)
+
+    response = client.post("/api/query?max_points=5", json={"query": "what drove apple around its earnings"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["source"] == "llm"
+    assert data["plan"] == PLAN
+    assert log.index("start getHistory") < len(log) - 1 - log[::-1].index("chunk")
+    history, news = data["results"]
+    assert "2023-02-02" in history["data"]["AAPL"]
+    assert len(news["data"]["AAPL"]) == 8
+
+def test_process_query_returns_streamed_plan(client, monkeypatch):
+    """
+    Test that /api/process_query assembles the streamed completion into
+    the plan and caches it.
+    """
+    monkeypatch.setattr(main, "get_client", lambda: fake_client([]))
+    response = client.post("/api/process_query", json={"query": "what drove apple around its earnings"})
+    assert response.status_code == 200
+    assert response.headers["X-Plan-Source"] == "llm"
+    assert response.json() == PLAN
+    assert client.post("/api/process_query", json={"query": "What drove Apple around its earnings?"}).headers["X-Plan-Source"] == "cache"
@@ -0,0 +1,135 @@
+import asyncio
+import main
+from governor import Governor
+from info_cache import InfoCache
+from prefetch import Popularity, Prefetcher
+from snapshot import SnapshotStore, Snapshotter
+from test_info_cache import FakeInfo
+from test_query_endpoint import client
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeGovernor:
+    def __init__(self, headroom=True):
+        self.calls = 0
+        self.headroom = headroom
+
+    def has_headroom(self):
+        return self.headroom
+
+def recording_warmers(governor, kinds=("history", "info")):
+    warmed = []
+    def make(kind):
+        async def warm(symbol):
+            governor.calls += 1
+            warmed.append((kind, symbol))
+        return warm
+    return {kind: make(kind) for kind in kinds}, warmed
+
+def test_popularity_decays_over_time():
+    """
+    Test that recent requests outrank older ones once the older scores
+    have decayed.
+    """
+    clock = FakeClock()
+    popularity = Popularity(half_life=3600, clock=clock)
+    for _ in range(3):
+        popularity.record(["AAPL"])
+    clock.now = 7200
+    popularity.record(["MSFT", "MSFT"])
+    popularity.record(["MSFT"])
+    assert popularity.top(2) == ["MSFT", "AAPL"]
+    assert popularity.top(1) == ["MSFT"]
+
+def test_cycle_warms_seeds_then_popular_symbols():
+    """
+    Test that a cycle runs every warmer for the seed list followed by the
+    most requested symbols, without duplicates.
+    """
+    governor = FakeGovernor()
+    warmers, warmed = recording_warmers(governor)
+    prefetcher = Prefetcher(warmers, governor, popularity=Popularity(clock=FakeClock()), seeds=["SPY"], top_n=2)
+    prefetcher.record(["NVDA", "SPY"])
+    prefetcher.record(["NVDA", "TSLA"])
+    prefetcher.record(["TSLA", "NVDA"])
+    prefetcher.record(["AMD"])
+    assert asyncio.run(prefetcher.run_once()) == 6
+    assert warmed == [(kind, symbol) for symbol in ("SPY", "NVDA", "TSLA") for kind in ("history", "info")]
+
+def test_cycle_respects_upstream_budget():
+    """
+    Test that a cycle stops once its upstream call budget is spent.
+    """
+    governor = FakeGovernor()
+    warmers, warmed = recording_warmers(governor)
+    prefetcher = Prefetcher(warmers, governor, seeds=["SPY", "QQQ", "DIA"], max_calls=3)
+    assert asyncio.run(prefetcher.run_once()) == 3
+    assert len(warmed) == 3
+
+def test_cycle_yields_to_foreground_requests():
+    """
+    Test that nothing is prefetched while the governor has no spare
+    upstream capacity.
+    """
+    governor = FakeGovernor(headroom=False)
+    warmers, warmed = recording_warmers(governor)
+    prefetcher = Prefetcher(warmers, governor, seeds=["SPY"])
+    assert asyncio.run(prefetcher.run_once()) == 0
+    assert warmed == []
+
+def test_first_cycle_waits_for_the_snapshot_restore(tmp_path):
+    """
+    Test that a prefetcher started after a snapshot restore only warms
+    once the restore finished, so restored symbols are not fetched again.
+    """
+    store = SnapshotStore(str(tmp_path))
+    store.save("info", [["SPY", {"marketCap": 1}, ["marketCap"], 0.0]])
+    cache = InfoCache(fetch=FakeInfo())
+    snapshotter = Snapshotter(store, {"info": cache})
+    seen = []
+    async def warm(symbol):
+        seen.append(symbol in cache._records)
+    prefetcher = Prefetcher({"info": warm}, FakeGovernor(), seeds=["SPY"])
+    async def scenario():
+        snapshotter.start()
+        prefetcher.start(after=snapshotter.wait_restored())
+        while not seen:
+            await asyncio.sleep(0.01)
+        await prefetcher.stop()
+        await snapshotter.stop()
+    asyncio.run(scenario())
+    assert seen == [True]
+
+def test_requested_symbols_are_prefetched(client, monkeypatch):
+    """
+    Test that symbols seen in requests are warmed by the app's prefetcher,
+    so a later news request is served from the cache.
+    """
+    prefetcher = Prefetcher(main.prefetcher.warmers, Governor(rate=0), seeds=[])
+    monkeypatch.setattr(main, "prefetcher", prefetcher)
+    assert client.get("/api/stock_metrics?symbols=AMD&metrics=marketCap").status_code == 200
+    assert asyncio.run(prefetcher.run_once()) == 3
+    misses = main.news_cache.misses
+    assert len(client.get("/api/stock_news?symbol=AMD").json()) == 8
+    assert main.news_cache.misses == misses
+    assert main.news_cache.hits == 1
+
+def test_only_symbols_that_returned_data_are_ranked(client, monkeypatch):
+    """
+    Test that failed or invalid requests leave the popularity ranking
+    alone, and that recorded symbols are normalized.
+    """
+    prefetcher = Prefetcher(main.prefetcher.warmers, Governor(rate=0), seeds=[])
+    monkeypatch.setattr(main, "prefetcher", prefetcher)
+    assert client.get("/api/stock_metrics?symbols=ZZZZ&metrics=marketCap").status_code == 404
+    assert client.get("/api/stock_data?symbols=ZZZZ&start_date=2023-01-02&end_date=2023-03-01").status_code == 404
+    assert client.get("/api/stock_data?symbols=AMD&start_date=2023-01-02&end_date=2023-03-01&transform=bogus").status_code == 400
+    assert prefetcher.targets() == []
+    assert client.get("/api/stock_metrics?symbols=%20amd%20&metrics=marketCap").status_code == 200
+    assert client.get("/api/stock_metrics?symbols=ZZZZ,nvda&metrics=marketCap&stream=ndjson").status_code == 200
+    assert sorted(prefetcher.targets()) == ["AMD", "NVDA"]
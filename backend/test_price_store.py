@@ -0,0 +1,128 @@
+import json
+import pytest
+import pandas as pd
+from datetime import date, timedelta
+from price_store import PriceStore
+
+def make_history(start, end):
+    """Build a yfinance-style business-day history frame over [start, end)."""
+    index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), tz="America/New_York")
+    prices = [100.0 + i for i in range(len(index))]
+    return pd.DataFrame(
+        {"Open": prices, "High": prices, "Low": prices, "Close": prices, "Volume": prices,
+         "Dividends": 0.0, "Stock Splits": 0.0},
+        index=index,
+    )
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        return make_history(start, end)
+
+def test_repeat_range_served_from_disk(tmp_path):
+    """
+    Test that a range already in the store is read back without
+    calling upstream again, including from a fresh store instance.
+    """
+    fetch = FakeFetch()
+    store = PriceStore(str(tmp_path))
+    first = store.get_history("AAPL", "2023-01-02", "2023-02-01", fetch)
+    second = PriceStore(str(tmp_path)).get_history("AAPL", "2023-01-02", "2023-02-01", fetch)
+    assert len(fetch.calls) == 1
+    assert len(first) > 0
+    assert first["Close"].tolist() == second["Close"].tolist()
+    assert list(first.index) == list(second.index)
+
+def test_only_missing_dates_are_fetched(tmp_path):
+    """
+    Test that widening a cached range fetches only the uncovered edges.
+    """
+    fetch = FakeFetch()
+    store = PriceStore(str(tmp_path))
+    store.get_history("AAPL", "2023-02-01", "2023-03-01", fetch)
+    hist = store.get_history("AAPL", "2023-01-02", "2023-04-03", fetch)
+    assert fetch.calls[1:] == [
+        ("AAPL", "2023-01-02", "2023-02-01"),
+        ("AAPL", "2023-03-01", "2023-04-03"),
+    ]
+    assert hist.index.min() == pd.Timestamp("2023-01-02")
+    assert hist.index.max() < pd.Timestamp("2023-04-03")
+    assert hist.index.is_monotonic_increasing
+
+def test_trailing_current_days_are_refetched(tmp_path):
+    """
+    Test that today's still-moving bar is never persisted, so a range
+    ending in the future refetches only the trailing days.
+    """
+    fetch = FakeFetch()
+    store = PriceStore(str(tmp_path))
+    start = (date.today() - timedelta(days=30)).isoformat()
+    end = (date.today() + timedelta(days=1)).isoformat()
+    store.get_history("AAPL", start, end, fetch)
+    store.get_history("AAPL", start, end, fetch)
+    assert len(fetch.calls) == 2
+    assert fetch.calls[1] == ("AAPL", date.today().isoformat(), end)
+
+def test_gap_fills_keep_the_original_fetch_age(tmp_path):
+    """
+    Test that incremental fills do not reset the age of stored bars, so a
+    regularly requested symbol still expires and is refetched in full.
+    """
+    fetch = FakeFetch()
+    store = PriceStore(str(tmp_path), max_age_days=7)
+    store.get_history("AAPL", "2023-02-01", "2023-03-01", fetch)
+    meta_path = tmp_path / "AAPL.json"
+    meta = json.loads(meta_path.read_text())
+    meta["fetched_at"] -= 6 * 86400
+    meta_path.write_text(json.dumps(meta))
+
+    store.get_history("AAPL", "2023-02-01", "2023-03-15", fetch)
+    assert json.loads(meta_path.read_text())["fetched_at"] == meta["fetched_at"]
+
+    meta["fetched_at"] -= 2 * 86400
+    meta_path.write_text(json.dumps(meta))
+    store.get_history("AAPL", "2023-02-01", "2023-03-15", fetch)
+    assert fetch.calls[-1] == ("AAPL", "2023-02-01", "2023-03-15")
+
+def test_mismatched_sidecar_is_not_a_hit(tmp_path):
+    """
+    Test that a matrix whose row count disagrees with its sidecar (another
+    worker caught mid-write) is refetched rather than served with missing
+    rows, and that writes leave no temp files behind.
+    """
+    fetch = FakeFetch()
+    store = PriceStore(str(tmp_path))
+    full = store.get_history("AAPL", "2023-01-02", "2023-03-01", fetch)
+    meta_path = tmp_path / "AAPL.json"
+    meta = json.loads(meta_path.read_text())
+    meta["rows"] += 5
+    meta_path.write_text(json.dumps(meta))
+
+    assert store.get_history("AAPL", "2023-01-02", "2023-03-01", fetch).equals(full)
+    assert len(fetch.calls) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["AAPL.json", "AAPL.npy"]
+
+def test_empty_upstream_is_not_persisted(tmp_path):
+    """
+    Test that a symbol with no upstream data is not recorded as covered.
+    """
+    store = PriceStore(str(tmp_path))
+    calls = []
+    def empty_fetch(symbol, start, end):
+        calls.append(symbol)
+        return pd.DataFrame()
+    assert store.get_history("INVALID", "2023-01-01", "2023-01-31", empty_fetch).empty
+    assert store.get_history("INVALID", "2023-01-01", "2023-01-31", empty_fetch).empty
+    assert len(calls) == 2
+
+def test_invalid_date_raises(tmp_path):
+    """
+    Test that a malformed date is rejected before any upstream call.
+    """
+    fetch = FakeFetch()
+    with pytest.raises(ValueError):
+        PriceStore(str(tmp_path)).get_history("AAPL", "invalid_date", "2023-01-31", fetch)
+    assert fetch.calls == []
@@ -0,0 +1,88 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("REACT_APP_OPENAI_API_KEY", "test")
+
+import main
+import upstream
+from price_store import PriceStore
+from info_cache import InfoCache
+from news_cache import NewsCache
+from plan_cache import PlanCache
+from test_price_store import make_history
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, start, end):
+        if self.symbol == "ZZZZ":
+            return make_history(start, start)
+        return make_history(start, end)
+
+    @property
+    def info(self):
+        if self.symbol == "ZZZZ":
+            return {}
+        return {"marketCap": 1000, "trailingPE": 25.5}
+
+    @property
+    def news(self):
+        return [{"title": f"{self.symbol} headline {i}"} for i in range(10)]
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(upstream.yf, "Ticker", FakeTicker)
+    monkeypatch.setattr(main, "price_store", PriceStore(str(tmp_path)))
+    monkeypatch.setattr(main, "info_cache", InfoCache())
+    monkeypatch.setattr(main, "news_cache", NewsCache())
+    monkeypatch.setattr(main, "plan_cache", PlanCache())
+    return TestClient(main.app)
+
+def test_query_runs_all_actions(client):
+    """
+    Test that /api/query plans a query and returns every action's data
+    in one payload.
+    """
+    response = client.post("/api/query", json={"query": "P/E and market cap of AAPL and MSFT last month"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["source"] == "fast_path"
+    assert [r["type"] for r in data["results"]] == ["getHistory", "getMetrics"]
+    history, metrics = data["results"]
+    assert set(history["data"]) == {"AAPL", "MSFT"}
+    assert metrics["data"]["AAPL"] == {"trailingPE": 25.5, "marketCap": 1000}
+
+def test_query_reports_failed_actions_individually(client):
+    """
+    Test that a failing action is returned as an error record without
+    discarding the other actions.
+    """
+    response = client.post("/api/query", json={"query": "news and chart for ZZZZ 1y"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["error"]["status"] == 404
+    assert len(results[1]["data"]["ZZZZ"]) == 8
+
+def test_query_streams_ndjson(client):
+    """
+    Test that stream=true emits the plan, one line per action and a
+    final done event.
+    """
+    response = client.post("/api/query?stream=true", json={"query": "AAPL news and 1y chart"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "plan"
+    assert sorted(e["index"] for e in events[1:-1]) == [0, 1]
+    assert events[-1] == {"event": "done"}
+
+def test_query_missing_query(client):
+    """
+    Test that /api/query rejects an empty query like /api/process_query.
+    """
+    response = client.post("/api/query", json={"query": ""})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No query provided"
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+import main
+from screener import MetricsTable, Screener, parse_filters
+from test_query_endpoint import client
+
+ROWS = {
+    "AAPL": {"shortName": "Apple", "sector": "Technology", "forwardPE": 28.0, "marketCap": 3.0e12},
+    "MSFT": {"shortName": "Microsoft", "sector": "Technology", "forwardPE": 31.0, "marketCap": 2.9e12},
+    "INTC": {"shortName": "Intel", "sector": "Technology", "forwardPE": 12.0, "marketCap": 1.5e11},
+    "IBM": {"shortName": "IBM", "sector": "Technology", "marketCap": 1.8e11},
+    "JPM": {"shortName": "JPMorgan", "sector": "Financial Services", "forwardPE": 11.0, "marketCap": 5.5e11},
+    "KO": {"shortName": "Coca-Cola", "sector": "Consumer Defensive", "forwardPE": 22.0, "marketCap": 2.6e11},
+}
+METRICS = ["forwardPE", "marketCap"]
+
+def fake_load(rows, calls=None):
+    async def load(symbols, fields):
+        if calls is not None:
+            calls.append(list(symbols))
+        await asyncio.sleep(0)
+        for symbol in symbols:
+            values = rows.get(symbol)
+            yield symbol, ValueError(f"No data available for symbol: {symbol}") if values is None else values
+    return load
+
+def test_filter_sort_and_top_k():
+    """
+    Test that filters combine, text matches ignore case, ranking puts
+    missing values last, and only the top ``limit`` rows are returned.
+    """
+    table = MetricsTable(ROWS, METRICS)
+    matched, rows = table.screen(parse_filters("sector=technology"), sort="forwardPE", limit=3)
+    assert matched == 4
+    assert [row["symbol"] for row in rows] == ["INTC", "AAPL", "MSFT"]
+    assert rows[0] == {"symbol": "INTC", "shortName": "Intel", "sector": "Technology", "forwardPE": 12.0}
+
+    _, rows = table.screen(parse_filters("sector=Technology"), sort="forwardpe", descending=True, limit=10)
+    assert [row["symbol"] for row in rows] == ["MSFT", "AAPL", "INTC", "IBM"]
+    assert rows[-1]["forwardPE"] is None
+
+    matched, rows = table.screen([{"metric": "forwardPE", "op": "<", "value": 25}, ("marketCap", ">=", "2e11")],
+                                 sort="marketCap", descending=True, columns=["marketCap"])
+    assert matched == 2
+    assert rows == [{"symbol": "JPM", "marketCap": 5.5e11}, {"symbol": "KO", "marketCap": 2.6e11}]
+
+def test_invalid_screens_raise_value_error():
+    """
+    Test that unknown metrics, bad operators and non-numeric thresholds are
+    rejected with ValueError.
+    """
+    table = MetricsTable(ROWS, METRICS)
+    for filters, sort in [([("bogus", ">", 1)], None), ([("sector", "<", "x")], None),
+                          ([("forwardPE", "<", "cheap")], None), ([("forwardPE", "~", 3)], None), ([], "sector")]:
+        with pytest.raises(ValueError):
+            table.screen(filters, sort)
+    with pytest.raises(ValueError):
+        parse_filters("forwardPE ~ 3")
+
+def test_refresh_is_shared_and_keeps_rows_that_failed():
+    """
+    Test that concurrent refreshes share one rebuild, loaded in batches,
+    and that a symbol failing on a later refresh keeps its previous row.
+    """
+    calls = []
+    rows = dict(ROWS)
+    screener = Screener(fake_load(rows, calls), list(ROWS), METRICS, batch=4)
+    async def scenario():
+        first, second = await asyncio.gather(screener.current(), screener.current())
+        assert first is second
+        del rows["KO"]
+        return first, await screener.refresh()
+    first, second = asyncio.run(scenario())
+    assert calls[:2] == [list(ROWS)[:4], list(ROWS)[4:]]
+    assert len(calls) == 4
+    assert len(second) == len(ROWS)
+    assert second.numeric["forwardPE"][second.symbols.index("KO")] == 22.0
+    assert screener.stats()["failed"] == 1
+
+def test_batches_wait_for_governor_headroom():
+    """
+    Test that a rebuild defers each batch while the governor reports no
+    headroom for background work.
+    """
+    checks = iter([False, False, True, False, True])
+    governor = SimpleNamespace(has_headroom=lambda: next(checks))
+    calls = []
+    screener = Screener(fake_load(ROWS, calls), list(ROWS), METRICS, batch=4, governor=governor, backoff=0)
+    table = asyncio.run(screener.refresh())
+    assert len(table) == len(ROWS)
+    assert calls == [list(ROWS)[:4], list(ROWS)[4:]]
+    assert screener.stats()["deferred"] == 3
+
+def test_first_screen_does_not_wait_for_headroom():
+    """
+    Test that a screen waiting for the first table is not held back by
+    missing headroom, even when it joins a background rebuild.
+    """
+    governor = SimpleNamespace(has_headroom=lambda: False)
+    screener = Screener(fake_load(ROWS), list(ROWS), METRICS, batch=4, governor=governor, backoff=0.01)
+    async def scenario():
+        background = asyncio.ensure_future(screener.refresh())
+        await asyncio.sleep(0.05)
+        assert screener.table is None
+        table = await asyncio.wait_for(screener.current(), 1)
+        assert await background is table
+        return table
+    assert len(asyncio.run(scenario())) == len(ROWS)
+
+def test_screen_endpoint_and_action(client, monkeypatch):
+    """
+    Test /api/screen end to end, and that a planned 'screen' action is run
+    by /api/query against the same table.
+    """
+    monkeypatch.setattr(main, "screener", Screener(fake_load(ROWS), list(ROWS), METRICS))
+    response = client.get("/api/screen?filters=sector=Technology,forwardPE<30&sort=forwardPE&limit=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["universe"] == len(ROWS) and data["matched"] == 2
+    assert [row["symbol"] for row in data["results"]] == ["INTC", "AAPL"]
+    assert client.get("/api/screen?filters=bogus>1").status_code == 400
+
+    plan = {"actions": [{"type": "screen", "symbols": [], "filters": [{"metric": "forwardPE", "op": "<", "value": 20}],
+                         "sort": "forwardPE", "order": "asc", "limit": 5}],
+            "description": "cheapest stocks by forward P/E", "keyDates": []}
+    async def create(model, messages, stream):
+        async def chunks():
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=json.dumps(plan)))])
+        return chunks()
+    monkeypatch.setattr(main, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    response = client.post("/api/query", json={"query": "cheapest stocks by forward p/e"})
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert result["type"] == "screen"
+    assert [row["symbol"] for row in result["data"]["results"]] == ["JPM", "INTC"]
@@ -0,0 +1,90 @@
+import asyncio
+import numpy as np
+from shared_cache import SharedCache, SqliteStore, MemoryStore, encode, decode, MAGIC
+from info_cache import InfoCache
+from plan_cache import PlanCache
+from price_store import PriceStore
+from test_info_cache import FakeInfo
+from test_price_store import FakeFetch
+
+def run(coro):
+    return asyncio.run(coro)
+
+class BrokenStore:
+    def get(self, key):
+        raise ConnectionError("store unreachable")
+
+    def set(self, key, value, ex=None):
+        raise ConnectionError("store unreachable")
+
+def test_encoding_round_trips_arrays_and_rejects_other_versions():
+    """
+    Test that values, including numpy series, round-trip through the binary
+    format, and that blobs of another format version read as misses.
+    """
+    matrix = np.arange(12, dtype="float64").reshape(2, 6)
+    blob = encode({"start": "2023-01-02", "matrix": matrix, "tags": {"b", "a"}}, stored_at=123.0)
+    stored_at, value = decode(blob)
+    assert stored_at == 123.0
+    assert np.array_equal(value["matrix"], matrix) and value["matrix"].dtype == matrix.dtype
+    assert value["tags"] == ["a", "b"]
+    assert decode(MAGIC + bytes([99]) + blob[len(MAGIC) + 1:]) is None
+    assert decode(b"not a cache entry") is None
+
+def test_sqlite_store_is_shared_between_handles(tmp_path):
+    """
+    Test that two handles on one SQLite file (as two workers would open)
+    see each other's writes, and that expired entries are not returned.
+    """
+    path = str(tmp_path / "shared.db")
+    writer, reader = SharedCache(SqliteStore(path)), SharedCache(SqliteStore(path))
+    writer.set("news", "AAPL", [{"title": "headline"}], ttl=60)
+    writer.set("news", "MSFT", [{"title": "old"}], ttl=60, age=61)
+    value, age = reader.get("news", "AAPL")
+    assert value == [{"title": "headline"}] and age < 5
+    assert reader.get("news", "MSFT") is None
+    assert reader.stats()["hits"] == 1
+
+def test_info_fetched_by_one_worker_is_reused_by_another():
+    """
+    Test that a second worker's info cache adopts the record the first
+    worker published instead of calling upstream again.
+    """
+    shared = SharedCache(MemoryStore())
+    fetch = FakeInfo()
+    first, second = InfoCache(fetch=fetch, shared=shared), InfoCache(fetch=fetch, shared=shared)
+    async def scenario():
+        return await first.get("AAPL", ["marketCap"]), await second.get("AAPL", ["marketCap", "bookValue"])
+    assert asyncio.run(scenario()) == ({"marketCap": 1001}, {"marketCap": 1001, "bookValue": 4.2})
+    assert fetch.calls == 1
+
+def test_history_fetched_on_one_host_is_reused_on_another(tmp_path):
+    """
+    Test that a price store with an empty disk fills a range from the
+    shared tier rather than upstream, with identical prices.
+    """
+    shared = SharedCache(MemoryStore())
+    fetch = FakeFetch()
+    first = PriceStore(str(tmp_path / "host1"), shared=shared)
+    second = PriceStore(str(tmp_path / "host2"), shared=shared)
+    expected = first.get_history("AAPL", "2023-01-02", "2023-03-01", fetch)
+    served = second.get_history("AAPL", "2023-01-09", "2023-02-01", fetch)
+    assert len(fetch.calls) == 1
+    assert served.equals(expected[(expected.index >= "2023-01-09") & (expected.index < "2023-02-01")])
+
+def test_plans_are_shared_and_store_failures_are_misses():
+    """
+    Test that a plan made by one worker is a cache hit in another, and that
+    an unreachable store only counts errors.
+    """
+    shared = SharedCache(MemoryStore())
+    plan = {"actions": [{"type": "getNews", "symbols": ["AAPL"]}], "description": "news"}
+    run(PlanCache(shared=shared).put("Apple news", plan))
+    assert run(PlanCache(shared=shared).get("apple news!")) == plan
+
+    broken = SharedCache(BrokenStore())
+    cache = PlanCache(shared=broken)
+    run(cache.put("Apple news", plan))
+    assert run(cache.get("Apple news")) == plan
+    assert run(PlanCache(shared=broken).get("Apple news")) is None
+    assert broken.stats()["errors"] == 2
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+import msgpack
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from info_cache import InfoCache
+from news_cache import NewsCache
+from plan_cache import PlanCache
+from snapshot import SnapshotStore, Snapshotter
+from test_info_cache import FakeClock, FakeInfo
+from test_plan_cache import Today, make_plan
+
+def make_caches(clock):
+    return {
+        "info": InfoCache(fetch=FakeInfo(), clock=clock, max_stale=3600),
+        "news": NewsCache(ttl=300, max_stale=600, clock=clock),
+        "plans": PlanCache(ttl=86400, clock=clock, today=Today(date(2024, 6, 3))),
+    }
+
+def test_caches_survive_a_restart(tmp_path):
+    """
+    Test that entries saved by one process are restored by the next with
+    their ages carried over, so fresh entries hit without calling upstream.
+    """
+    clock = FakeClock()
+    caches = make_caches(clock)
+    fetch = caches["info"].fetch
+    caches["news"]._entries["AAPL"] = (clock.now, [{"title": "headline"}])
+    asyncio.run(caches["plans"].put("compare apple and microsoft", make_plan()))
+    asyncio.run(caches["info"].get("AAPL", ["marketCap"]))
+    asyncio.run(Snapshotter(SnapshotStore(str(tmp_path)), caches).save_all())
+
+    restarted = make_caches(FakeClock())
+    snapshotter = Snapshotter(SnapshotStore(str(tmp_path)), restarted)
+    asyncio.run(snapshotter.restore_all())
+    assert snapshotter.restored == {"info": 1, "news": 1, "plans": 1}
+    assert asyncio.run(restarted["info"].get("AAPL", ["marketCap"])) == {"marketCap": 1001}
+    assert restarted["info"].hits == 1 and fetch.calls == 1
+    assert asyncio.run(restarted["news"].get("AAPL")) == [{"title": "headline"}]
+    assert asyncio.run(restarted["plans"].get("Compare Apple and Microsoft"))["actions"][0]["symbols"] == ["AAPL", "MSFT"]
+
+def test_expired_entries_are_dropped_on_restore(tmp_path):
+    """
+    Test that time spent offline counts against each cache's TTL, so
+    entries that expired while the machine was stopped are not restored.
+    """
+    clock = FakeClock()
+    caches = make_caches(clock)
+    caches["news"]._entries["AAPL"] = (clock.now - 500, [{"title": "old"}])
+    caches["news"]._entries["MSFT"] = (clock.now, [{"title": "new"}])
+    store = SnapshotStore(str(tmp_path))
+    asyncio.run(Snapshotter(store, caches).save_all())
+
+    restarted = NewsCache(ttl=300, max_stale=600, clock=FakeClock())
+    assert restarted.restore(store.load("news")[1], elapsed=200) == 1
+    assert list(restarted._entries) == ["MSFT"]
+    assert restarted.clock() - restarted._entries["MSFT"][0] == 200
+
+def test_incompatible_snapshots_are_ignored(tmp_path):
+    """
+    Test that a snapshot from another format version, or a corrupt file,
+    is skipped instead of failing startup.
+    """
+    store = SnapshotStore(str(tmp_path))
+    with open(tmp_path / "info.snap", "wb") as f:
+        f.write(msgpack.packb({"version": 0, "name": "info", "saved_at": time.time(), "entries": []}))
+    with open(tmp_path / "news.snap", "wb") as f:
+        f.write(b"\xc1 not msgpack")
+    assert store.load("info") is None
+    assert store.load("news") is None
+    assert store.load("plans") is None
+
+def test_unfinished_restore_is_not_overwritten(tmp_path):
+    """
+    Test that shutting down before the restore completed leaves the
+    previous snapshot in place.
+    """
+    store = SnapshotStore(str(tmp_path))
+    store.save("plans", [["key", make_plan(), "2024-06-03", 0.0]])
+    snapshotter = Snapshotter(store, {"plans": PlanCache()})
+    asyncio.run(snapshotter.stop())
+    assert len(store.load("plans")[1]) == 1
+
+def test_concurrent_saves_share_a_directory(tmp_path):
+    """
+    Test that stores of several workers saving the same snapshot at once
+    never collide on a temp file, and leave no temp files behind.
+    """
+    stores = [SnapshotStore(str(tmp_path)) for _ in range(4)]
+    def save(store):
+        for i in range(50):
+            store.save("plans", [["key", make_plan(), "2024-06-03", float(i)]])
+    with ThreadPoolExecutor(len(stores)) as pool:
+        list(pool.map(save, stores))
+    assert len(stores[0].load("plans")[1]) == 1
+    assert sorted(os.listdir(tmp_path)) == ["plans.snap"]
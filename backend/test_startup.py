@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+import main
+from startup import StartupReport
+
+def test_importing_app_defers_heavy_dependencies():
+    """
+    Test that importing the app loads neither the data stack, yfinance nor
+    the OpenAI SDK, and does not need the OpenAI key.
+    """
+    env = {key: value for key, value in os.environ.items() if key != "REACT_APP_OPENAI_API_KEY"}
+    code = "import sys, main; print(sorted(m for m in ('numpy', 'pandas', 'yfinance', 'openai') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+def test_dotenv_configures_app_modules(tmp_path):
+    """
+    Test that settings from .env reach modules that read their
+    configuration at import time.
+    """
+    (tmp_path / ".env").write_text("PRICE_STORE_MAX_AGE_DAYS=1\nUPSTREAM_MAX_WORKERS=3\n")
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("PRICE_STORE_MAX_AGE_DAYS", "UPSTREAM_MAX_WORKERS")}
+    env["PYTHONPATH"] = os.path.dirname(os.path.abspath(__file__))
+    code = "import main, upstream; print(main.price_store.max_age_days, upstream.UPSTREAM_MAX_WORKERS)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=str(tmp_path), env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "1 3"
+
+def test_readiness_follows_warm_up(monkeypatch):
+    """
+    Test that /api/health answers immediately while /api/ready returns 503
+    until the warm-up ran, then the startup report.
+    """
+    report = StartupReport()
+    report.mark("import app modules")
+    monkeypatch.setattr(main, "startup_report", report)
+    client = TestClient(main.app)
+    assert client.get("/api/health").json() == {"status": "ok", "ready": False}
+    assert client.get("/api/ready").status_code == 503
+    report.warm_up([("pandas", lambda: None)])
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert set(response.json()["phases"]) == {"import app modules"}
+    assert set(response.json()["warmup"]) == {"pandas"}
+
+def test_failed_warm_up_step_is_reported():
+    """
+    Test that a failing warm-up step is recorded without stopping the
+    remaining steps or readiness.
+    """
+    def broken():
+        raise RuntimeError("missing API key")
+    ran = []
+    report = StartupReport()
+    report.warm_up([("openai", broken), ("yfinance", lambda: ran.append(1))])
+    assert report.ready and ran == [1]
+    assert report.report()["errors"] == {"openai": "missing API key"}
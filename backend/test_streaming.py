@@ -0,0 +1,54 @@
+import json
+import pytest
+from test_query_endpoint import client
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_stock_data_stream_reports_bad_symbols_per_record(client):
+    """
+    Test that streaming /api/stock_data emits one record per symbol and
+    reports a bad symbol as an error record instead of failing the request.
+    """
+    response = client.get("/api/stock_data?symbols=AAPL,ZZZZ,MSFT&start_date=2023-01-01&end_date=2023-01-31&stream=ndjson")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1] == {"event": "done"}
+    by_symbol = {r["symbol"]: r for r in records[:-1]}
+    assert set(by_symbol) == {"AAPL", "ZZZZ", "MSFT"}
+    assert len(by_symbol["AAPL"]["data"]) > 0
+    assert by_symbol["ZZZZ"]["error"] == {"status": 404, "detail": "No data available for symbol: ZZZZ"}
+
+def test_stock_data_without_stream_still_fails_whole_request(client):
+    """
+    Test that the default buffered response keeps its original error
+    behaviour.
+    """
+    response = client.get("/api/stock_data?symbols=AAPL,ZZZZ&start_date=2023-01-01&end_date=2023-01-31")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No data available for symbol: ZZZZ"
+
+def test_stock_metrics_stream_as_sse(client):
+    """
+    Test that /api/stock_metrics can stream per-symbol metrics as
+    server-sent events.
+    """
+    response = client.get("/api/stock_metrics?symbols=AAPL,ZZZZ&metrics=marketCap&stream=sse")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[-1] == ("done", {"event": "done"})
+    by_symbol = {data["symbol"]: data for name, data in events[:-1]}
+    assert by_symbol["AAPL"]["data"] == {"marketCap": 1000}
+    assert by_symbol["ZZZZ"]["error"]["status"] == 404
+
+def test_unknown_stream_format_is_rejected(client):
+    """
+    Test that an unsupported stream format returns a 400.
+    """
+    response = client.get("/api/stock_metrics?symbols=AAPL&metrics=marketCap&stream=xml")
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+import logging
+from telemetry import Registry, SampledFilter, stage, current_trace
+from test_query_endpoint import client
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Test that histograms render cumulative buckets, sum and count in the
+    Prometheus text format, and collectors are added at scrape time.
+    """
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value, route="/a")
+    registry.collector(lambda: [("cache_hit_ratio", "gauge", "Hit ratio.", [({"cache": "info"}, 0.75)])])
+    text = registry.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert "# TYPE cache_hit_ratio gauge" in text
+    assert 'cache_hit_ratio{cache="info"} 0.75' in text
+
+def test_stage_adds_to_current_trace():
+    """
+    Test that repeated stages accumulate into the trace of the request
+    being served.
+    """
+    trace = {}
+    token = current_trace.set(trace)
+    try:
+        with stage("cache", "info"):
+            pass
+        with stage("cache", "info"):
+            pass
+        with stage("serialize"):
+            pass
+    finally:
+        current_trace.reset(token)
+    assert set(trace) == {"cache.info", "serialize"}
+
+def test_metrics_endpoint_and_server_timing(client):
+    """
+    Test that responses carry a Server-Timing header and /metrics exposes
+    request latency by route, cache hit ratios and upstream call outcomes.
+    """
+    url = "/api/stock_data?symbols=AAPL&start_date=2023-01-02&end_date=2023-03-01"
+    assert client.get(url).status_code == 200
+    response = client.get(url)
+    timing = response.headers["Server-Timing"]
+    assert "serialize;dur=" in timing
+    assert "transform;dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    text = metrics.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/stock_data",status="200"}' in text
+    assert 'cache_hit_ratio{cache="price"} 0.5' in text
+    assert 'upstream_calls_total{host="yahoo",outcome="ok"}' in text
+    assert 'stage_duration_seconds_count{stage="serialize"}' in text
+
+def test_sampled_filter_keeps_warnings():
+    """
+    Test that log sampling drops low-level records but always keeps
+    warnings and errors.
+    """
+    sampled = SampledFilter(0.0)
+    def record(level):
+        return logging.LogRecord("test", level, __file__, 1, "message", None, None)
+    assert not sampled.filter(record(logging.INFO))
+    assert not sampled.filter(record(logging.DEBUG))
+    assert sampled.filter(record(logging.WARNING))
+    assert sampled.filter(record(logging.ERROR))
+    assert SampledFilter(1.0).filter(record(logging.DEBUG))
+
+def test_request_logs_are_formatted_lazily(client, caplog):
+    """
+    Test that per-request log lines pass their values as arguments, so a
+    record dropped by level or sampling is never formatted, and that a
+    missing metric is only logged at debug level.
+    """
+    with caplog.at_level(logging.DEBUG):
+        assert client.get("/api/stock_metrics?symbols=AAPL&metrics=marketCap,bogusMetric").status_code == 200
+    received = [r for r in caplog.records if r.msg.startswith("Received request for stock metrics")]
+    assert received and received[0].args == ("AAPL", "marketCap,bogusMetric")
+    missing = [r for r in caplog.records if "Metric not found" in r.msg]
+    assert missing and all(r.levelno == logging.DEBUG for r in missing)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from price_store import price_matrix
+from transforms import align, transform_matrix
+from test_query_endpoint import client
+
+def make_matrix():
+    aapl = pd.DataFrame({"Close": [10.0, 11.0, 12.0, 15.0]},
+                        index=pd.to_datetime(["2024-07-01", "2024-07-02", "2024-07-03", "2024-07-05"]))
+    msft = pd.DataFrame({"Close": [20.0, 22.0, 21.0]},
+                        index=pd.to_datetime(["2024-07-01", "2024-07-02", "2024-07-05"]))
+    return price_matrix({"AAPL": aapl, "MSFT": msft})
+
+def test_fill_rules():
+    """
+    Test that missing days are left, carried forward or dropped.
+    """
+    matrix = make_matrix()
+    assert np.isnan(align(matrix, "none").loc["2024-07-03", ("MSFT", "Close")])
+    assert align(matrix, "ffill").loc["2024-07-03", ("MSFT", "Close")] == 22.0
+    assert list(align(matrix, "drop").index.strftime("%Y-%m-%d")) == ["2024-07-01", "2024-07-02", "2024-07-05"]
+
+def test_rebase_cumulative_and_log():
+    """
+    Test the single-series transforms against hand-computed values.
+    """
+    matrix = align(make_matrix(), "ffill")
+    rebased = transform_matrix(matrix, "rebase")
+    assert rebased[("AAPL", "Close")].tolist() == pytest.approx([100.0, 110.0, 120.0, 150.0])
+    cumulative = transform_matrix(matrix, "cumulative")
+    assert cumulative[("MSFT", "Close")].tolist() == pytest.approx([0.0, 10.0, 10.0, 5.0])
+    log = transform_matrix(matrix, "log")
+    assert log[("AAPL", "Close")].iloc[-1] == pytest.approx(np.log(1.5))
+
+def test_difference_and_ratio_against_reference():
+    """
+    Test that pairwise transforms are taken against the reference
+    symbol, which is left out of the result.
+    """
+    matrix = align(make_matrix(), "ffill")
+    difference = transform_matrix(matrix, "difference", "AAPL")
+    assert list(difference.columns) == [("MSFT", "Close")]
+    assert difference[("MSFT", "Close")].tolist() == [10.0, 11.0, 10.0, 6.0]
+    ratio = transform_matrix(matrix, "ratio", "MSFT")
+    assert ratio[("AAPL", "Close")].tolist() == pytest.approx([0.5, 0.5, 12 / 22, 15 / 21])
+
+def test_stock_data_transform_endpoint(client):
+    """
+    Test that /api/stock_data serves rebased and difference series.
+    """
+    url = "/api/stock_data?symbols=AAPL,MSFT&start_date=2023-01-02&end_date=2023-02-01"
+    rebased = client.get(url + "&transform=rebase").json()
+    assert list(rebased["AAPL"].values())[:2] == pytest.approx([100.0, 101.0])
+    difference = client.get(url + "&transform=difference&reference=MSFT&format=columnar").json()
+    assert list(difference["series"]) == ["AAPL"]
+    assert set(difference["series"]["AAPL"]["Close"]) == {0.0}
+
+def test_stock_data_transform_validation(client):
+    """
+    Test that unknown transforms, fill rules and references are rejected,
+    as are pairwise transforms with nothing to compare to the reference.
+    """
+    url = "/api/stock_data?symbols=AAPL,MSFT&start_date=2023-01-02&end_date=2023-02-01"
+    assert client.get(url + "&transform=sqrt").status_code == 400
+    assert client.get(url + "&transform=ratio&reference=TSLA").status_code == 400
+    assert client.get(url + "&fill=zero").status_code == 400
+    assert client.get(url + "&transform=rebase&stream=ndjson").status_code == 400
+    single = "/api/stock_data?symbols=AAPL&start_date=2023-01-02&end_date=2023-02-01"
+    assert client.get(single + "&transform=difference").status_code == 400
+    assert client.get(single.replace("AAPL", "AAPL,AAPL") + "&transform=ratio").status_code == 400
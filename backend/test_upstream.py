@@ -0,0 +1,55 @@
+import asyncio
+import time
+import pytest
+import upstream
+
+def slow_echo(symbol, delay):
+    time.sleep(delay)
+    if symbol == "BAD":
+        raise ValueError(f"No data available for symbol: {symbol}")
+    return symbol.lower()
+
+def test_gather_symbols_runs_concurrently():
+    """
+    Test that fetching several symbols takes about as long as the
+    slowest one rather than the sum of all of them.
+    """
+    symbols = ["AAPL", "MSFT", "TSLA", "AMZN"]
+    started = time.perf_counter()
+    results = asyncio.run(upstream.gather_symbols(slow_echo, symbols, 0.2))
+    elapsed = time.perf_counter() - started
+    assert results == {"AAPL": "aapl", "MSFT": "msft", "TSLA": "tsla", "AMZN": "amzn"}
+    assert elapsed < 0.6
+
+def test_gather_symbols_reports_errors_per_symbol():
+    """
+    Test that one failing symbol does not discard the other results.
+    """
+    results = asyncio.run(upstream.gather_symbols(slow_echo, ["AAPL", "BAD"], 0))
+    assert results["AAPL"] == "aapl"
+    assert isinstance(results["BAD"], ValueError)
+
+def test_gather_symbols_times_out_slow_symbols():
+    """
+    Test that a symbol exceeding the per-symbol timeout is reported as
+    a TimeoutError.
+    """
+    results = asyncio.run(upstream.gather_symbols(slow_echo, ["AAPL"], 0.5, timeout=0.05))
+    assert isinstance(results["AAPL"], asyncio.TimeoutError)
+
+def test_run_blocking_keeps_event_loop_responsive():
+    """
+    Test that a blocking upstream call does not stall other coroutines.
+    """
+    async def scenario():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        task = asyncio.create_task(ticker())
+        await upstream.run_blocking(slow_echo, "AAPL", 0.2)
+        task.cancel()
+        return ticks
+    assert asyncio.run(scenario()) >= 10
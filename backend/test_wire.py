@@ -0,0 +1,67 @@
+import msgpack
+import numpy as np
+import pytest
+from test_query_endpoint import client
+
+URL = "/api/stock_data?symbols=AAPL,MSFT&start_date=2023-01-01&end_date=2023-03-01"
+
+def test_columnar_json_shares_one_date_axis(client):
+    """
+    Test that format=columnar returns one date axis and one array per
+    symbol, matching the default dict format.
+    """
+    default = client.get(URL).json()
+    columnar = client.get(URL + "&format=columnar").json()
+    assert columnar["dates"] == list(default["AAPL"])
+    assert columnar["series"]["AAPL"]["Close"] == list(default["AAPL"].values())
+    assert set(columnar["series"]) == {"AAPL", "MSFT"}
+
+def test_columnar_all_columns(client):
+    """
+    Test that columns=all includes every OHLCV column.
+    """
+    columnar = client.get(URL + "&format=columnar&columns=all").json()
+    assert list(columnar["series"]["MSFT"]) == ["Open", "High", "Low", "Close", "Volume"]
+
+def test_msgpack_typed_buffers(client):
+    """
+    Test that format=msgpack returns raw date and float64 buffers that
+    decode to the same values as the JSON format.
+    """
+    columnar = client.get(URL + "&format=columnar").json()
+    response = client.get(URL + "&format=msgpack")
+    assert response.headers["content-type"] == "application/msgpack"
+    payload = msgpack.unpackb(response.content)
+    days = np.frombuffer(payload["dates"], dtype="<i4").astype("datetime64[D]")
+    closes = np.frombuffer(payload["series"]["AAPL"]["Close"], dtype=payload["dtype"])
+    assert [str(d) for d in days] == columnar["dates"]
+    assert closes.tolist() == columnar["series"]["AAPL"]["Close"]
+
+def test_etag_revalidation(client):
+    """
+    Test that repeating a request with If-None-Match returns 304.
+    """
+    first = client.get(URL)
+    etag = first.headers["ETag"]
+    second = client.get(URL, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    third = client.get(URL + "&format=columnar", headers={"If-None-Match": etag})
+    assert third.status_code == 200
+
+def test_gzip_compression(client):
+    """
+    Test that large responses are gzip-compressed when the client accepts it.
+    """
+    response = client.get(URL + "&format=columnar&columns=all", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+def test_invalid_format_and_column(client):
+    """
+    Test that unknown formats and columns are rejected with 400, as are
+    columns other than Close in the dict format.
+    """
+    assert client.get(URL + "&format=xml").status_code == 400
+    assert client.get(URL + "&format=columnar&columns=Price").status_code == 400
+    assert client.get(URL + "&columns=Open").status_code == 400
+    assert client.get(URL + "&format=dict&columns=Open,Close").status_code == 400
@@ -0,0 +1,90 @@
+import re
+
+# Company names and common aliases users type instead of tickers. Keys are
+# lowercase phrases; values are the Yahoo Finance symbols the frontend expects.
+COMPANY_TICKERS = {
+    "apple": "AAPL",
+    "microsoft": "MSFT",
+    "tesla": "TSLA",
+    "amazon": "AMZN",
+    "google": "GOOGL",
+    "alphabet": "GOOGL",
+    "meta": "META",
+    "facebook": "META",
+    "netflix": "NFLX",
+    "nvidia": "NVDA",
+    "amd": "AMD",
+    "advanced micro devices": "AMD",
+    "intel": "INTC",
+    "ibm": "IBM",
+    "oracle": "ORCL",
+    "salesforce": "CRM",
+    "adobe": "ADBE",
+    "cisco": "CSCO",
+    "qualcomm": "QCOM",
+    "broadcom": "AVGO",
+    "paypal": "PYPL",
+    "uber": "UBER",
+    "airbnb": "ABNB",
+    "spotify": "SPOT",
+    "shopify": "SHOP",
+    "palantir": "PLTR",
+    "coinbase": "COIN",
+    "disney": "DIS",
+    "walmart": "WMT",
+    "costco": "COST",
+    "home depot": "HD",
+    "nike": "NKE",
+    "starbucks": "SBUX",
+    "mcdonalds": "MCD",
+    "coca cola": "KO",
+    "coca-cola": "KO",
+    "coke": "KO",
+    "pepsi": "PEP",
+    "pepsico": "PEP",
+    "procter & gamble": "PG",
+    "procter and gamble": "PG",
+    "johnson & johnson": "JNJ",
+    "johnson and johnson": "JNJ",
+    "pfizer": "PFE",
+    "moderna": "MRNA",
+    "eli lilly": "LLY",
+    "exxon": "XOM",
+    "exxonmobil": "XOM",
+    "chevron": "CVX",
+    "boeing": "BA",
+    "ford": "F",
+    "general motors": "GM",
+    "jpmorgan": "JPM",
+    "jp morgan": "JPM",
+    "goldman sachs": "GS",
+    "morgan stanley": "MS",
+    "bank of america": "BAC",
+    "wells fargo": "WFC",
+    "visa": "V",
+    "mastercard": "MA",
+    "berkshire hathaway": "BRK-B",
+    "berkshire": "BRK-B",
+    "at&t": "T",
+    "verizon": "VZ",
+    "s&p 500": "^GSPC",
+    "s&p": "^GSPC",
+    "sp500": "^GSPC",
+    "nasdaq": "^IXIC",
+    "dow jones": "^DJI",
+    "dow": "^DJI",
+}
+
+_ALIAS_PATTERN = re.compile(
+    r"(?<![\w&^-])(" + "|".join(re.escape(name) for name in sorted(COMPANY_TICKERS, key=len, reverse=True)) + r")(?![\w&-])"
+)
+
+
+def find_company_names(text):
+    """Return ``(ticker, start, end)`` for every company alias in lowercase ``text``."""
+    return [(COMPANY_TICKERS[m.group(1)], m.start(), m.end()) for m in _ALIAS_PATTERN.finditer(text)]
+
+
+def replace_company_names(text):
+    """Replace company aliases in lowercase ``text`` with their lowercase tickers."""
+    return _ALIAS_PATTERN.sub(lambda m: COMPANY_TICKERS[m.group(1)].lower(), text)
@@ -0,0 +1,68 @@
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+TRANSFORMS = {"none", "rebase", "cumulative", "log", "difference", "ratio"}
+REFERENCE_TRANSFORMS = {"difference", "ratio"}
+FILL_RULES = {"none", "ffill", "drop"}
+
+
+def align(matrix, fill="ffill"):
+    """
+    Apply a fill rule to a ``price_matrix`` whose rows are the union of every
+    symbol's trading days:
+
+    - ``none``: leave a symbol's missing days (holidays, halts) as NaN
+    - ``ffill``: carry the last known price forward over missing days
+    - ``drop``: keep only the days every symbol traded
+    """
+    if fill == "ffill":
+        return matrix.ffill()
+    if fill == "drop":
+        return matrix.dropna(how="any")
+    return matrix
+
+
+def transform_matrix(matrix, transform, reference=None):
+    """
+    Turn the Close prices of an aligned ``price_matrix`` into comparison
+    series in a single vectorized pass over all symbols:
+
+    - ``rebase``: price rebased so each symbol's first close is 100
+    - ``cumulative``: cumulative return since the first close, in percent
+    - ``log``: cumulative log return, ``ln(price / first close)``
+    - ``difference``/``ratio``: each symbol's close minus/divided by the
+      ``reference`` symbol's close on the same day; the reference is omitted
+
+    Returns a frame with ``(symbol, "Close")`` columns so it can be
+    downsampled and serialized like the raw matrix.
+    """
+    if transform == "none":
+        return matrix
+    close = matrix.xs("Close", axis=1, level=1)
+    symbols = list(close.columns)
+    values = close.to_numpy(dtype="float64")
+
+    if transform in REFERENCE_TRANSFORMS:
+        ref = values[:, [symbols.index(reference)]]
+        keep = [i for i, symbol in enumerate(symbols) if symbol != reference]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = values - ref if transform == "difference" else values / ref
+        result, symbols = result[:, keep], [symbols[i] for i in keep]
+    else:
+        valid = ~np.isnan(values)
+        first = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+        base = values[first, np.arange(values.shape[1])]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = values / base
+            if transform == "rebase":
+                result = relative * 100.0
+            elif transform == "cumulative":
+                result = (relative - 1.0) * 100.0
+            else:
+                result = np.log(relative)
+
+    result[~np.isfinite(result)] = np.nan
+    columns = pd.MultiIndex.from_tuples([(symbol, "Close") for symbol in symbols])
+    return pd.DataFrame(result, index=matrix.index, columns=columns)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from coalesce import SingleFlight
+from governor import Governor
+from lazy import lazy_import
+import telemetry
+
+yf = lazy_import("yfinance")
+
+UPSTREAM_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", 8))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 20))
+
+# yfinance is blocking; every upstream call runs on this bounded pool so the
+# event loop keeps serving other requests while Yahoo answers.
+executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="upstream")
+
+# Every call to Yahoo goes through the governor: rate limit, adaptive
+# concurrency, jittered retries and a circuit breaker for the host.
+YAHOO = "yahoo"
+governor = Governor(
+    rate=float(os.getenv("UPSTREAM_RATE", 10)),
+    burst=int(os.getenv("UPSTREAM_BURST", 20)),
+    max_limit=UPSTREAM_MAX_WORKERS,
+    target_latency=float(os.getenv("UPSTREAM_TARGET_LATENCY", 2.0)),
+    retries=int(os.getenv("UPSTREAM_RETRIES", 2)),
+    failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", 5)),
+    reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET", 30)),
+    observer=telemetry.observe_upstream,
+)
+
+# Concurrent requests for the same (kind, symbol) share one upstream call.
+flights = SingleFlight()
+
+
+def fetch_history(symbol, start_date, end_date):
+    return governor.call(YAHOO, lambda: yf.Ticker(symbol).history(start=start_date, end=end_date))
+
+
+def fetch_info(symbol):
+    return governor.call(YAHOO, lambda: yf.Ticker(symbol).info)
+
+
+def fetch_intraday(symbol):
+    return governor.call(YAHOO, lambda: yf.Ticker(symbol).history(period="1d", interval="1m"))
+
+
+def fetch_news(symbol):
+    return governor.call(YAHOO, lambda: yf.Ticker(symbol).news)
+
+
+async def run_blocking(fn, *args, timeout=None):
+    """Run a blocking call on the upstream pool, giving up after ``timeout`` seconds."""
+    loop = asyncio.get_running_loop()
+    timeout = UPSTREAM_TIMEOUT if timeout is None else timeout
+    return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+
+
+async def run_shared(kind, symbol, fn, *args, span=None, timeout=None):
+    """
+    Like ``run_blocking(fn, symbol, *args)``, but concurrent callers asking for
+    the same ``kind`` of data about ``symbol`` share one call. With a ``span``,
+    a call already in flight for a span containing it is shared too.
+    """
+    with telemetry.stage(f"upstream_{kind}", symbol):
+        return await flights.do((kind, symbol), lambda: run_blocking(fn, symbol, *args, timeout=timeout), span)
+
+
+async def iter_symbols(fn, symbols, *args, timeout=None):
+    """
+    Call ``fn(symbol, *args)`` for every symbol concurrently, yielding
+    ``(symbol, result)`` pairs as each call finishes. Blocking functions run on
+    the upstream pool; coroutine functions are awaited directly.
+
+    A call that raises yields the exception in place of its result
+    (``TimeoutError`` if it took longer than ``timeout``), so callers can decide
+    per symbol how to report failures.
+    """
+    async def run(symbol):
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                timeout_s = UPSTREAM_TIMEOUT if timeout is None else timeout
+                return symbol, await asyncio.wait_for(fn(symbol, *args), timeout_s)
+            return symbol, await run_blocking(fn, symbol, *args, timeout=timeout)
+        except asyncio.TimeoutError as e:
+            logging.warning("Upstream call %s timed out for %s", fn.__name__, symbol)
+            return symbol, e
+        except Exception as e:
+            return symbol, e
+
+    for next_done in asyncio.as_completed([run(symbol) for symbol in dict.fromkeys(symbols)]):
+        yield await next_done
+
+
+async def gather_symbols(fn, symbols, *args, timeout=None):
+    """Like ``iter_symbols``, but wait for every symbol and return a ``{symbol: result}`` dict."""
+    return {symbol: outcome async for symbol, outcome in iter_symbols(fn, symbols, *args, timeout=timeout)}
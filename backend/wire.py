@@ -0,0 +1,78 @@
+import hashlib
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from lazy import lazy_import
+from price_store import COLUMNS
+
+np = lazy_import("numpy")
+
+FORMATS = {"dict", "columnar", "msgpack"}
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def parse_columns(columns):
+    """Parse a comma separated ``columns`` parameter ("Close", "Open,Close", "all")."""
+    if columns.lower() == "all":
+        return list(COLUMNS)
+    by_name = {column.lower(): column for column in COLUMNS}
+    parsed = []
+    for name in columns.split(','):
+        column = by_name.get(name.strip().lower())
+        if column is None:
+            raise HTTPException(status_code=400, detail=f"Unsupported column: {name}")
+        parsed.append(column)
+    return list(dict.fromkeys(parsed))
+
+
+def columnar_json(matrix):
+    """
+    Encode a ``price_matrix`` as one shared date axis plus one array per
+    symbol and column: ``{"dates": [...], "series": {symbol: {column: [...]}}}``.
+    Missing bars are ``null``.
+    """
+    values = matrix.to_numpy(dtype="float64")
+    cells = values.astype(object)
+    cells[np.isnan(values)] = None
+    series = {}
+    for i, (symbol, column) in enumerate(matrix.columns):
+        series.setdefault(symbol, {})[column] = cells[:, i].tolist()
+    return {"dates": matrix.index.strftime('%Y-%m-%d').tolist(), "series": series}
+
+
+def columnar_msgpack(matrix):
+    """
+    Encode a ``price_matrix`` as msgpack. Dates are little-endian int32 days
+    since 1970-01-01 and every series is a raw little-endian float64 buffer
+    (NaN for missing bars), so clients can view them as typed arrays directly.
+    """
+    import msgpack
+
+    values = np.ascontiguousarray(matrix.to_numpy(dtype="<f8").T)
+    days = matrix.index.values.astype("datetime64[D]").astype("<i4")
+    series = {}
+    for i, (symbol, column) in enumerate(matrix.columns):
+        series.setdefault(symbol, {})[column] = values[i].tobytes()
+    return msgpack.packb({"dates": days.tobytes(), "dtype": "<f8", "series": series})
+
+
+def columnar_response(matrix, response_format):
+    if response_format == "msgpack":
+        return Response(columnar_msgpack(matrix), media_type=MSGPACK_MEDIA_TYPE)
+    return JSONResponse(columnar_json(matrix))
+
+
+def conditional_response(request, response):
+    """
+    Tag a fully rendered response with a content hash ETag and turn it into a
+    304 when the client already holds that version.
+    """
+    etag = '"' + hashlib.blake2b(response.body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response